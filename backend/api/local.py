@@ -1,10 +1,30 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import json
+import logging
 import re
 import os
-from utils.finam import FinamAPIClient
-from utils.openrouter import call_llm
+import time
+from datetime import date
+from utils.finam import AsyncFinamAPIClient
+from utils.cascade import ModelCascade
+from utils.compact import DEFAULT_TOKEN_BUDGET, compact_result
+from utils.formatters import render_results
+from utils.instruments import InstrumentDirectory
+from utils.intent_router import IntentRouter
+from utils.log import get_logger, log_event
+from utils.market_hub import KINDS, MarketHub
+from utils.metrics import (
+    REGISTRY, cache_families, hub_families, instruments_families, record, resilience_families, scheduler_families,
+    start_request_timing, timed,
+)
+from utils.prompts import PromptCompiler
+from utils.registry import ApiCall, dispatch_many, parse_api_calls
+from utils.sessions import API_RESULT_PREFIX, SessionStore
+from utils.openrouter import call_llm, get_llm_client, stream_llm
+from utils.tokens import count_message_tokens
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from os.path import join, dirname
@@ -14,247 +34,409 @@ dotenv_path = join(dirname(__file__), '../.env')
 load_dotenv(dotenv_path)
 
 FINAM_TOKEN = os.getenv("FINAM_ACCESS_TOKEN")
+MAX_CALLS_PER_TURN = int(os.getenv("MAX_CALLS_PER_TURN", "5"))
 
 
 router = APIRouter()
-SESSIONS: Dict[str, List[Dict[str, str]]] = {}
+logger = get_logger("chat")
+SESSIONS = SessionStore()
+# Справочник инструментов: снимок и обновления из Finam запускаются при старте приложения
+INSTRUMENTS = InstrumentDirectory()
 
-def create_system_prompt(): 
-    return """
-Ты — AI-ассистент трейдера, интегрированный с Finam TradeAPI через Python-клиент. Твоё имя - FINAICUS
+# Дата "сегодня" из системного промпта; по ней же роутер считает периоды
+PROMPT_TODAY = date(2025, 10, 4)
+INTENT_ROUTER = IntentRouter(today=PROMPT_TODAY, instruments=INSTRUMENTS)
 
-Твоя задача — помочь пользователю, **возвращая вызов метода клиента**, а не HTTP-запрос.
+PROMPTS = PromptCompiler("chat", today=PROMPT_TODAY, router=INTENT_ROUTER)
 
-### 🔧 Формат ответа (ОБЯЗАТЕЛЬНО!):
 
-Если нужен API-запрос, ответ должен содержать **ровно две строки**:
+def create_system_prompt() -> str:
+    """Ядро системного промпта сессии; разделы под вопрос добавляются к запросу планирования"""
+    return PROMPTS.core
 
-API_CALL: <название_метода>
-PARAMS: {"ключ": "значение", ...}
 
+MARKET_SYMBOL_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,15}@[A-Z]{3,5}$")
 
 
----
-
-## 📚 Важные факты из документации (REST API Finam)
-
-### Подключение и авторизация  
-- Все запросы идут к базовому пути REST API Finam. ([tradeapi.finam.ru](https://tradeapi.finam.ru/docs/guides/rest/))  
-- Токен / авторизация управляется на стороне клиента / HTTP-заголовков (вне твоей ответственности).  
-
-### Счета (Accounts)  
-- `/accounts` — информация по счетам.  
-- `/accounts/{account_id}` — данные по конкретному счету.  
-
-### Инструменты (Instruments)  
-- `/instruments` — список инструментов / фильтрация.  
-- `/instruments/{symbol}/quotes/latest` — котировка по инструменту.  
-- `/instruments/{symbol}/orderbook` — стакан заявок.  
-- `/instruments/{symbol}/bars` — исторические данные (свечи) / бары.  
-
-### Заявки и ордера (Orders / Trades)  
-- `/accounts/{account_id}/orders` — все заявки по счёту.  
-- `/accounts/{account_id}/orders/{order_id}` — конкретная заявка.  
-- `/accounts/{account_id}/trades` — сделки по счёту (с возможностью фильтрации по времени)  
-- Отмена заявки: `DELETE /accounts/{account_id}/orders/{order_id}`  
-- Создать заявку: `POST /accounts/{account_id}/orders`  
-
----
-
-📚 Доступные методы и их параметры:
-
-- `get_quote(symbol: str)` — текущая котировка
-- `get_orderbook(symbol: str, depth: int = 10)` — стакан
-- `get_candles(symbol: str, timeframe: str = "D", start: str | None = None, end: str | None = None)` — свечи
-- `get_account(account_id: str)` — информация о счёте (но ты НЕ должен указывать account_id в PARAMS!)
-- `get_orders(account_id: str)` — ордера (account_id не указывай!)
-- `get_order(account_id: str, order_id: str)` — конкретный ордер (указывай только order_id)
-- `create_order(account_id: str, order_ dict)` — создать ордер (передавай только order_data!)
-- `cancel_order(account_id: str, order_id: str)` — отменить ордер (указывай только order_id)
-- `get_trades(account_id: str, start: str | None = None, end: str | None = None)` — сделки
-- `get_positions(account_id: str)` — позиции
-
-
-
-> ⚠️ ВАЖНО:
-> - **Никогда не передавай `account_id` в `PARAMS`** — он будет добавлен автоматически.
-> - Для `create_order` передавай только тело ордера: `{"symbol": "...", "side": "buy", "type": "limit", "quantity": ..., "price": ...}`
-> - Все строки — в двойных кавычках, как в JSON.
-> - Если вопрос не требует API — отвечай напрямую, без блока `API_CALL`.
-> - Биржа MISX
-> - сейчас дата 4.10.2025
-> - start_time=2025-01-01T00:00:00Z&interval.end_time=2025-03-15T00:00:00Z - формат времени
-> - Ты МОЖЕШЬ давать рекомендации
-
-
-TIME_FRAME_UNSPECIFIED	0	Таймфрейм не указан
-TIME_FRAME_M1	1	1 минута. Глубина данных 7 дней.
-TIME_FRAME_M5	5	5 минут. Глубина данных 30 дней.
-TIME_FRAME_M15	9	15 минут. Глубина данных 30 дней.
-TIME_FRAME_M30	11	30 минут. Глубина данных 30 дней.
-TIME_FRAME_H1	12	1 час. Глубина данных 30 дней.
-TIME_FRAME_H2	13	2 часа. Глубина данных 30 дней.
-TIME_FRAME_H4	15	4 часа. Глубина данных 30 дней.
-TIME_FRAME_H8	17	8 часов. Глубина данных 30 дней.
-TIME_FRAME_D	19	День. Глубина данных 365 дней.
-TIME_FRAME_W	20	Неделя. Глубина данных 365*5 дней.
-TIME_FRAME_MN	21	Месяц. Глубина данных 365*5 дней.
-TIME_FRAME_QR	22	Квартал. Глубина данных 365*5 дней.
-
-
-
-### 🗣️ Примеры:
-
+def extract_api_calls(text: str) -> List[ApiCall]:
+    """Все пары API_CALL/PARAMS из ответа LLM (не больше MAX_CALLS_PER_TURN)"""
+    if "API_CALL:" not in text:
+        return []
+    started = time.perf_counter()
+    calls = parse_api_calls(text)
+    record("parse", time.perf_counter() - started)
+    log_event(logger, "llm.api_calls", logging.DEBUG, calls=calls, found=text.count("API_CALL:"))
+    return calls[:MAX_CALLS_PER_TURN]
 
-**Пользователь:** Изменение цены Сбера?  
-**Ты:**  
-API_CALL: get_candles  
-PARAMS: {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D", "start": "2025-01-01T00:00:00Z", "end": "2025-10-04T00:00:00Z"}
 
-**Пользователь:** Какая цена у Сбербанка?  
-**Ты:**  
-API_CALL: get_quote
-PARAMS: {"symbol": "SBER@MISX"}
+# Роутер → быстрая модель → сильная модель для шага планирования в /message
+CASCADE = ModelCascade(INTENT_ROUTER, parse=extract_api_calls)
 
-**Пользователь:** Покажи мои ордера.  
-**Ты:**  
-API_CALL: get_orders
-PARAMS: {}
 
-**Пользователь:** Купи  акций Газпрома по 240 руб.  
-**Ты:**  
-
-API_CALL: create_order
-PARAMS: {
-                "symbol": "GAZP@MISX",
-                "quantity": {
-                    "value": "10.0"
-                },
-                "side": "SIDE_SELL",
-                "type": "ORDER_TYPE_LIMIT",
-                "timeInForce": "TIME_IN_FORCE_DAY",
-                "limitPrice": {
-                    "value": "240"
-                },
-                "stopCondition": "STOP_CONDITION_UNSPECIFIED",
-                "legs": [],
-                "clientOrderId": "test005"
-}
-
-
-**Пользователь:** Что такое спред?  
-**Ты:**  
-Спред — это разница между лучшей ценой покупки (bid) и продажи (ask). Чем он меньше, тем выше ликвидность актива.
-
----
-
-Отвечай на русском, будь точным и полезным.
-
-        
-        """
-
-def extract_api_call(text: str) -> Tuple[Optional[str], Optional[Dict]]:
-    if "API_CALL:" not in text:
-        return None, None
-    print(text)
-    call_match = re.search(r"API_CALL:\s*(\w+)", text)
-    params_match = re.search(r"PARAMS:\s*(\{.*?\})", text, re.DOTALL)
-    if not call_match or not params_match:
-        return None, None
-
-    method = call_match.group(1)
-    params_str = params_match.group(1).strip()
-    print(method, params_str)
-    try:
-        params = json.loads(params_str)
-        return method, params
-    except json.JSONDecodeError:
-        return None, None
+def format_api_results(calls: List[ApiCall], results: List[Dict[str, Any]]) -> str:
+    """Результаты одного или нескольких вызовов для анализа LLM (компактный JSON в пределах бюджета токенов)"""
+    budget = max(1, DEFAULT_TOKEN_BUDGET // len(calls))
+    if len(calls) == 1:
+        method, params = calls[0]
+        return f"Результат API вызова: {compact_result(method, params, results[0], budget)}"
+    lines = ["Результат API вызова:"]
+    for (method, params), result in zip(calls, results):
+        lines.append(f"[{method} {json.dumps(params, ensure_ascii=False)}] {compact_result(method, params, result, budget)}")
+    return "\n".join(lines)
 
 
 class MessageRequest(BaseModel):
     session_id: str  
     user_message: str
     account_id: Optional[str] = None 
+    # По умолчанию простые запросы (котировка, стакан, свечи, заявки, позиции)
+    # описываются шаблоном без второго вызова LLM; True — всегда разбор LLM
+    full_analysis: bool = False
 
 class MessageResponse(BaseModel):
     answer: str
     session_id: str
+    # Оценка токенов промптов LLM за ход (0 — ответ собран без LLM)
+    prompt_tokens: int = 0
+
+
+def get_finam_client(http_request: Request) -> AsyncFinamAPIClient:
+    """Общий клиент Finam, созданный при старте приложения"""
+    return http_request.app.state.finam_client
+
+def get_market_hub(http_request: Request) -> MarketHub:
+    """Хаб рыночных данных, созданный при старте приложения"""
+    return http_request.app.state.market_hub
+
+
+def parse_symbols(symbols: str, limit: int = 20) -> List[str]:
+    """
+    "SBER@MISX, GAZP@MISX" -> список тикеров без повторов.
+
+    Каждый тикер хаб опрашивает в Finam до MARKET_HUB_IDLE_TTL и держит под него
+    слот из MARKET_HUB_MAX_SYMBOLS, поэтому принимаются только TICKER@BOARD,
+    а при загруженном справочнике — только известные ему (в его написании).
+
+    Raises:
+        ValueError: Тикер не в формате TICKER@BOARD или не найден в справочнике
+    """
+    result: List[str] = []
+    for symbol in dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()):
+        if not MARKET_SYMBOL_RE.match(symbol):
+            raise ValueError(f"Тикер не в формате TICKER@BOARD: {symbol[:40]!r}")
+        if len(INSTRUMENTS.index):
+            instrument = INSTRUMENTS.index.get(symbol)
+            if instrument is None:
+                raise ValueError(f"Неизвестный инструмент: {symbol}")
+            symbol = instrument.symbol
+        if symbol not in result:
+            result.append(symbol)
+    return result[:limit]
+
+
+@router.get("/cache/stats")
+async def cache_stats(finam_client: AsyncFinamAPIClient = Depends(get_finam_client)) -> Dict[str, Any]:
+    return finam_client.cache_stats()
+
+
+@router.get("/sessions/stats")
+async def sessions_stats() -> Dict[str, Any]:
+    return SESSIONS.stats()
+
+
+@router.get("/llm/stats")
+async def llm_stats() -> Dict[str, Any]:
+    return {**get_llm_client().usage_stats(), "cascade": CASCADE.stats()}
+
+
+def upstream_stats(finam_client: AsyncFinamAPIClient) -> Dict[str, Any]:
+    finam = finam_client.resilience.stats()
+    if finam_client.scheduler is not None:
+        finam["scheduler"] = finam_client.scheduler.stats()
+    return {"finam": finam, "openrouter": get_llm_client().resilience.stats()}
+
+
+@router.get("/upstream/stats")
+async def upstream_stats_endpoint(finam_client: AsyncFinamAPIClient = Depends(get_finam_client)) -> Dict[str, Any]:
+    """Автоматы, повторы и хеджирование по внешним сервисам"""
+    return upstream_stats(finam_client)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(
+    finam_client: AsyncFinamAPIClient = Depends(get_finam_client),
+    hub: MarketHub = Depends(get_market_hub),
+) -> PlainTextResponse:
+    """Метрики в текстовом формате Prometheus"""
+    llm_cache = get_llm_client().cache
+    families = cache_families(
+        finam_client.cache_stats(),
+        llm_cache.stats() if llm_cache is not None else None,
+        SESSIONS.stats(),
+    )
+    families += hub_families(hub.stats()) + resilience_families(upstream_stats(finam_client))
+    if finam_client.scheduler is not None:
+        families += scheduler_families(finam_client.scheduler.stats())
+    families += instruments_families(INSTRUMENTS.stats())
+    text = REGISTRY.render(families)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/instruments/resolve")
+async def instruments_resolve(
+    q: str = Query(..., min_length=1, description="Тикер, TICKER@BOARD или название: Сбер, Роснефть, rosneft"),
+    limit: int = Query(5, ge=1, le=50),
+) -> Dict[str, Any]:
+    """Кандидаты TICKER@BOARD для названия по убыванию оценки"""
+    started = time.perf_counter()
+    candidates = INSTRUMENTS.resolve(q, limit)
+    return {
+        "query": q,
+        "candidates": [candidate.to_dict() for candidate in candidates],
+        "us": round((time.perf_counter() - started) * 1e6, 1),
+    }
+
+
+@router.get("/instruments/stats")
+async def instruments_stats() -> Dict[str, Any]:
+    return INSTRUMENTS.stats()
+
+
+@router.get("/market/stats")
+async def market_stats(hub: MarketHub = Depends(get_market_hub)) -> Dict[str, Any]:
+    return hub.stats()
+
+
+@router.get("/market/snapshot")
+async def market_snapshot(
+    symbols: str = Query(..., description="Тикеры через запятую: SBER@MISX,GAZP@MISX"),
+    kind: str = Query("quote", pattern="^(quote|orderbook)$"),
+    hub: MarketHub = Depends(get_market_hub),
+) -> Dict[str, Any]:
+    """Последние снимки из хаба; инструменты без снимка становятся горячими и появятся со следующим опросом"""
+    try:
+        requested = parse_symbols(symbols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result: Dict[str, Any] = {}
+    for symbol in requested:
+        hub.touch(symbol, kind)
+        snapshot = hub.snapshot(symbol, kind)
+        result[symbol] = snapshot.to_message() if snapshot else None
+    return result
+
+
+@router.websocket("/market/ws")
+async def market_ws(websocket: WebSocket, symbols: str = "", kinds: str = "quote"):
+    """
+    Поток обновлений хаба: сначала текущие снимки, затем изменения (JSON как в /market/snapshot).
+    Входящие сообщения клиента игнорируются (можно слать ping для keep-alive).
+    """
+    hub: MarketHub = websocket.app.state.market_hub
+    try:
+        requested = parse_symbols(symbols)
+    except ValueError as e:
+        # 1008 — policy violation: подписка отклонена до рукопожатия
+        await websocket.close(code=1008, reason=str(e).encode()[:120].decode(errors="ignore"))
+        return
+    await websocket.accept()
+    subscription = hub.subscribe(requested, [k for k in kinds.split(",") if k in KINDS])
+
+    async def pump() -> None:
+        while True:
+            snapshot = await subscription.get()
+            await websocket.send_json(snapshot.to_message())
+
+    sender = asyncio.create_task(pump())
+    try:
+        # Отключение клиента видно только на приёме, поэтому приём идёт параллельно отправке
+        while not sender.done():
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        subscription.close()
+
+
+def planning_messages(user_msg: str, conversation: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Запрос планирования: история сессии и разделы промпта под вопрос отдельным
+    системным сообщением перед ним. В историю разделы не сохраняются, поэтому
+    префикс из ядра и прошлых реплик у всех ходов сессии одинаковый.
+    """
+    history = [
+        m["content"] for m in conversation[:-1]
+        if m["role"] == "user" and not m["content"].startswith(API_RESULT_PREFIX)
+    ]
+    prompt = PROMPTS.compile(user_msg, history)
+    # Тикеры названных в вопросе инструментов — модели не нужно угадывать TICKER@BOARD
+    scoped = "\n\n".join(part for part in (prompt.scoped, INSTRUMENTS.hint(user_msg)) if part)
+    if not scoped:
+        return conversation
+    return conversation[:-1] + [{"role": "system", "content": scoped}] + conversation[-1:]
+
+
+async def plan_turn(user_msg: str, conversation: List[Dict[str, str]]) -> Tuple[str, int]:
+    """
+    Ответ ассистента на первом шаге и оценка токенов промпта: вызовы API от роутера,
+    иначе от быстрой модели, а при невалидном ответе — от сильной (utils/cascade.py)
+    """
+    messages: List[Dict[str, str]] = []
+
+    def build_messages() -> List[Dict[str, str]]:
+        messages[:] = planning_messages(user_msg, conversation)
+        return messages
+
+    result = await CASCADE.plan(user_msg, build_messages, temperature=0.3)
+    # Каждый уровень после роутера — отдельный запрос к LLM с теми же сообщениями
+    return result.text, count_message_tokens(messages) * (len(result.attempts) - 1) if messages else 0
+
+
+def add_api_results(
+    conversation: List[Dict[str, str]],
+    assistant_message: str,
+    calls: List[ApiCall],
+    api_responses: List[Dict[str, Any]],
+) -> None:
+    conversation.append({"role": "assistant", "content": assistant_message})
+    conversation.append({
+        "role": "user",
+        "content": f"{format_api_results(calls, api_responses)}\n\nПроанализируй это.",
+    })
+
 
 @router.post("/message", response_model=MessageResponse)
-async def message(request: MessageRequest = Body(...)):
-    finam_client = FinamAPIClient(access_token=FINAM_TOKEN)
+async def message(
+    request: MessageRequest = Body(...),
+    finam_client: AsyncFinamAPIClient = Depends(get_finam_client),
+):
 
     session_id = request.session_id
     user_msg = request.user_message
     account_id = request.account_id
 
 
-    if session_id not in SESSIONS:
-        SESSIONS[session_id] = [{"role": "system", "content": create_system_prompt()}]
-
-    conversation = SESSIONS[session_id]
+    conversation = SESSIONS.get(session_id, create_system_prompt)
     conversation.append({"role": "user", "content": user_msg})
 
     try:
-        response = call_llm(conversation, temperature=0.3)
-        assistant_message = response["choices"][0]["message"]["content"]
-
-        method_name, params = extract_api_call(assistant_message)
-
-        if method_name and params is not None:
-            requires_account = method_name in {
-                "get_account", "get_orders", "get_order", "create_order",
-                "cancel_order", "get_trades", "get_positions"
-            }
-
-            api_response: Dict[str, Any] = {"error": "Неизвестная ошибка"}
-
-            try:
-                if requires_account:
-                    if not account_id:
-                        api_response = {"error": "account_id обязателен для этого метода"}
-                    else:
-                        if method_name == "create_order":
-                            api_response = finam_client.create_order(account_id, params)
-                        elif method_name == "cancel_order":
-                            order_id = params.get("order_id")
-                            if not order_id:
-                                api_response = {"error": "order_id обязателен для cancel_order"}
-                            else:
-                                api_response = finam_client.cancel_order(account_id, order_id)
-                        elif method_name == "get_order":
-                            order_id = params.get("order_id")
-                            if not order_id:
-                                api_response = {"error": "order_id обязателен для get_order"}
-                            else:
-                                api_response = finam_client.get_order(account_id, order_id)
-                        else:
-                            api_response = getattr(finam_client, method_name)(account_id)
-                else:
-                    print(getattr(finam_client, method_name)(**params))
-                    api_response = getattr(finam_client, method_name)(**params)
+        assistant_message, prompt_tokens = await plan_turn(user_msg, conversation)
+        calls = extract_api_calls(assistant_message)
+
+        if calls:
+            # Все вызовы хода выполняются параллельно и анализируются одним запросом к LLM
+            with timed("dispatch", ",".join(method for method, _ in calls)):
+                api_responses = await dispatch_many(finam_client, calls, account_id)
+            add_api_results(conversation, assistant_message, calls, api_responses)
+
+            rendered = None if request.full_analysis else render_results(calls, api_responses)
+            if rendered is not None:
+                assistant_message = rendered
+            else:
+                prompt_tokens += count_message_tokens(conversation)
+                response = await call_llm(conversation, temperature=0.3, stage="llm_analysis")
+                assistant_message = response["choices"][0]["message"]["content"]
 
-            except AttributeError:
-                api_response = {"error": f"Метод не найден: {method_name}"}
-            except Exception as e:
-                api_response = {"error": str(e)}
+        conversation.append({"role": "assistant", "content": assistant_message})
+        SESSIONS.save(session_id, conversation)
 
+        return MessageResponse(answer=assistant_message, session_id=session_id, prompt_tokens=prompt_tokens)
 
-            conversation.append({"role": "assistant", "content": assistant_message})
-            conversation.append({
-                "role": "user",
-                "content": f"Результат API вызова: {api_response}\n\nПроанализируй это.",
-            })
+    except Exception as e:
+        log_event(logger, "message.failed", logging.ERROR, exc_info=True, session_id=session_id)
+        raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
 
 
-            response = call_llm(conversation, temperature=0.3)
-            assistant_message = response["choices"][0]["message"]["content"]
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        conversation.append({"role": "assistant", "content": assistant_message})
-        SESSIONS[session_id] = conversation
 
-        return MessageResponse(answer=assistant_message, session_id=session_id)
+def summarize_api_response(api_response: Dict[str, Any], limit: int = 200) -> str:
+    """Короткое описание результата вызова для индикатора прогресса"""
+    if "error" in api_response:
+        return f"ошибка: {api_response['error']}"[:limit]
+    text = json.dumps(api_response, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit] + "…"
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
\ No newline at end of file
+
+@router.post("/message/stream")
+async def message_stream(
+    request: MessageRequest = Body(...),
+    finam_client: AsyncFinamAPIClient = Depends(get_finam_client),
+):
+    """
+    Потоковый вариант /message (text/event-stream).
+
+    События: stage (этап обработки), tool (краткий результат вызова API),
+    token (фрагмент ответа), done (полный ответ и тайминги), error.
+    """
+    session_id = request.session_id
+    user_msg = request.user_message
+    account_id = request.account_id
+
+    async def events():
+        # Заголовки потока уходят до начала работы, поэтому тайминги этапов — в событии done
+        timings = start_request_timing()
+        started = time.perf_counter()
+        first_token_at: Optional[float] = None
+        prompt_tokens = 0
+        conversation = SESSIONS.get(session_id, create_system_prompt)
+        conversation.append({"role": "user", "content": user_msg})
+
+        try:
+            yield sse_event("stage", {"stage": "planning"})
+            # План — через каскад, как в /message: вызов проверяется до выполнения, поэтому
+            # план не стримится; поток токенов — только анализ результатов
+            assistant_message, prompt_tokens = await plan_turn(user_msg, conversation)
+            calls = extract_api_calls(assistant_message)
+            if not calls:
+                first_token_at = time.perf_counter()
+                yield sse_event("token", {"text": assistant_message})
+            if calls:
+                for method_name, params in calls:
+                    yield sse_event("stage", {"stage": "calling", "method": method_name, "params": params})
+                with timed("dispatch", ",".join(method for method, _ in calls)):
+                    api_responses = await dispatch_many(finam_client, calls, account_id)
+                for (method_name, _), api_response in zip(calls, api_responses):
+                    yield sse_event("tool", {"method": method_name, "summary": summarize_api_response(api_response)})
+                add_api_results(conversation, assistant_message, calls, api_responses)
+
+                rendered = None if request.full_analysis else render_results(calls, api_responses)
+                if rendered is not None:
+                    first_token_at = first_token_at or time.perf_counter()
+                    yield sse_event("token", {"text": rendered})
+                    assistant_message = rendered
+                else:
+                    yield sse_event("stage", {"stage": "analyzing"})
+                    prompt_tokens += count_message_tokens(conversation)
+                    parts = []
+                    async for delta in stream_llm(conversation, temperature=0.3, stage="llm_analysis"):
+                        first_token_at = first_token_at or time.perf_counter()
+                        parts.append(delta)
+                        yield sse_event("token", {"text": delta})
+                    assistant_message = "".join(parts)
+
+            conversation.append({"role": "assistant", "content": assistant_message})
+            SESSIONS.save(session_id, conversation)
+
+            finished = time.perf_counter()
+            yield sse_event("done", {
+                "answer": assistant_message,
+                "session_id": session_id,
+                "ttfb_ms": round(((first_token_at or finished) - started) * 1000, 1),
+                "total_ms": round((finished - started) * 1000, 1),
+                "prompt_tokens": prompt_tokens,
+                "timings_ms": [
+                    {"stage": stage, "ms": round(seconds * 1000, 1), "desc": desc} for stage, seconds, desc in timings
+                ],
+            })
+        except Exception as e:
+            log_event(logger, "message.failed", logging.ERROR, exc_info=True, session_id=session_id, stream=True)
+            yield sse_event("error", {"detail": f"Ошибка обработки: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк каскада моделей (utils/cascade.py) на data/test.csv.
+
+Прогоняет вопросы через каскад (роутер → быстрая модель → сильная) и через
+базовую схему без быстрой модели (роутер → сильная). По каждому уровню:
+сколько вопросов он закрыл, точность этих ответов относительно эталонного
+submission.csv (тип запроса + путь без query-параметров), задержка, токены,
+стоимость и причины эскалации; итог — точность, задержка и цена схем.
+
+Нужен OPENROUTER_API_KEY либо --standins: тогда поднимаются локальные
+заглушки (bench/standins.py), где быстрая модель портит часть планов.
+
+Использование:
+    python bench/bench_cascade.py --limit 100
+    python bench/bench_cascade.py --standins --weak 0.25:0.4
+"""
+
+import asyncio
+import csv
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_load import free_port, spawn  # noqa: E402
+from utils.batch import percentile, run_batch  # noqa: E402
+from utils.cascade import DEFAULT_FAST_MODEL  # noqa: E402
+
+
+def read_csv(path: Path) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+
+async def run_scheme(cascade: Any, items: List[Dict[str, str]], concurrency: int) -> List[Dict[str, Any]]:
+    """Ответы схемы: уровень, попытки, итоговый HTTP-запрос и полное время"""
+    from generate_submission import PROMPTS, convert_to_http_request, smart_fallback
+
+    async def worker(item: Dict[str, str]) -> Dict[str, Any]:
+        question = item["question"]
+
+        def build_messages() -> List[Dict[str, str]]:
+            return PROMPTS.compile(question).system_messages() + [{"role": "user", "content": question}]
+
+        started = time.perf_counter()
+        try:
+            result = await cascade.plan(question, build_messages)
+        except Exception as e:
+            return {
+                "uid": item["uid"], "tier": "error", "attempts": [], "error": str(e),
+                "http": smart_fallback(question, item["uid"]), "seconds": time.perf_counter() - started,
+            }
+        if result.calls:
+            http = convert_to_http_request(*result.calls[0], account_id=item["uid"])
+        else:
+            http = smart_fallback(question, item["uid"])
+        return {
+            "uid": item["uid"], "tier": result.tier, "attempts": result.attempts,
+            "http": http, "seconds": time.perf_counter() - started,
+        }
+
+    results, _ = await run_batch(items, worker, concurrency=concurrency)
+    return results
+
+
+def matches(reference: Dict[str, Dict[str, str]], uid: str, http: tuple[str, str]) -> bool:
+    ref = reference.get(uid)
+    return bool(ref) and ref["type"] == http[0] and ref["request"].split("?")[0] == http[1].split("?")[0]
+
+
+def tier_report(results: List[Dict[str, Any]], reference: Dict[str, Dict[str, str]]) -> None:
+    from generate_submission import convert_to_http_request
+
+    by_tier: Dict[str, List[Any]] = {}
+    for row in results:
+        for attempt in row["attempts"]:
+            by_tier.setdefault(attempt.tier, []).append((row, attempt))
+
+    print(f"{'уровень':<9}{'запр.':>7}{'принято':>9}{'доля':>7}{'точн.':>8}{'p50, мс':>9}{'p95, мс':>9}"
+          f"{'ток. пр/отв':>13}{'$':>10}  причины эскалации / верно среди отклонённых")
+    for tier, pairs in by_tier.items():
+        accepted = [(row, attempt) for row, attempt in pairs if attempt.rejected is None]
+        final = [row for row in results if row["tier"] == tier]
+        correct = sum(matches(reference, row["uid"], row["http"]) for row in final)
+        latencies = [attempt.seconds * 1000 for _, attempt in pairs]
+        prompt = sum(attempt.prompt_tokens for _, attempt in pairs) / len(pairs)
+        completion = sum(attempt.completion_tokens for _, attempt in pairs) / len(pairs)
+        cost = sum(attempt.cost for _, attempt in pairs)
+        reasons = Counter(attempt.rejected for _, attempt in pairs if attempt.rejected)
+        # Отклонённый ответ, который всё же совпал с эталоном, — лишняя эскалация
+        rejected_right = sum(
+            1 for row, attempt in pairs
+            if attempt.rejected and attempt.calls and attempt.calls[0][0]
+            and matches(reference, row["uid"], convert_to_http_request(*attempt.calls[0], account_id=row["uid"]))
+        )
+        print(
+            f"{tier:<9}{len(pairs):>7}{len(accepted):>9}{len(final) / len(results):>7.0%}"
+            f"{(correct / len(final) if final else 0):>8.0%}"
+            f"{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}"
+            f"{prompt:>7.0f}/{completion:<5.0f}{cost:>10.4f}  "
+            f"{', '.join(f'{name} {count}' for name, count in reasons.most_common()) or '-'}"
+            + (f" / {rejected_right}" if reasons else "")
+        )
+
+
+def scheme_summary(name: str, results: List[Dict[str, Any]], reference: Dict[str, Dict[str, str]]) -> Dict[str, float]:
+    llm_rows = [row for row in results if row["tier"] != "router"]
+    latencies = [row["seconds"] * 1000 for row in llm_rows]
+    cost = sum(attempt.cost for row in results for attempt in row["attempts"])
+    summary = {
+        "accuracy": sum(matches(reference, row["uid"], row["http"]) for row in results) / len(results),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "cost_per_1k": cost / len(results) * 1000,
+        "errors": sum(row["tier"] == "error" for row in results),
+    }
+    print(
+        f"{name:<24}{summary['accuracy']:>10.1%}{summary['p50']:>14.0f}{summary['p95']:>14.0f}"
+        f"{summary['cost_per_1k']:>17.4f}{summary['errors']:>8}"
+    )
+    return summary
+
+
+async def run(items, reference, concurrency: int, fast_model: str, strong_model: str | None) -> None:
+    from generate_submission import INTENT_ROUTER, parse_api_call
+    from utils.cascade import ModelCascade
+    from utils.openrouter import close_llm_client
+
+    def scheme(enabled: bool) -> ModelCascade:
+        return ModelCascade(
+            INTENT_ROUTER, parse=parse_api_call, fast_model=fast_model, strong_model=strong_model,
+            strong_max_tokens=128, require_call=True, enabled=enabled,
+        )
+
+    try:
+        cascade = scheme(True)
+        cascade_results = await run_scheme(cascade, items, concurrency)
+        baseline_results = await run_scheme(scheme(False), items, concurrency)
+        strong = cascade.strong_model()
+    finally:
+        await close_llm_client()
+
+    print(f"Вопросов: {len(items)}; быстрая модель {fast_model}, сильная {strong}\n")
+    print("Каскад по уровням (точность — по вопросам, закрытым уровнем):")
+    tier_report(cascade_results, reference)
+    print(f"\n{'схема':<24}{'точность':>10}{'p50 LLM, мс':>14}{'p95 LLM, мс':>14}{'$ / 1000 вопр.':>17}{'ошибки':>8}")
+    ours = scheme_summary("роутер→быстрая→сильная", cascade_results, reference)
+    base = scheme_summary("роутер→сильная", baseline_results, reference)
+    if base["cost_per_1k"]:
+        print(f"\nЭкономия: {1 - ours['cost_per_1k'] / base['cost_per_1k']:.0%} стоимости, "
+              f"точность {ours['accuracy'] - base['accuracy']:+.1%}")
+
+
+@click.command()
+@click.option("--test", "-t", type=click.Path(exists=True), default="../data/test.csv", help="Путь к test.csv")
+@click.option("--reference", "-r", type=click.Path(exists=True), default="../submission.csv", help="Эталонный submission.csv")
+@click.option("--limit", type=int, default=0, help="Сколько вопросов взять (0 — все)")
+@click.option("--concurrency", "-c", type=int, default=8, help="Одновременных вопросов")
+@click.option("--fast-model", default=None, help="Быстрая модель (по умолчанию LLM_FAST_MODEL)")
+@click.option("--strong-model", default=None, help="Сильная модель (по умолчанию LLM_STRONG_MODEL / OPENROUTER_MODEL)")
+@click.option("--cache", is_flag=True, help="Не отключать дисковый кэш ответов LLM")
+@click.option("--standins", is_flag=True, help="Вместо OpenRouter поднять локальную заглушку")
+@click.option("--weak", default="0.2:0.4", help="Для --standins: доля испорченных планов быстрой модели[:множитель задержки]")
+@click.option("--llm-latency", default="lognormal:600:0.4", help="Для --standins: задержка LLM, мс")
+def main(test, reference, limit, concurrency, fast_model, strong_model, cache, standins, weak, llm_latency):
+    fast_model = fast_model or os.getenv("LLM_FAST_MODEL") or DEFAULT_FAST_MODEL
+    items = read_csv(Path(test))
+    if limit:
+        items = items[:limit]
+    expected = {row["uid"]: row for row in read_csv(Path(reference))}
+    if not cache:
+        os.environ["LLM_CACHE"] = "0"
+
+    with ExitStack() as stack:
+        if standins:
+            finam_port, llm_port = free_port(), free_port()
+            os.environ.update({"OPENROUTER_BASE": f"http://127.0.0.1:{llm_port}", "OPENROUTER_API_KEY": "bench"})
+            stack.enter_context(spawn(
+                [
+                    sys.executable, str(Path(__file__).with_name("standins.py")),
+                    "--finam-port", str(finam_port), "--llm-port", str(llm_port),
+                    "--llm-latency", llm_latency, "--llm-weak", f"{fast_model}={weak}",
+                ],
+                f"http://127.0.0.1:{llm_port}/__stats", dict(os.environ),
+            ))
+        elif not os.getenv("OPENROUTER_API_KEY"):
+            raise click.UsageError("Нужен OPENROUTER_API_KEY или --standins")
+        asyncio.run(run(items, expected, concurrency, fast_model, strong_model))
+
+
+if __name__ == "__main__":
+    main()
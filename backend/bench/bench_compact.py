@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк компактного представления результатов API для LLM.
+
+Сравнивает прежний формат (repr сырого ответа) с utils.compact.compact_result
+по числу токенов и времени подготовки на типовых ответах Finam.
+
+Использование:
+    python bench/bench_compact.py --budget 1500
+"""
+
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from payloads import account_payload, bars_payload, orderbook_payload, orders_payload, trades_payload  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+from utils.compact import compact_result  # noqa: E402
+from utils.tokens import estimate_tokens  # noqa: E402
+
+SAMPLES = [
+    ("свечи D, 1 год", "get_candles", {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D"}, lambda: bars_payload(count=250)),
+    ("свечи D, 3 года", "get_candles", {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D"}, lambda: bars_payload(count=750)),
+    ("свечи M1, неделя", "get_candles", {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_M1"}, lambda: bars_payload(count=5000, step=timedelta(minutes=1))),
+    ("стакан, 50 уровней", "get_orderbook", {"symbol": "SBER@MISX"}, lambda: orderbook_payload(depth=50)),
+    ("заявки, 200", "get_orders", {}, lambda: orders_payload(count=200)),
+    ("сделки, 500", "get_trades", {}, lambda: trades_payload(count=500)),
+    ("счёт, 30 позиций", "get_account", {}, lambda: account_payload(positions=30)),
+]
+
+
+def timed(func, repeat: int) -> float:
+    """Медиана времени вызова, мс"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50)
+
+
+@click.command()
+@click.option("--budget", type=int, default=1500, help="Бюджет токенов на результат")
+@click.option("--repeat", type=int, default=20, help="Повторов для замера времени")
+def main(budget: int, repeat: int):
+    print(f"{'ответ':<22}{'repr, ток.':>12}{'compact, ток.':>15}{'сжатие':>9}{'repr, мс':>11}{'compact, мс':>13}")
+    total_before = total_after = 0
+    for title, method, params, make in SAMPLES:
+        response = make()
+        before = estimate_tokens(str(response))
+        after = estimate_tokens(compact_result(method, params, response, budget))
+        total_before += before
+        total_after += after
+        repr_ms = timed(lambda: str(response), repeat)
+        compact_ms = timed(lambda: compact_result(method, params, response, budget), repeat)
+        print(f"{title:<22}{before:>12}{after:>15}{before / after:>8.1f}x{repr_ms:>11.2f}{compact_ms:>13.2f}")
+    print(f"{'итого':<22}{total_before:>12}{total_after:>15}{total_before / total_after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
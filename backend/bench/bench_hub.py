@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хаба рыночных данных (utils/market_hub.py).
+
+Поднимает заглушки (bench/standins.py, котировки меняются раз в --tick-ms)
+и бэкенд, подключает --listeners WebSocket-слушателей к
+/api/local/market/ws, распределив их по --symbols инструментам, и
+слушает --duration секунд. Итог: сколько обновлений получили слушатели,
+задержка обновления (от снимка в хабе до получения) и сколько запросов
+ушло в Finam — их число должно расти с числом инструментов, а не слушателей.
+
+Использование:
+    python bench/bench_hub.py --listeners 1,50,200 --symbols 5 --duration 10
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List
+
+import click
+import httpx
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_load import free_port, spawn  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+
+SYMBOLS = [
+    "SBER@MISX", "GAZP@MISX", "LKOH@MISX", "YNDX@MISX", "GMKN@MISX", "ROSN@MISX", "NVTK@MISX", "TATN@MISX",
+    "MGNT@MISX", "MTSS@MISX", "PLZL@MISX", "CHMF@MISX", "ALRS@MISX", "AFLT@MISX", "VTBR@MISX", "MOEX@MISX",
+]
+
+
+async def listen(url: str, duration: float) -> Dict[str, Any]:
+    """Один слушатель: число обновлений и задержки доставки, сек"""
+    updates = 0
+    lags: List[float] = []
+    deadline = time.time() + duration
+    async with websockets.connect(url) as ws:
+        while (left := deadline - time.time()) > 0:
+            try:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout=left))
+            except asyncio.TimeoutError:
+                break
+            updates += 1
+            # Первое сообщение — уже имевшийся снимок, его возраст не задержка рассылки
+            if updates > 1:
+                lags.append(time.time() - message["ts"])
+    return {"updates": updates, "lags": lags}
+
+
+async def run_level(ws_url: str, finam_url: str, listeners: int, symbols: List[str], duration: float) -> Dict[str, Any]:
+    async with httpx.AsyncClient() as client:
+        await client.post(f"{finam_url}/__reset")
+        urls = [f"{ws_url}?symbols={symbols[i % len(symbols)]}" for i in range(listeners)]
+        results = await asyncio.gather(*(listen(url, duration) for url in urls))
+        upstream = (await client.get(f"{finam_url}/__stats")).json()
+    lags = [lag * 1000 for result in results for lag in result["lags"]]
+    return {
+        "listeners": listeners,
+        "updates": sum(result["updates"] for result in results),
+        "lag_p50": percentile(lags, 50),
+        "lag_p95": percentile(lags, 95),
+        "finam": upstream["requests"],
+    }
+
+
+@click.command()
+@click.option("--listeners", default="1,50,200", help="Числа слушателей через запятую")
+@click.option("--symbols", "symbol_count", type=int, default=5, help="Сколько разных инструментов слушать")
+@click.option("--duration", type=float, default=10.0, help="Время прослушивания на уровень, сек")
+@click.option("--tick-ms", type=float, default=500.0, help="Период изменения котировок в заглушке, мс")
+@click.option("--interval", type=float, default=1.0, help="Период опроса хабом (MARKET_HUB_QUOTE_INTERVAL), сек")
+@click.option("--finam-latency", default="lognormal:40:0.5", help="Задержка Finam, мс")
+def main(listeners, symbol_count, duration, tick_ms, interval, finam_latency):
+    levels = [int(value) for value in listeners.split(",")]
+    symbols = SYMBOLS[:max(1, min(symbol_count, len(SYMBOLS)))]
+    finam_port, llm_port, backend_port = free_port(), free_port(), free_port()
+    finam_url = f"http://127.0.0.1:{finam_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    os.environ.update({
+        "FINAM_API_BASE_URL": finam_url,
+        "FINAM_ACCESS_TOKEN": "bench",
+        "FINAM_HTTP2": "0",
+        "FINAM_CANDLE_STORE_DIR": tempfile.mkdtemp(prefix="bench-candles-"),
+        "OPENROUTER_BASE": f"http://127.0.0.1:{llm_port}",
+        "OPENROUTER_API_KEY": "bench",
+        "MARKET_HUB_QUOTE_INTERVAL": str(interval),
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    env = dict(os.environ)
+
+    with ExitStack() as stack:
+        stack.enter_context(spawn(
+            [
+                sys.executable, str(Path(__file__).with_name("standins.py")),
+                "--finam-port", str(finam_port), "--llm-port", str(llm_port),
+                "--finam-latency", finam_latency, "--tick-ms", str(tick_ms),
+            ],
+            f"{finam_url}/__stats", env,
+        ))
+        stack.enter_context(spawn(
+            [
+                sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(backend_port),
+                "--log-level", "warning", "--no-access-log",
+            ],
+            f"{backend_url}/api/local/market/stats", env,
+        ))
+        ws_url = f"ws://127.0.0.1:{backend_port}/api/local/market/ws"
+        polls_per_symbol = duration / interval
+        print(f"Инструментов: {len(symbols)}, опрос раз в {interval:g} с, тик цены {tick_ms:g} мс, {duration:g} с на уровень")
+        print(f"{'слуш.':>6}{'обновл.':>9}{'на слуш.':>10}{'лаг p50, мс':>13}{'лаг p95, мс':>13}"
+              f"{'Finam':>7}{'Finam / (инстр.·опросы)':>25}")
+        for level in levels:
+            row = asyncio.run(run_level(ws_url, finam_url, level, symbols, duration))
+            print(
+                f"{row['listeners']:>6}{row['updates']:>9}{row['updates'] / row['listeners']:>10.1f}"
+                f"{row['lag_p50']:>13.1f}{row['lag_p95']:>13.1f}{row['finam']:>7}"
+                f"{row['finam'] / (len(symbols) * polls_per_symbol):>25.2f}"
+            )
+        stats = httpx.get(f"{backend_url}/api/local/market/stats").json()
+        print(f"\nХаб: циклов {stats['loops']}, опросов {stats['polls']}, ошибок {stats['errors']}, "
+              f"разослано {stats['published']}, вытеснено {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк индикаторов utils/indicators.py.
+
+Ряды: дневные свечи за несколько лет и минутные за месяц. Для каждого
+индикатора сравнивается numpy-реализация с построчной реализацией на
+чистом Python (время и максимальное расхождение).
+
+Использование:
+    python bench/bench_indicators.py --years 10 --minute-days 22
+"""
+
+import math
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import click
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from payloads import bars_payload  # noqa: E402
+from utils import indicators  # noqa: E402
+from utils.candle_store import bars_from_response  # noqa: E402
+
+# Минутных баров в торговом дне Мосбиржи (основная + вечерняя сессии)
+MINUTES_PER_SESSION = 840
+
+
+def py_sma(values, window):
+    out, total = [math.nan] * len(values), 0.0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        if i >= window - 1:
+            out[i] = total / window
+    return out
+
+
+def py_ewm(values, alpha):
+    out, previous = [], values[0]
+    for value in values:
+        previous = (1 - alpha) * previous + alpha * value
+        out.append(previous)
+    return out
+
+
+def py_rsi(close, window):
+    gains = [max(b - a, 0.0) for a, b in zip(close, close[1:])]
+    losses = [max(a - b, 0.0) for a, b in zip(close, close[1:])]
+    avg_gain, avg_loss = py_ewm(gains, 1 / window), py_ewm(losses, 1 / window)
+    out = [math.nan] + [100.0 if l == 0 else 100 - 100 / (1 + g / l) for g, l in zip(avg_gain, avg_loss)]
+    out[:window] = [math.nan] * window
+    return out
+
+
+def py_atr(high, low, close, window):
+    tr = [high[0] - low[0]] + [
+        max(h - l, abs(h - c), abs(l - c)) for h, l, c in zip(high[1:], low[1:], close[:-1])
+    ]
+    return py_ewm(tr, 1 / window)
+
+
+def py_max_drawdown(close):
+    peak, worst = close[0], 0.0
+    for value in close:
+        peak = max(peak, value)
+        worst = min(worst, value / peak - 1)
+    return worst
+
+
+def py_vwap(high, low, close, volume):
+    out, pv, vv = [], 0.0, 0.0
+    for h, l, c, v in zip(high, low, close, volume):
+        pv += (h + l + c) / 3 * v
+        vv += v
+        out.append(pv / vv)
+    return out
+
+
+def timed(func, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def max_diff(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    mask = np.isfinite(a) & np.isfinite(b)
+    return float(np.max(np.abs(a[mask] - b[mask]))) if mask.any() else 0.0
+
+
+def run_series(title, bars, timeframe, repeat):
+    close, high, low, volume = (bars[name] for name in ("close", "high", "low", "volume"))
+    lists = {name: bars[name].tolist() for name in ("close", "high", "low", "volume")}
+    cases = [
+        ("sma_20", lambda: indicators.sma(close, 20), lambda: py_sma(lists["close"], 20)),
+        ("ema_20", lambda: indicators.ewm(close, 2 / 21), lambda: py_ewm(lists["close"], 2 / 21)),
+        ("rsi_14", lambda: indicators.rsi(close, 14), lambda: py_rsi(lists["close"], 14)),
+        ("atr_14", lambda: indicators.ewm(indicators.true_range(high, low, close), 1 / 14),
+         lambda: py_atr(lists["high"], lists["low"], lists["close"], 14)),
+        ("drawdown", lambda: [indicators.max_drawdown(close)[0]], lambda: [py_max_drawdown(lists["close"])]),
+        ("vwap", lambda: indicators.vwap(high, low, close, volume),
+         lambda: py_vwap(lists["high"], lists["low"], lists["close"], lists["volume"])),
+    ]
+    print(f"\n{title}: {len(close)} баров")
+    print(f"{'индикатор':<12}{'numpy, мс':>11}{'python, мс':>12}{'ускорение':>11}{'расхождение':>14}")
+    for name, fast, slow in cases:
+        fast_ms, fast_result = timed(fast, repeat)
+        slow_ms, slow_result = timed(slow, max(1, repeat // 5))
+        print(f"{name:<12}{fast_ms:>11.3f}{slow_ms:>12.3f}{slow_ms / fast_ms:>10.1f}x{max_diff(fast_result, slow_result):>14.2e}")
+    summary_ms, _ = timed(lambda: indicators.summarize(bars, timeframe), repeat)
+    print(f"{'summarize':<12}{summary_ms:>11.3f}")
+
+
+@click.command()
+@click.option("--years", type=int, default=10, help="Лет дневных свечей")
+@click.option("--minute-days", type=int, default=22, help="Торговых дней минутных свечей")
+@click.option("--repeat", type=int, default=20, help="Повторов замера (берётся лучший)")
+def main(years: int, minute_days: int, repeat: int):
+    daily = bars_from_response(bars_payload(count=252 * years))
+    minute = bars_from_response(
+        bars_payload(count=MINUTES_PER_SESSION * minute_days, step=timedelta(minutes=1))
+    )
+    run_series(f"Дневные свечи, {years} лет", daily, "TIME_FRAME_D", repeat)
+    run_series(f"Минутные свечи, {minute_days} дней", minute, "TIME_FRAME_M1", repeat)
+
+
+if __name__ == "__main__":
+    main()
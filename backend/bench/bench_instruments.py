@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Справочник инструментов (utils/instruments.py): загрузка, снимок и скорость поиска.
+
+Поднимает заглушку Finam (bench/standins.py, /v1/assets — известные
+инструменты и ~20 тыс. синтетических), загружает список через
+AsyncFinamAPIClient.get_assets, сохраняет снимок во временный файл и
+поднимает справочник из него без Finam. Затем для набора запросов
+(названия, склонения, латиница, опечатки, сленг, тикеры) меряет время
+resolve и долю запросов, где верный TICKER@BOARD — первый кандидат; для
+вопросов с названиями — сколько инструментов находит IntentRouter только
+по NAME_ALIASES и вместе со справочником.
+
+Использование:
+    python bench/bench_instruments.py --repeat 200
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_load import free_port, spawn  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+
+# (запрос, ожидаемый первый кандидат, вид запроса)
+QUERIES = [
+    ("SBER@MISX", "SBER@MISX", "тикер"), ("SBER", "SBER@MISX", "тикер"), ("sber", "SBER@MISX", "тикер"),
+    ("GAZP", "GAZP@MISX", "тикер"), ("SiZ5", "SiZ5@RTSX", "тикер"), ("RIZ5", "RIZ5@RTSX", "тикер"),
+    ("Сбербанк", "SBER@MISX", "название"), ("Газпром", "GAZP@MISX", "название"),
+    ("Газпром нефть", "SIBN@MISX", "название"), ("Роснефть", "ROSN@MISX", "название"),
+    ("Лукойл", "LKOH@MISX", "название"), ("ВТБ", "VTBR@MISX", "название"), ("Магнит", "MGNT@MISX", "название"),
+    ("Аэрофлот", "AFLT@MISX", "название"), ("Новатэк", "NVTK@MISX", "название"), ("Полюс", "PLZL@MISX", "название"),
+    ("Яндекс", "YNDX@MISX", "название"), ("МТС", "MTSS@MISX", "название"), ("Северсталь", "CHMF@MISX", "название"),
+    ("Татнефть", "TATN@MISX", "название"), ("Сургутнефтегаз", "SNGS@MISX", "название"),
+    ("Алроса", "ALRS@MISX", "название"), ("ФосАгро", "PHOR@MISX", "название"), ("Озон", "OZON@MISX", "название"),
+    ("X5", "FIVE@MISX", "название"), ("VK", "VKCO@MISX", "название"), ("ПИК", "PIKK@MISX", "название"),
+    ("Московская биржа", "MOEX@MISX", "название"), ("Русал", "RUAL@MISX", "название"),
+    ("Интер РАО", "IRAO@MISX", "название"), ("НЛМК", "NLMK@MISX", "название"), ("Юнипро", "UPRO@MISX", "название"),
+    ("Транснефть", "TRNFP@MISX", "название"), ("Распадская", "RASP@MISX", "название"),
+    ("Детский мир", "DSKY@MISX", "название"), ("Apple", "AAPL@XNGS", "название"), ("Microsoft", "MSFT@XNGS", "название"),
+    ("Сбербанка", "SBER@MISX", "склонение"), ("Роснефти", "ROSN@MISX", "склонение"),
+    ("Лукойла", "LKOH@MISX", "склонение"), ("Северстали", "CHMF@MISX", "склонение"),
+    ("Газпром нефти", "SIBN@MISX", "склонение"), ("Московской биржи", "MOEX@MISX", "склонение"),
+    ("rosneft", "ROSN@MISX", "латиница"), ("lukoil", "LKOH@MISX", "латиница"), ("yandex", "YNDX@MISX", "латиница"),
+    ("aeroflot", "AFLT@MISX", "латиница"), ("novatek", "NVTK@MISX", "латиница"), ("gazprom", "GAZP@MISX", "латиница"),
+    ("Polymetal", "POLY@MISX", "латиница"), ("Полиметалл", "POLY@MISX", "латиница"),
+    ("Сбербнк", "SBER@MISX", "опечатка"), ("Газпрм", "GAZP@MISX", "опечатка"), ("Роснефь", "ROSN@MISX", "опечатка"),
+    ("Лукоил", "LKOH@MISX", "опечатка"), ("Северстль", "CHMF@MISX", "опечатка"), ("Аэрафлот", "AFLT@MISX", "опечатка"),
+    ("Сбер", "SBER@MISX", "сленг"), ("Норникель", "GMKN@MISX", "сленг"), ("Мосбиржа", "MOEX@MISX", "сленг"),
+    ("Тинькофф", "TCSG@MISX", "сленг"), ("HeadHunter", "HEAD@MISX", "сленг"), ("эппл", "AAPL@XNGS", "сленг"),
+    ("Сбер", "SBER@MISX", "начало"), ("Роснеф", "ROSN@MISX", "начало"), ("Аэроф", "AFLT@MISX", "начало"),
+    ("Северст", "CHMF@MISX", "начало"),
+]
+
+# Вопросы с названиями, которых нет в NAME_ALIASES роутера
+QUESTIONS = [
+    ("Какая цена Сургутнефтегаза?", "SNGS@MISX"),
+    ("Покажи стакан по Хэдхантеру", "HEAD@MISX"),
+    ("Котировка Юнипро", "UPRO@MISX"),
+    ("Сколько стоит ФосАгро?", "PHOR@MISX"),
+    ("Свечи по Распадской за неделю", "RASP@MISX"),
+    ("Цена фьючерса SiZ5", "SiZ5@RTSX"),
+    ("Стакан RIZ5", "RIZ5@RTSX"),
+    ("Котировка Детского мира", "DSKY@MISX"),
+    ("Какая цена акций Роснефти?", "ROSN@MISX"),
+    ("Покажи котировку Лукойла", "LKOH@MISX"),
+    ("Сколько стоит банк?", None),
+    ("Что такое спред?", None),
+]
+
+
+async def load(finam_url: str, snapshot_path: str):
+    from utils.finam import AsyncFinamAPIClient
+    from utils.instruments import InstrumentDirectory
+
+    client = AsyncFinamAPIClient(base_url=finam_url, http2=False)
+    directory = InstrumentDirectory(snapshot_path=snapshot_path)
+    started = time.perf_counter()
+    try:
+        loaded = await directory.refresh(client)
+    finally:
+        await client.aclose()
+    return loaded, time.perf_counter() - started, directory
+
+
+@click.command()
+@click.option("--repeat", type=int, default=200, help="Повторов каждого запроса")
+@click.option("--finam-latency", default="const:5", help="Задержка Finam, мс")
+def main(repeat, finam_latency):
+    os.environ.update({"FINAM_CACHE": "0", "FINAM_CANDLE_STORE": "0", "FINAM_ACCESS_TOKEN": "bench"})
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    from utils.instruments import InstrumentDirectory
+    from utils.intent_router import IntentRouter
+
+    snapshot_path = os.path.join(tempfile.mkdtemp(prefix="bench-instruments-"), "instruments.json")
+    finam_port, llm_port = free_port(), free_port()
+    finam_url = f"http://127.0.0.1:{finam_port}"
+    with ExitStack() as stack:
+        stack.enter_context(spawn(
+            [
+                sys.executable, str(Path(__file__).with_name("standins.py")),
+                "--finam-port", str(finam_port), "--llm-port", str(llm_port), "--finam-latency", finam_latency,
+            ],
+            f"{finam_url}/__stats", dict(os.environ),
+        ))
+        loaded, seconds, directory = asyncio.run(load(finam_url, snapshot_path))
+    if not loaded:
+        raise click.ClickException("Список активов не загружен")
+    stats = directory.stats()
+    print(f"Из Finam: {stats['instruments']} инструментов за {seconds:.2f} с (индекс {stats['build_ms']:.0f} мс), "
+          f"ключей {stats['keys']}, удалений {stats['deletes']}; снимок {os.path.getsize(snapshot_path) / 1e6:.1f} МБ")
+
+    # Дальше без Finam: только снимок
+    offline = InstrumentDirectory(snapshot_path=snapshot_path, refresh_interval=0)
+    started = time.perf_counter()
+    offline.load_snapshot()
+    print(f"Из снимка: {len(offline.index)} инструментов за {time.perf_counter() - started:.2f} с\n")
+
+    print(f"{'вид запроса':<12}{'запросов':>9}{'верно':>7}{'p50, мкс':>10}{'p99, мкс':>10}{'max, мкс':>10}")
+    by_kind = {}
+    misses = []
+    for query, expected, kind in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            candidates = offline.resolve(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+        correct = bool(candidates) and candidates[0].symbol == expected
+        if not correct:
+            misses.append((query, expected, candidates[0].symbol if candidates else None))
+        row = by_kind.setdefault(kind, {"count": 0, "correct": 0, "timings": []})
+        row["count"] += 1
+        row["correct"] += correct
+        row["timings"].extend(timings)
+    total = {"count": 0, "correct": 0, "timings": []}
+    for kind, row in list(by_kind.items()) + [("всего", total)]:
+        if kind != "всего":
+            total["count"] += row["count"]
+            total["correct"] += row["correct"]
+            total["timings"].extend(row["timings"])
+        print(f"{kind:<12}{row['count']:>9}{row['correct']:>7}{percentile(row['timings'], 50):>10.1f}"
+              f"{percentile(row['timings'], 99):>10.1f}{max(row['timings']):>10.1f}")
+    for query, expected, got in misses:
+        print(f"  мимо: {query!r} -> {got}, ожидался {expected}")
+
+    aliases_only = IntentRouter()
+    with_directory = IntentRouter(instruments=offline)
+    print(f"\n{'вопрос':<36}{'ожидается':>12}{'NAME_ALIASES':>14}{'+ справочник':>14}")
+    for question, expected in QUESTIONS:
+        before, _ = aliases_only.extract_symbol(question)
+        after, _ = with_directory.extract_symbol(question)
+        print(f"{question:<36}{expected or '-':>12}{before or '-':>14}{after or '-':>14}")
+    print(f"\nПодсказка LLM: {offline.hint('Сравни Газпром нефть, Сургутнефтегаз и SiZ5')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк локального роутера намерений на data/test.csv.
+
+Показывает долю вопросов, разобранных без LLM, совпадение с submission.csv
+(тип запроса + путь без query-параметров) и задержку разбора.
+
+Использование:
+    python bench/bench_intent_router.py --test ../data/test.csv --reference ../submission.csv
+"""
+
+import csv
+import sys
+import time
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generate_submission import PROMPT_TODAY, convert_to_http_request  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+from utils.intent_router import IntentRouter  # noqa: E402
+
+
+def read_csv(path: Path) -> list[dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+
+@click.command()
+@click.option("--test", "-t", type=click.Path(exists=True), default="../data/test.csv", help="Путь к test.csv")
+@click.option("--reference", "-r", type=click.Path(exists=True), default="../submission.csv", help="Эталонный submission.csv")
+@click.option("--threshold", type=float, default=None, help="Порог уверенности (по умолчанию из роутера)")
+@click.option("--repeat", type=int, default=200, help="Повторов для замера задержки")
+@click.option("--verbose", "-v", is_flag=True, help="Печатать расхождения с эталоном")
+def main(test: str, reference: str, threshold: float | None, repeat: int, verbose: bool):
+    router = IntentRouter(today=PROMPT_TODAY, local_orders=True)
+    if threshold is not None:
+        router.threshold = threshold
+
+    questions = read_csv(Path(test))
+    expected = {row["uid"]: row for row in read_csv(Path(reference))}
+
+    routed = agreed = 0
+    for row in questions:
+        intent = router.route(row["question"])
+        if not intent.is_confident(router.threshold):
+            continue
+        routed += 1
+        http_method, path = convert_to_http_request(intent.method, intent.params, account_id=row["uid"])
+        ref = expected.get(row["uid"])
+        if ref and ref["type"] == http_method and ref["request"].split("?")[0] == path.split("?")[0]:
+            agreed += 1
+        elif verbose:
+            print(f"≠ {row['question']}\n    router: {http_method} {path}\n    ref:    {ref['type']} {ref['request']}" if ref else "")
+
+    latencies = []
+    for _ in range(repeat):
+        for row in questions:
+            started = time.perf_counter()
+            router.route(row["question"])
+            latencies.append(time.perf_counter() - started)
+
+    total = len(questions)
+    print(f"Вопросов: {total}")
+    print(f"Разобрано локально: {routed} ({routed / total:.1%}), без LLM")
+    print(f"Совпадение с эталоном среди разобранных: {agreed}/{routed} ({agreed / max(routed, 1):.1%})")
+    print(
+        f"Задержка route(): p50 {percentile(latencies, 50) * 1e6:.1f} мкс, "
+        f"p95 {percentile(latencies, 95) * 1e6:.1f} мкс, p99 {percentile(latencies, 99) * 1e6:.1f} мкс"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бэкенда без обращения к Finam и OpenRouter.
+
+Поднимает заглушки (bench/standins.py) и бэкенд (uvicorn main:app) в
+отдельных процессах и гоняет вопросы из data/test.csv:
+  message    — POST /api/local/message
+  stream     — POST /api/local/message/stream (дополнительно время до первого токена)
+  submission — process_question из generate_submission.py (в этом процессе)
+при каждой заданной конкурентности. Итог: RPS, p50/p95/p99, доля ошибок
+и число запросов к заглушкам; всё сохраняется в JSON, с --compare
+выводится разница с прошлым прогоном.
+
+Использование:
+    python bench/bench_load.py --targets message,submission --concurrency 1,8,32 --requests 200
+    python bench/bench_load.py --compare bench/results/load-20251004-120000.json
+"""
+
+import asyncio
+import csv
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import click
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.batch import percentile, run_batch  # noqa: E402
+
+TARGETS = ("message", "stream", "submission")
+ACCOUNT_ID = "A12345"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Процесс завершился с кодом {process.returncode}: {process.args}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Не дождались готовности {url}")
+
+
+@contextmanager
+def spawn(args: List[str], ready_url: str, env: Dict[str, str]) -> Iterator[subprocess.Popen]:
+    # stdout процессов (отладочные print бэкенда) не смешивается с таблицей результатов
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_ready(ready_url, process)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def read_questions(path: Path) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [{"uid": row["uid"], "question": row["question"]} for row in csv.DictReader(f, delimiter=";")]
+
+
+def take(questions: List[Dict[str, str]], count: int, offset: int = 0) -> List[Dict[str, str]]:
+    """count вопросов по кругу, начиная с offset"""
+    return [questions[(offset + i) % len(questions)] for i in range(count)]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """Сводка задержек (сек на входе) в мс"""
+    if not values:
+        return {}
+    ms = [value * 1000 for value in values]
+    return {
+        "mean": round(sum(ms) / len(ms), 1),
+        "p50": round(percentile(ms, 50), 1),
+        "p95": round(percentile(ms, 95), 1),
+        "p99": round(percentile(ms, 99), 1),
+        "max": round(max(ms), 1),
+    }
+
+
+class Upstreams:
+    """Счётчики запросов к заглушкам"""
+
+    def __init__(self, finam_url: str, llm_url: str) -> None:
+        self.urls = {"finam": finam_url, "llm": llm_url}
+
+    def reset(self) -> None:
+        for url in self.urls.values():
+            httpx.post(f"{url}/__reset")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: httpx.get(f"{url}/__stats").json() for name, url in self.urls.items()}
+
+
+async def drive_message(base_url: str, items: List[Dict[str, str]], concurrency: int, sessions: int, full_analysis: bool):
+    """POST /message; результат воркера — (успех, None)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        counter = iter(range(len(items)))
+
+        async def worker(item: Dict[str, str]):
+            session = f"load-{next(counter) % sessions}"
+            try:
+                response = await client.post("/api/local/message", json={
+                    "session_id": session, "user_message": item["question"],
+                    "account_id": ACCOUNT_ID, "full_analysis": full_analysis,
+                })
+                return response.status_code == 200, None
+            except httpx.HTTPError:
+                return False, None
+
+        return await run_batch(items, worker, concurrency=concurrency)
+
+
+async def drive_stream(base_url: str, items: List[Dict[str, str]], concurrency: int, sessions: int, full_analysis: bool):
+    """POST /message/stream; результат воркера — (успех, время до первого токена)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        counter = iter(range(len(items)))
+
+        async def worker(item: Dict[str, str]):
+            session = f"load-stream-{next(counter) % sessions}"
+            started = time.perf_counter()
+            first_token: Optional[float] = None
+            done = False
+            try:
+                async with client.stream("POST", "/api/local/message/stream", json={
+                    "session_id": session, "user_message": item["question"],
+                    "account_id": ACCOUNT_ID, "full_analysis": full_analysis,
+                }) as response:
+                    if response.status_code != 200:
+                        return False, None
+                    async for line in response.aiter_lines():
+                        if line == "event: token" and first_token is None:
+                            first_token = time.perf_counter() - started
+                        elif line == "event: error":
+                            return False, first_token
+                        elif line == "event: done":
+                            done = True
+            except httpx.HTTPError:
+                return False, first_token
+            return done, first_token
+
+        return await run_batch(items, worker, concurrency=concurrency)
+
+
+async def drive_submission(items: List[Dict[str, str]], concurrency: int):
+    """process_question из generate_submission.py; ошибки LLM он сам заменяет эвристикой"""
+    from generate_submission import process_question
+    from utils.openrouter import close_llm_client
+
+    async def worker(item: Dict[str, str]):
+        await process_question(item["uid"], item["question"])
+        return True, None
+
+    try:
+        return await run_batch(items, worker, concurrency=concurrency)
+    finally:
+        await close_llm_client()
+
+
+def run_target(target: str, concurrency: int, items: List[Dict[str, str]], warmup: List[Dict[str, str]],
+               base_url: str, upstreams: Upstreams, sessions: int, full_analysis: bool) -> Dict[str, Any]:
+    def drive(batch: List[Dict[str, str]]):
+        if target == "message":
+            return drive_message(base_url, batch, concurrency, sessions, full_analysis)
+        if target == "stream":
+            return drive_stream(base_url, batch, concurrency, sessions, full_analysis)
+        return drive_submission(batch, concurrency)
+
+    if warmup:
+        asyncio.run(drive(warmup))
+    upstreams.reset()
+    results, stats = asyncio.run(drive(items))
+    errors = sum(1 for ok, _ in results if not ok) + stats.errors
+    ttfb = [first for ok, first in results if ok and first is not None]
+    entry: Dict[str, Any] = {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(items),
+        "errors": errors,
+        "error_rate": round(errors / len(items), 4),
+        "elapsed_s": round(stats.elapsed, 3),
+        "rps": round(stats.throughput, 2),
+        "latency_ms": latency_summary(stats.latencies),
+        "upstream": upstreams.stats(),
+    }
+    if ttfb:
+        entry["ttfb_ms"] = latency_summary(ttfb)
+    return entry
+
+
+def print_entry(entry: Dict[str, Any]) -> None:
+    latency = entry["latency_ms"]
+    ttfb = entry.get("ttfb_ms", {}).get("p50")
+    upstream = entry["upstream"]
+    print(
+        f"{entry['target']:<11}{entry['concurrency']:>5}{entry['requests']:>7}{entry['rps']:>9.1f}"
+        f"{latency['p50']:>9.0f}{latency['p95']:>9.0f}{latency['p99']:>9.0f}"
+        f"{(f'{ttfb:.0f}' if ttfb is not None else '-'):>9}{entry['error_rate']:>8.1%}"
+        f"{upstream['finam']['requests']:>8}{upstream['llm']['requests']:>7}",
+        flush=True,
+    )
+
+
+def compare(entries: List[Dict[str, Any]], baseline_path: Path) -> None:
+    baseline = {
+        (entry["target"], entry["concurrency"]): entry
+        for entry in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    print(f"\nСравнение с {baseline_path}:")
+    print(f"{'цель':<11}{'конк.':>5}{'RPS':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'ошибки':>10}")
+
+    def delta(new: float, old: float) -> str:
+        return f"{(new / old - 1) * 100:+.0f}%" if old else "-"
+
+    for entry in entries:
+        old = baseline.get((entry["target"], entry["concurrency"]))
+        if old is None:
+            continue
+        latency, old_latency = entry["latency_ms"], old["latency_ms"]
+        print(
+            f"{entry['target']:<11}{entry['concurrency']:>5}{delta(entry['rps'], old['rps']):>10}"
+            + "".join(f"{delta(latency[q], old_latency[q]):>10}" for q in ("p50", "p95", "p99"))
+            + f"{entry['error_rate'] - old['error_rate']:>+10.1%}"
+        )
+
+
+@click.command()
+@click.option("--test", "-t", type=click.Path(exists=True), default="../data/test.csv", help="Путь к test.csv")
+@click.option("--targets", default="message,stream,submission", help="Что нагружать: message, stream, submission")
+@click.option("--concurrency", "-c", default="1,8,32", help="Уровни конкурентности через запятую")
+@click.option("--requests", "-n", "count", type=int, default=200, help="Запросов на каждый уровень")
+@click.option("--warmup", type=int, default=20, help="Запросов прогрева (не учитываются)")
+@click.option("--sessions", type=int, default=50, help="Число сессий чата, по которым распределяются запросы")
+@click.option("--full-analysis", is_flag=True, help="Всегда разбирать результаты API через LLM")
+@click.option("--finam-latency", default="lognormal:40:0.5", help="Задержка Finam, мс (см. standins.LatencyModel)")
+@click.option("--llm-latency", default="lognormal:600:0.4", help="Задержка LLM до первого токена, мс")
+@click.option("--llm-token-ms", type=float, default=10.0, help="Время генерации фрагмента (слова) ответа LLM, мс")
+@click.option("--finam-errors", type=float, default=0.0, help="Доля ошибок Finam")
+@click.option("--llm-errors", type=float, default=0.0, help="Доля ошибок LLM")
+@click.option("--llm-cache", is_flag=True, help="Не отключать дисковый кэш ответов LLM")
+@click.option("--output", "-o", type=click.Path(), default=None, help="JSON с результатами (по умолчанию bench/results/load-<время>.json)")
+@click.option("--compare", "baseline", type=click.Path(exists=True), default=None, help="JSON прошлого прогона для сравнения")
+def main(test, targets, concurrency, count, warmup, sessions, full_analysis, finam_latency, llm_latency,
+         llm_token_ms, finam_errors, llm_errors, llm_cache, output, baseline):
+    targets_list = [t.strip() for t in targets.split(",") if t.strip()]
+    unknown = set(targets_list) - set(TARGETS)
+    if unknown:
+        raise click.BadParameter(f"неизвестные цели: {', '.join(sorted(unknown))}", param_hint="--targets")
+    levels = [int(c) for c in concurrency.split(",")]
+    questions = read_questions(Path(test))
+
+    finam_port, llm_port, backend_port = free_port(), free_port(), free_port()
+    finam_url, llm_url = f"http://127.0.0.1:{finam_port}", f"http://127.0.0.1:{llm_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    config = {
+        "targets": targets_list, "concurrency": levels, "requests": count, "warmup": warmup,
+        "sessions": sessions, "full_analysis": full_analysis,
+        "finam_latency": finam_latency, "llm_latency": llm_latency, "llm_token_ms": llm_token_ms,
+        "finam_errors": finam_errors, "llm_errors": llm_errors, "llm_cache": llm_cache,
+    }
+
+    candles_dir = tempfile.mkdtemp(prefix="bench-candles-")
+    # Настройки и для бэкенда, и для generate_submission в этом процессе
+    os.environ.update({
+        "FINAM_API_BASE_URL": finam_url,
+        "FINAM_ACCESS_TOKEN": "bench",
+        "FINAM_HTTP2": "0",
+        "FINAM_CANDLE_STORE_DIR": candles_dir,
+        "OPENROUTER_BASE": llm_url,
+        "OPENROUTER_API_KEY": "bench",
+        "LLM_CACHE": "1" if llm_cache else "0",
+    })
+    # Журнал запросов бэкенда под нагрузкой только мешает таблице результатов
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    env = dict(os.environ)
+
+    standins = [
+        sys.executable, str(Path(__file__).with_name("standins.py")),
+        "--finam-port", str(finam_port), "--llm-port", str(llm_port),
+        "--finam-latency", finam_latency, "--llm-latency", llm_latency, "--llm-token-ms", str(llm_token_ms),
+        "--finam-errors", str(finam_errors), "--llm-errors", str(llm_errors),
+    ]
+    backend = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(backend_port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+
+    entries: List[Dict[str, Any]] = []
+    print(f"{'цель':<11}{'конк.':>5}{'запр.':>7}{'RPS':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'TTFB50':>9}{'ошибки':>8}{'Finam':>8}{'LLM':>7}")
+    with ExitStack() as stack:
+        stack.enter_context(spawn(standins, f"{finam_url}/__stats", env))
+        if any(target != "submission" for target in targets_list):
+            stack.enter_context(spawn(backend, f"{backend_url}/api/local/sessions/stats", env))
+        upstreams = Upstreams(finam_url, llm_url)
+        offset = 0
+        for target in targets_list:
+            for level in levels:
+                items = take(questions, count, offset)
+                offset += count
+                entry = run_target(target, level, items, take(questions, warmup, offset), backend_url,
+                                   upstreams, sessions, full_analysis)
+                entries.append(entry)
+                print_entry(entry)
+
+    output_path = Path(output) if output else Path(__file__).with_name("results") / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps({
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip(),
+        "config": config,
+        "results": entries,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nРезультаты сохранены в {output_path}")
+
+    if baseline:
+        compare(entries, Path(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк аналитики стакана utils/orderbook.py на стакане в N уровней.
+
+Использование:
+    python bench/bench_orderbook.py --depth 50
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from payloads import orderbook_payload  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+from utils.orderbook import analyze, book_from_response, diff, fill, imbalance  # noqa: E402
+
+
+def measure(func, repeat: int) -> tuple[float, float]:
+    """p50 и p95 времени вызова, мкс"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return percentile(latencies, 50), percentile(latencies, 95)
+
+
+@click.command()
+@click.option("--depth", type=int, default=50, help="Уровней на сторону")
+@click.option("--quantity", type=float, default=20000, help="Объём для оценки исполнения")
+@click.option("--repeat", type=int, default=5000, help="Повторов замера")
+def main(depth: int, quantity: float, repeat: int):
+    response = orderbook_payload(depth=depth)
+    book = book_from_response(response)
+    other = book_from_response(orderbook_payload(depth=depth, seed=2))
+
+    cases = [
+        ("разбор ответа", lambda: book_from_response(response)),
+        ("спред / середина", lambda: (book.spread, book.mid)),
+        ("дисбаланс", lambda: imbalance(book, 10)),
+        (f"исполнение {quantity:g}", lambda: fill(book, "buy", quantity)),
+        ("разница снимков", lambda: diff(book, other)),
+        ("analyze", lambda: analyze(book, quantity)),
+        ("разбор + analyze", lambda: analyze(book_from_response(response), quantity)),
+    ]
+    print(f"Стакан: {depth} уровней на сторону, {repeat} повторов")
+    print(f"{'операция':<24}{'p50, мкс':>10}{'p95, мкс':>10}")
+    for title, func in cases:
+        p50, p95 = measure(func, repeat)
+        print(f"{title:<24}{p50:>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
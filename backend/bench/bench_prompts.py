@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сборки промпта под тему вопроса (utils/prompts.py) на data/test.csv.
+
+Офлайн: токены полного и собранного системного промпта по всем вопросам
+и по тем, что уходят в LLM (не разобраны роутером), время сборки,
+число разных вариантов промпта и доля неизменного префикса.
+С --live N (нужен OPENROUTER_API_KEY): N вопросов отправляются в LLM
+с полным и с собранным промптом — задержка, токены по данным провайдера
+и совпадение выбранного метода.
+
+Использование:
+    python bench/bench_prompts.py --test ../data/test.csv --profile submission
+    python bench/bench_prompts.py --live 30
+"""
+
+import asyncio
+import csv
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generate_submission import PROMPT_TODAY  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+from utils.intent_router import IntentRouter  # noqa: E402
+from utils.openrouter import LLMClient  # noqa: E402
+from utils.prompts import PROFILES, PromptCompiler  # noqa: E402
+from utils.registry import parse_api_calls  # noqa: E402
+from utils.tokens import count_message_tokens, estimate_tokens  # noqa: E402
+
+
+def read_questions(path: Path) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [row["question"] for row in csv.DictReader(f, delimiter=";")]
+
+
+def token_report(title: str, full: list[int], compiled: list[int]) -> None:
+    if not full:
+        return
+    saved = 1 - sum(compiled) / sum(full)
+    print(
+        f"{title:<26}{len(full):>8}{sum(full) / len(full):>10.0f}{sum(compiled) / len(compiled):>12.0f}"
+        f"{percentile(compiled, 95):>10.0f}{saved:>11.1%}"
+    )
+
+
+async def live(compiler: PromptCompiler, questions: list[str], count: int, model: str | None) -> None:
+    if not os.getenv("OPENROUTER_API_KEY"):
+        print("\n--live: OPENROUTER_API_KEY не задан, замер задержки пропущен")
+        return
+    client = LLMClient(model=model, cache=None)
+    sample = random.Random(0).sample(questions, min(count, len(questions)))
+    latencies = {"full": [], "compiled": []}
+    usage = {"full": [], "compiled": []}
+    agreed = 0
+    try:
+        for question in sample:
+            methods = {}
+            # Порядок чередуется, чтобы прогрев соединения не давал преимущества одному варианту
+            variants = [("full", compiler.full()), ("compiled", compiler.compile(question))]
+            if len(latencies["full"]) % 2:
+                variants.reverse()
+            for name, prompt in variants:
+                messages = prompt.system_messages() + [{"role": "user", "content": question}]
+                started = time.perf_counter()
+                response = await client.chat(messages, temperature=0.0, max_tokens=128)
+                latencies[name].append((time.perf_counter() - started) * 1000)
+                usage[name].append((response.get("usage") or {}).get("prompt_tokens") or count_message_tokens(messages))
+                calls = parse_api_calls(response["choices"][0]["message"]["content"])
+                methods[name] = calls[0][0] if calls else None
+            agreed += methods["full"] == methods["compiled"]
+    finally:
+        await client.aclose()
+
+    print(f"\nLLM ({client.model}), {len(sample)} вопросов:")
+    print(f"{'промпт':<12}{'ток. (провайдер)':>18}{'p50, мс':>10}{'p95, мс':>10}")
+    for name in ("full", "compiled"):
+        print(
+            f"{name:<12}{sum(usage[name]) / len(usage[name]):>18.0f}"
+            f"{percentile(latencies[name], 50):>10.0f}{percentile(latencies[name], 95):>10.0f}"
+        )
+    print(f"Совпадение метода: {agreed}/{len(sample)}; из кэша префиксов: {client.usage['cached_prompt_tokens']} ток.")
+
+
+@click.command()
+@click.option("--test", "-t", type=click.Path(exists=True), default="../data/test.csv", help="Путь к test.csv")
+@click.option("--profile", type=click.Choice(PROFILES), default="submission", help="Профиль промпта")
+@click.option("--repeat", type=int, default=20, help="Повторов для замера времени сборки")
+@click.option("--live", "live_count", type=int, default=0, help="Сколько вопросов отправить в LLM (0 — только офлайн)")
+@click.option("--model", default=None, help="Модель для --live (по умолчанию OPENROUTER_MODEL)")
+def main(test: str, profile: str, repeat: int, live_count: int, model: str | None):
+    router = IntentRouter(today=PROMPT_TODAY)
+    compiler = PromptCompiler(profile, today=PROMPT_TODAY, router=router)
+    questions = read_questions(Path(test))
+    full_tokens = compiler.full().tokens
+
+    all_compiled, llm_compiled, llm_questions = [], [], []
+    variants: Counter = Counter()
+    sections: Counter = Counter()
+    for question in questions:
+        prompt = compiler.compile(question)
+        all_compiled.append(prompt.tokens)
+        variants[prompt.scoped] += 1
+        sections["полный" if prompt.full else "+".join(prompt.sections)] += 1
+        if not router.route(question).is_confident(router.threshold):
+            llm_compiled.append(prompt.tokens)
+            llm_questions.append(question)
+
+    print(f"Профиль {profile}: ядро {estimate_tokens(compiler.core)} ток., полный промпт {full_tokens} ток.\n")
+    print(f"{'вопросы':<26}{'кол-во':>8}{'полный':>10}{'собранный':>12}{'p95':>10}{'экономия':>11}")
+    token_report("все", [full_tokens] * len(all_compiled), all_compiled)
+    token_report("уходят в LLM", [full_tokens] * len(llm_compiled), llm_compiled)
+
+    print(f"\nРазных вариантов промпта: {len(variants)}; доля ядра (общий префикс) в среднем запросе: "
+          f"{estimate_tokens(compiler.core) / (sum(all_compiled) / len(all_compiled)):.0%}")
+    for name, count in sections.most_common():
+        print(f"  {count:>4}  {name}")
+
+    compiler.render.cache_clear()
+    latencies = []
+    for _ in range(repeat):
+        for question in questions:
+            started = time.perf_counter()
+            compiler.compile(question)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    print(f"\nСборка промпта: p50 {percentile(latencies, 50):.1f} мкс, p99 {percentile(latencies, 99):.1f} мкс")
+
+    if live_count:
+        asyncio.run(live(compiler, llm_questions, live_count, model))
+
+
+if __name__ == "__main__":
+    main()
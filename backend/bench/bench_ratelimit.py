@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Ограничитель частоты Finam с приоритетами (PriorityScheduler в utils/ratelimit.py).
+
+Поднимает заглушку Finam с лимитом запросов на токен (--finam-rate-limit,
+сверх него 429 с Retry-After) и одновременно: заваливает её котировками
+(--concurrency воркеров без кэша), раз в --period выставляет заявку и
+читает счёт. Схемы: без ограничителя (FINAM_RATE_LIMIT=0) и с ним. Итог по
+классам запросов: задержка, ошибки, ожидание в очереди; сколько 429 вернул
+сервис и сколько котировок в секунду удалось получить.
+
+Использование:
+    python bench/bench_ratelimit.py --duration 10 --concurrency 32 --finam-rate-limit 20 --limit 18:4
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List
+
+import click
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_load import free_port, spawn  # noqa: E402
+from utils.batch import percentile  # noqa: E402
+
+SYMBOLS = ["SBER@MISX", "GAZP@MISX", "LKOH@MISX", "YNDX@MISX", "GMKN@MISX", "ROSN@MISX", "NVTK@MISX", "TATN@MISX"]
+ORDER = {"symbol": "SBER@MISX", "quantity": {"value": "1"}, "side": "SIDE_BUY", "type": "ORDER_TYPE_MARKET"}
+
+
+async def run_scheme(finam_url: str, duration: float, concurrency: int, period: float) -> Dict[str, Any]:
+    from utils.finam import AsyncFinamAPIClient
+    from utils.resilience import Upstream
+
+    # Слой устойчивости включён в обеих схемах: 429 повторяется (и для заявок — до сервиса она не дошла)
+    client = AsyncFinamAPIClient(base_url=finam_url, http2=False, resilience=Upstream("finam"))
+    samples: Dict[str, List[Dict[str, Any]]] = {"trading": [], "account": [], "market": []}
+    stop_at = time.monotonic() + duration
+
+    async def timed(kind: str, call) -> None:
+        started = time.perf_counter()
+        response = await call
+        samples[kind].append({"seconds": time.perf_counter() - started, "error": "error" in response})
+
+    async def market(worker: int) -> None:
+        i = worker
+        while time.monotonic() < stop_at:
+            await timed("market", client.get_quote(SYMBOLS[i % len(SYMBOLS)]))
+            i += concurrency
+            # Мгновенный отказ (автомат) не отдаёт управление циклу событий
+            await asyncio.sleep(0)
+
+    async def periodic(kind: str, make_call) -> None:
+        tasks = []
+        while time.monotonic() < stop_at:
+            tasks.append(asyncio.create_task(timed(kind, make_call())))
+            await asyncio.sleep(period)
+        await asyncio.gather(*tasks)
+
+    async with httpx.AsyncClient() as stats_client:
+        await stats_client.post(f"{finam_url}/__reset")
+        try:
+            await asyncio.gather(
+                *(market(worker) for worker in range(concurrency)),
+                periodic("trading", lambda: client.create_order("bench", ORDER)),
+                periodic("account", lambda: client.get_account("bench")),
+            )
+        finally:
+            await client.aclose()
+        upstream = (await stats_client.get(f"{finam_url}/__stats")).json()
+    report: Dict[str, Any] = {"upstream": upstream, "scheduler": client.scheduler.stats() if client.scheduler else {}}
+    for kind, rows in samples.items():
+        latencies = [row["seconds"] * 1000 for row in rows]
+        report[kind] = {
+            "count": len(rows),
+            "errors": sum(row["error"] for row in rows),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+        }
+    return report
+
+
+@click.command()
+@click.option("--duration", type=float, default=10.0, help="Длительность схемы, сек")
+@click.option("--concurrency", "-c", type=int, default=32, help="Воркеров котировок")
+@click.option("--period", type=float, default=0.5, help="Период заявок и запросов счёта, сек")
+@click.option("--finam-rate-limit", type=float, default=20.0, help="Лимит заглушки, запросов/с")
+@click.option("--limit", default="18:4", help="FINAM_RATE_LIMIT схемы с ограничителем (rate[:burst])")
+@click.option("--finam-latency", default="lognormal:40:0.3", help="Задержка Finam, мс")
+def main(duration, concurrency, period, finam_rate_limit, limit, finam_latency):
+    os.environ.update({"FINAM_CACHE": "0", "FINAM_CANDLE_STORE": "0", "FINAM_ACCESS_TOKEN": "bench"})
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    finam_port, llm_port = free_port(), free_port()
+    finam_url = f"http://127.0.0.1:{finam_port}"
+    with ExitStack() as stack:
+        stack.enter_context(spawn(
+            [
+                sys.executable, str(Path(__file__).with_name("standins.py")),
+                "--finam-port", str(finam_port), "--llm-port", str(llm_port),
+                "--finam-latency", finam_latency, "--finam-rate-limit", str(finam_rate_limit),
+            ],
+            f"{finam_url}/__stats", dict(os.environ),
+        ))
+        print(f"Лимит Finam {finam_rate_limit:g} запр./с, {concurrency} воркеров котировок, "
+              f"заявка и счёт раз в {period:g} с, {duration:g} с на схему; мс")
+        print(f"{'схема':<23}{'класс':<9}{'запр.':>7}{'ошибки':>8}{'p50':>8}{'p95':>8}{'max':>8}{'очередь':>9}"
+              f"{'429':>7}{'котир./с':>10}")
+        for name, spec in (("без ограничителя", "0"), (f"FINAM_RATE_LIMIT={limit}", limit)):
+            os.environ["FINAM_RATE_LIMIT"] = spec
+            report = asyncio.run(run_scheme(finam_url, duration, concurrency, period))
+            for kind in ("trading", "account", "market"):
+                row = report[kind]
+                queue = report["scheduler"].get(kind, {}).get("avg_wait_ms")
+                print(
+                    f"{name:<23}{kind:<9}{row['count']:>7}{row['errors']:>8}{row['p50']:>8.0f}{row['p95']:>8.0f}"
+                    f"{row['max']:>8.0f}{(f'{queue:.0f}' if queue is not None else '-'):>9}"
+                    + (f"{report['upstream']['limited']:>7}"
+                       f"{(row['count'] - row['errors']) / duration:>10.1f}" if kind == "market" else "")
+                )
+                name = ""
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Хвост задержки вызовов Finam со слоем устойчивости (utils/resilience.py) и без него.
+
+Поднимает заглушку Finam (bench/standins.py), часть запросов которой
+зависает (--latency "...,stall:<доля>:<мс>"), и гоняет котировки через
+AsyncFinamAPIClient без кэша: RESILIENCE выключен / включён (дедлайны,
+повторы, хеджирование). Итог: p50/p95/p99/max, ошибки и число запросов,
+дошедших до Finam (цена хеджирования). С --outage дополнительно
+показывается автомат: заглушка отвечает 500 на всё, и вызовы с
+включённым автоматом быстро завершаются ошибкой, не нагружая сервис.
+
+Использование:
+    python bench/bench_tail.py --requests 2000 --concurrency 16
+    python bench/bench_tail.py --latency lognormal:40:0.3,stall:0.05:3000 --outage
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict
+
+import click
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_load import free_port, spawn  # noqa: E402
+from utils.batch import percentile, run_batch  # noqa: E402
+
+SYMBOLS = ["SBER@MISX", "GAZP@MISX", "LKOH@MISX", "YNDX@MISX", "GMKN@MISX", "ROSN@MISX", "NVTK@MISX", "TATN@MISX"]
+
+
+async def run_scheme(finam_url: str, requests: int, concurrency: int, enabled: bool) -> Dict[str, Any]:
+    from utils.finam import AsyncFinamAPIClient
+    from utils.resilience import Upstream
+
+    client = AsyncFinamAPIClient(base_url=finam_url, http2=False, resilience=Upstream("finam", enabled=enabled))
+
+    async def worker(i: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = await client.get_quote(SYMBOLS[i % len(SYMBOLS)])
+        return {"seconds": time.perf_counter() - started, "error": "error" in response}
+
+    async with httpx.AsyncClient() as stats_client:
+        await stats_client.post(f"{finam_url}/__reset")
+        try:
+            started = time.perf_counter()
+            results, _ = await run_batch(list(range(requests)), worker, concurrency=concurrency)
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.aclose()
+        upstream = (await stats_client.get(f"{finam_url}/__stats")).json()
+    latencies = [row["seconds"] * 1000 for row in results]
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "errors": sum(row["error"] for row in results),
+        "upstream": upstream["requests"],
+        "seconds": elapsed,
+        "resilience": client.resilience.stats(),
+    }
+
+
+def print_row(name: str, row: Dict[str, Any], requests: int) -> None:
+    stats = row["resilience"]
+    print(
+        f"{name:<12}{row['p50']:>8.0f}{row['p95']:>8.0f}{row['p99']:>8.0f}{row['max']:>8.0f}"
+        f"{row['errors']:>8}{row['upstream']:>8}{row['upstream'] / requests - 1:>+9.1%}"
+        f"{stats.get('hedges', 0):>7}{stats.get('hedge_wins', 0):>7}{stats.get('retries', 0):>7}"
+        f"{stats.get('short_circuits', 0):>9}{row['seconds']:>8.1f}"
+    )
+
+
+def start_standins(stack: ExitStack, latency: str, errors: float) -> str:
+    finam_port, llm_port = free_port(), free_port()
+    finam_url = f"http://127.0.0.1:{finam_port}"
+    stack.enter_context(spawn(
+        [
+            sys.executable, str(Path(__file__).with_name("standins.py")),
+            "--finam-port", str(finam_port), "--llm-port", str(llm_port),
+            "--finam-latency", latency, "--finam-errors", str(errors),
+        ],
+        f"{finam_url}/__stats", dict(os.environ),
+    ))
+    return finam_url
+
+
+@click.command()
+@click.option("--requests", "-n", type=int, default=2000, help="Запросов котировок на схему")
+@click.option("--concurrency", "-c", type=int, default=16, help="Одновременных запросов")
+@click.option("--latency", default="lognormal:40:0.3,stall:0.03:3000", help="Задержка заглушки Finam, мс")
+@click.option("--outage", is_flag=True, help="Дополнительно: сервис отвечает 500 на всё (автомат)")
+def main(requests, concurrency, latency, outage):
+    # Ограничитель частоты выключен: здесь меряется только слой устойчивости
+    os.environ.update({
+        "FINAM_CACHE": "0", "FINAM_CANDLE_STORE": "0", "FINAM_ACCESS_TOKEN": "bench", "FINAM_RATE_LIMIT": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    header = (f"{'схема':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'ошибки':>8}{'Finam':>8}{'лишних':>9}"
+              f"{'копий':>7}{'побед':>7}{'повт.':>7}{'отказов':>9}{'сек':>8}")
+    with ExitStack() as stack:
+        finam_url = start_standins(stack, latency, 0.0)
+        print(f"Задержка Finam: {latency}; {requests} запросов, конкурентность {concurrency}; мс")
+        print(header)
+        for name, enabled in (("без слоя", False), ("со слоем", True)):
+            print_row(name, asyncio.run(run_scheme(finam_url, requests, concurrency, enabled)), requests)
+
+    if outage:
+        with ExitStack() as stack:
+            finam_url = start_standins(stack, "const:200", 1.0)
+            count = min(requests, 200)
+            print(f"\nСбой Finam: 500 на каждый запрос через 200 мс; {count} запросов")
+            print(header)
+            for name, enabled in (("без слоя", False), ("со слоем", True)):
+                print_row(name, asyncio.run(run_scheme(finam_url, count, concurrency, enabled)), count)
+
+
+if __name__ == "__main__":
+    main()
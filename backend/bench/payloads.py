@@ -0,0 +1,231 @@
+"""
+Синтетические ответы Finam TradeAPI для бенчмарков.
+
+Формат совпадает с реальными ответами (числа обёрнуты в {"value": "..."}),
+данные — случайное блуждание с фиксированным seed, поэтому замеры повторяемы.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+
+def _decimal(value: float, digits: int = 2) -> Dict[str, str]:
+    return {"value": f"{value:.{digits}f}"}
+
+
+def bars_payload(
+    symbol: str = "SBER@MISX",
+    count: int = 250,
+    step: timedelta = timedelta(days=1),
+    seed: int = 1,
+    start: datetime | None = None,
+) -> Dict[str, Any]:
+    """Ответ /bars: count баров с шагом step, начиная со start (по умолчанию 2022-01-03)"""
+    rng = random.Random(seed)
+    moment = start or datetime(2022, 1, 3, 7, 0, tzinfo=timezone.utc)
+    price = 250.0
+    bars: List[Dict[str, Any]] = []
+    for _ in range(count):
+        open_ = price
+        close = max(1.0, open_ * (1 + rng.gauss(0, 0.01)))
+        high = max(open_, close) * (1 + abs(rng.gauss(0, 0.004)))
+        low = min(open_, close) * (1 - abs(rng.gauss(0, 0.004)))
+        bars.append({
+            "timestamp": moment.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "open": _decimal(open_),
+            "high": _decimal(high),
+            "low": _decimal(low),
+            "close": _decimal(close),
+            "volume": _decimal(rng.randint(1_000, 5_000_000), 0),
+        })
+        price = close
+        moment += step
+    return {"symbol": symbol, "bars": bars}
+
+
+def quote_payload(symbol: str = "SBER@MISX", last: float = 285.5, seed: int = 1) -> Dict[str, Any]:
+    """Ответ /quotes/latest"""
+    rng = random.Random(seed)
+    close = last * (1 - rng.gauss(0, 0.01))
+    return {
+        "symbol": symbol,
+        "quote": {
+            "symbol": symbol,
+            "timestamp": "2025-10-04T10:00:00Z",
+            "ask": _decimal(last + 0.01),
+            "ask_size": _decimal(rng.randint(1, 3000), 0),
+            "bid": _decimal(last - 0.01),
+            "bid_size": _decimal(rng.randint(1, 3000), 0),
+            "last": _decimal(last),
+            "last_size": _decimal(rng.randint(1, 100), 0),
+            "volume": _decimal(rng.randint(100_000, 50_000_000), 0),
+            "open": _decimal(close),
+            "high": _decimal(max(last, close) * 1.01),
+            "low": _decimal(min(last, close) * 0.99),
+            "close": _decimal(close),
+            "change": _decimal(last - close),
+        },
+    }
+
+
+def orderbook_payload(symbol: str = "SBER@MISX", depth: int = 50, mid: float = 285.5, tick: float = 0.01, seed: int = 1) -> Dict[str, Any]:
+    """Ответ /orderbook: depth уровней на каждую сторону"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(depth):
+        rows.append({"price": _decimal(mid + tick * (i + 1)), "sell_size": _decimal(rng.randint(1, 3000), 0), "action": "ACTION_ADD"})
+        rows.append({"price": _decimal(mid - tick * (i + 1)), "buy_size": _decimal(rng.randint(1, 3000), 0), "action": "ACTION_ADD"})
+    return {"symbol": symbol, "orderbook": {"rows": rows}}
+
+
+def orders_payload(count: int = 200, seed: int = 1) -> Dict[str, Any]:
+    """Ответ /accounts/{id}/orders"""
+    rng = random.Random(seed)
+    orders = []
+    for i in range(count):
+        orders.append({
+            "order_id": f"ORD{100000 + i}",
+            "exec_id": f"EX{200000 + i}",
+            "status": rng.choice(["ORDER_STATUS_FILLED", "ORDER_STATUS_NEW", "ORDER_STATUS_CANCELED"]),
+            "order": {
+                "account_id": "A12345",
+                "symbol": rng.choice(["SBER@MISX", "GAZP@MISX", "YNDX@MISX", "LKOH@MISX"]),
+                "quantity": _decimal(rng.randint(1, 100), 0),
+                "side": rng.choice(["SIDE_BUY", "SIDE_SELL"]),
+                "type": "ORDER_TYPE_LIMIT",
+                "time_in_force": "TIME_IN_FORCE_DAY",
+                "limit_price": _decimal(rng.uniform(100, 300)),
+            },
+            "transact_at": "2025-10-03T10:00:00Z",
+        })
+    return {"orders": orders}
+
+
+def trades_payload(count: int = 500, seed: int = 1) -> Dict[str, Any]:
+    """Ответ /accounts/{id}/trades"""
+    rng = random.Random(seed)
+    trades = [
+        {
+            "trade_id": f"T{300000 + i}",
+            "symbol": rng.choice(["SBER@MISX", "GAZP@MISX"]),
+            "price": _decimal(rng.uniform(100, 300)),
+            "size": _decimal(rng.randint(1, 100), 0),
+            "side": rng.choice(["SIDE_BUY", "SIDE_SELL"]),
+            "timestamp": "2025-10-03T10:00:00Z",
+            "order_id": f"ORD{100000 + i}",
+        }
+        for i in range(count)
+    ]
+    return {"trades": trades}
+
+
+def account_payload(positions: int = 30, seed: int = 1) -> Dict[str, Any]:
+    """Ответ /accounts/{id}"""
+    rng = random.Random(seed)
+    return {
+        "account_id": "A12345",
+        "type": "UNION",
+        "status": "ACCOUNT_ACTIVE",
+        "equity": _decimal(1_234_567.89),
+        "unrealized_profit": _decimal(-1_234.5),
+        "positions": [
+            {
+                "symbol": f"SYM{i}@MISX",
+                "quantity": _decimal(rng.randint(1, 1000), 0),
+                "average_price": _decimal(rng.uniform(10, 500)),
+                "current_price": _decimal(rng.uniform(10, 500)),
+            }
+            for i in range(positions)
+        ],
+        "cash": [{"currency_code": "RUB", "units": "10000", "nanos": 500000000}],
+    }
+
+
+# Известные инструменты для assets_payload: (symbol, название, тип)
+KNOWN_ASSETS = [
+    ("SBER@MISX", "Сбербанк России ПАО ао", "EQUITIES"),
+    ("SBERP@MISX", "Сбербанк России ПАО ап", "EQUITIES"),
+    ("GAZP@MISX", "Газпром ПАО ао", "EQUITIES"),
+    ("SIBN@MISX", "Газпром нефть ПАО ао", "EQUITIES"),
+    ("ROSN@MISX", "Роснефть НК ПАО ао", "EQUITIES"),
+    ("LKOH@MISX", "НК ЛУКОЙЛ ПАО ао", "EQUITIES"),
+    ("GMKN@MISX", "ГМК Норильский никель ПАО ао", "EQUITIES"),
+    ("VTBR@MISX", "Банк ВТБ ПАО ао", "EQUITIES"),
+    ("MGNT@MISX", "Магнит ПАО ао", "EQUITIES"),
+    ("AFLT@MISX", "Аэрофлот ПАО ао", "EQUITIES"),
+    ("NVTK@MISX", "НОВАТЭК ПАО ао", "EQUITIES"),
+    ("PLZL@MISX", "Полюс ПАО ао", "EQUITIES"),
+    ("YNDX@MISX", "Яндекс МКПАО ао", "EQUITIES"),
+    ("MTSS@MISX", "МТС ПАО ао", "EQUITIES"),
+    ("CHMF@MISX", "Северсталь ПАО ао", "EQUITIES"),
+    ("TATN@MISX", "Татнефть ПАО ао", "EQUITIES"),
+    ("TATNP@MISX", "Татнефть ПАО ап", "EQUITIES"),
+    ("SNGS@MISX", "Сургутнефтегаз ПАО ао", "EQUITIES"),
+    ("SNGSP@MISX", "Сургутнефтегаз ПАО ап", "EQUITIES"),
+    ("ALRS@MISX", "АЛРОСА ПАО ао", "EQUITIES"),
+    ("PHOR@MISX", "ФосАгро ПАО ао", "EQUITIES"),
+    ("OZON@MISX", "Озон Холдингс ПАО ао", "EQUITIES"),
+    ("TCSG@MISX", "ТКС Холдинг МКПАО ао", "EQUITIES"),
+    ("FIVE@MISX", "X5 Retail Group N.V. ДР", "EQUITIES"),
+    ("VKCO@MISX", "ВК МКПАО ао", "EQUITIES"),
+    ("PIKK@MISX", "ПИК СЗ ПАО ао", "EQUITIES"),
+    ("MOEX@MISX", "Московская Биржа ПАО ао", "EQUITIES"),
+    ("RUAL@MISX", "РУСАЛ МКПАО ао", "EQUITIES"),
+    ("IRAO@MISX", "Интер РАО ЕЭС ПАО ао", "EQUITIES"),
+    ("NLMK@MISX", "НЛМК ПАО ао", "EQUITIES"),
+    ("FEES@MISX", "ФСК - Россети ПАО ао", "EQUITIES"),
+    ("UPRO@MISX", "Юнипро ПАО ао", "EQUITIES"),
+    ("TRNFP@MISX", "Транснефть ПАО ап", "EQUITIES"),
+    ("RASP@MISX", "Распадская ПАО ао", "EQUITIES"),
+    ("AGRO@MISX", "РусАгро МКПАО ао", "EQUITIES"),
+    ("POLY@MISX", "Polymetal International plc", "EQUITIES"),
+    ("HEAD@MISX", "Хэдхантер МКПАО ао", "EQUITIES"),
+    ("DSKY@MISX", "Детский мир ПАО ао", "EQUITIES"),
+    ("AAPL@XNGS", "Apple Inc.", "EQUITIES"),
+    ("TSLA@XNGS", "Tesla, Inc.", "EQUITIES"),
+    ("MSFT@XNGS", "Microsoft Corporation", "EQUITIES"),
+    ("AMZN@XNGS", "Amazon.com, Inc.", "EQUITIES"),
+    ("SiZ5@RTSX", "Si-12.25 Курс доллар - рубль", "FUTURES"),
+    ("RIZ5@RTSX", "RTS-12.25 Индекс РТС", "FUTURES"),
+    ("SRZ5@RTSX", "SBRF-12.25 Сбербанк", "FUTURES"),
+    ("GZZ5@RTSX", "GAZR-12.25 Газпром", "FUTURES"),
+    ("TMOS@MISX", "БПИФ Т-Капитал Индекс МосБиржи", "FUNDS"),
+]
+
+_SYLLABLES = ["ро", "ка", "ми", "тех", "нов", "ал", "ен", "гро", "стр", "пром", "ин", "вест", "ар", "тон", "лин", "сол"]
+_LATIN_SYLLABLES = ["ma", "tro", "ni", "ko", "vel", "ar", "den", "sy", "lo", "ter", "qu", "pha", "gen", "tek"]
+
+
+def assets_payload(count: int = 20000, seed: int = 1) -> Dict[str, Any]:
+    """
+    Ответ /v1/assets: известные инструменты (KNOWN_ASSETS), облигации их
+    эмитентов и count синтетических инструментов со случайными названиями
+    на разных биржах — для замеров размера и скорости справочника
+    """
+    rng = random.Random(seed)
+    assets: List[Dict[str, Any]] = []
+
+    def add(symbol: str, name: str, type_: str) -> None:
+        ticker, _, mic = symbol.partition("@")
+        assets.append({
+            "symbol": symbol, "id": str(len(assets) + 1), "ticker": ticker, "mic": mic,
+            "isin": f"RU000A{len(assets):06d}", "type": type_, "name": name,
+        })
+
+    for symbol, name, type_ in KNOWN_ASSETS:
+        add(symbol, name, type_)
+    issuers = [name.split(" ПАО")[0] for _, name, type_ in KNOWN_ASSETS if " ПАО" in name]
+    for issuer in issuers:
+        for series in range(1, 4):
+            add(f"RU000A{rng.randint(100000, 999999)}@MISX", f"{issuer} ПАО БО-{series:02d}", "BONDS")
+    for i in range(count):
+        latin = rng.random() < 0.4
+        syllables = _LATIN_SYLLABLES if latin else _SYLLABLES
+        words = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        type_ = rng.choices(["EQUITIES", "BONDS", "FUNDS", "FUTURES"], weights=[4, 4, 1, 1])[0]
+        mic = rng.choice(["XNGS", "XNYS"]) if latin else rng.choice(["MISX", "MISX", "RTSX"])
+        suffix = (" Inc." if latin else " ПАО ао") if type_ == "EQUITIES" else (f" БО-{i % 20:02d}" if type_ == "BONDS" else "")
+        add(f"S{i:05d}@{mic}", " ".join(words) + suffix, type_)
+    return {"assets": assets}
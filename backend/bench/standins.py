@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Локальные заглушки Finam TradeAPI и OpenRouter для нагрузочных тестов.
+
+Finam: эндпоинты, которые вызывает FinamAPIClient, с синтетическими
+ответами из payloads.py (свечи — в запрошенном интервале и таймфрейме).
+OpenRouter: /chat/completions (обычный и потоковый режим); план строит
+IntentRouter без порога уверенности, на результаты API — короткий разбор.
+Ответ обрезается по max_tokens (finish_reason "length"); "слабые" модели
+(--llm-weak) отвечают быстрее, но часть планов портят — для каскада моделей.
+
+Задержка задаётся распределением (см. LatencyModel), доля ошибок —
+отдельно. --tick-ms — котировки меняются со временем (для хаба рыночных данных). GET /__stats и POST /__reset — счётчики запросов и ошибок.
+
+Использование:
+    python bench/standins.py --finam-port 9001 --llm-port 9002 \\
+        --finam-latency lognormal:40:0.5 --llm-latency lognormal:600:0.4 --llm-token-ms 15 \\
+        --llm-weak openai/gpt-4.1-nano=0.2:0.4
+"""
+
+import asyncio
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+import click
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from payloads import (  # noqa: E402
+    account_payload, assets_payload, bars_payload, orderbook_payload, orders_payload, quote_payload, trades_payload,
+)
+from utils.candle_store import TIMEFRAME_SECONDS  # noqa: E402
+from utils.finam_values import parse_timestamp  # noqa: E402
+from utils.intent_router import IntentRouter  # noqa: E402
+from utils.sessions import API_RESULT_PREFIX  # noqa: E402
+from utils.tokens import count_message_tokens, estimate_tokens  # noqa: E402
+
+# Больше баров за запрос заглушка не отдаёт (как и Finam, отдающий интервал частями)
+MAX_BARS = 1000
+
+PLANNER = IntentRouter(today=date(2025, 10, 4))
+
+ANALYSIS_TEXT = (
+    "Цена держится вблизи локального максимума: покупатели активнее продавцов, спред узкий. "
+    "Для входа разумно дождаться отката к поддержке и ограничить риск стоп-заявкой."
+)
+
+
+@dataclass
+class LatencyModel:
+    """
+    Распределение задержки, мс: "0", "const:50", "uniform:20:80",
+    "lognormal:<медиана>:<sigma>" или "pareto:<минимум>:<alpha>" (тяжёлый хвост).
+    Суффикс ",stall:<доля>:<мс>" — доля запросов, зависающих на столько мс сверх обычного.
+    """
+
+    kind: str = "const"
+    a: float = 0.0
+    b: float = 0.0
+    stall_rate: float = 0.0
+    stall_ms: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        spec, _, stall = spec.partition(",stall:")
+        stall_rate, stall_ms = ([float(v) for v in stall.split(":")] + [0.0, 0.0])[:2] if stall else (0.0, 0.0)
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls("const", float(parts[0]), stall_rate=stall_rate, stall_ms=stall_ms)
+        kind, *args = parts
+        if kind not in ("const", "uniform", "lognormal", "pareto"):
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+        values = [float(v) for v in args] + [0.0, 0.0]
+        return cls(kind, values[0], values[1], stall_rate, stall_ms)
+
+    def sample(self, rng: random.Random) -> float:
+        """Задержка в секундах"""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = self.a * rng.lognormvariate(0.0, self.b)
+        elif self.kind == "pareto":
+            ms = self.a * rng.paretovariate(self.b or 1.5)
+        else:
+            ms = self.a
+        if self.stall_rate and rng.random() < self.stall_rate:
+            ms += self.stall_ms
+        return max(0.0, ms) / 1000
+
+    def __str__(self) -> str:
+        base = f"{self.kind}:{self.a:g}:{self.b:g}" if self.kind != "const" else f"const:{self.a:g}"
+        return base + (f",stall:{self.stall_rate:g}:{self.stall_ms:g}" if self.stall_rate else "")
+
+
+@dataclass
+class WeakModel:
+    """Слабая модель: доля испорченных планов и множитель задержки"""
+
+    error_rate: float
+    speed: float = 1.0
+
+    @classmethod
+    def parse(cls, spec: str) -> Dict[str, "WeakModel"]:
+        """Разбор "model=0.2:0.4,model2=0.1": доля ошибок и множитель задержки по модели"""
+        models = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            model, _, values = item.partition("=")
+            numbers = [float(v) for v in values.split(":")] + [1.0]
+            models[model] = cls(numbers[0], numbers[1])
+        return models
+
+
+def degrade_plan(content: str, rng: random.Random) -> str:
+    """Типичные ошибки слабой модели: тикер без площадки, выдуманный метод, текст вместо вызова"""
+    if not content.startswith("API_CALL:"):
+        return content
+    kind = rng.choice(("symbol", "method", "text"))
+    if kind == "symbol" and "@" in content:
+        return re.sub(r"@[A-Z]+", "", content)
+    if kind == "method":
+        return re.sub(r"API_CALL: (\w+)", r"API_CALL: \1_info", content)
+    return "Уточните, пожалуйста, какой инструмент вас интересует."
+
+
+def truncate(content: str, max_tokens: int | None) -> tuple[str, str]:
+    """Ответ в пределах max_tokens и finish_reason"""
+    if not max_tokens or estimate_tokens(content) <= max_tokens:
+        return content, "stop"
+    words = content.split(" ")
+    while len(words) > 1 and estimate_tokens(" ".join(words)) > max_tokens:
+        words.pop()
+    return " ".join(words), "length"
+
+
+class Counters:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.limited = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return {"requests": self.requests, "errors": self.errors, "limited": self.limited}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = self.errors = self.limited = 0
+
+
+def _add_service_routes(app: FastAPI, counters: Counters) -> None:
+    @app.get("/__stats")
+    async def stats() -> Dict[str, int]:
+        return counters.snapshot()
+
+    @app.post("/__reset")
+    async def reset() -> Dict[str, int]:
+        counters.reset()
+        return counters.snapshot()
+
+
+async def _delay_or_fail(
+    latency: LatencyModel, error_rate: float, rng: random.Random, counters: Counters, scale: float = 1.0
+) -> bool:
+    """Выдержать задержку; True — ответить ошибкой"""
+    with counters.lock:
+        counters.requests += 1
+        failed = rng.random() < error_rate
+        if failed:
+            counters.errors += 1
+        delay = latency.sample(rng) * scale
+    if delay:
+        await asyncio.sleep(delay)
+    return failed
+
+
+def _stable(key: str) -> int:
+    """Детерминированный между запусками хэш (hash() строк рандомизирован)"""
+    return zlib.crc32(key.encode())
+
+
+@lru_cache(maxsize=4096)
+def _bars(symbol: str, timeframe: str, start: str | None, end: str | None) -> bytes:
+    step = TIMEFRAME_SECONDS.get(timeframe, 86400)
+    end_ts = parse_timestamp(end) if end else parse_timestamp("2025-10-04T00:00:00Z")
+    start_ts = parse_timestamp(start) if start else end_ts - 365 * 86400
+    count = max(0, min(MAX_BARS, (end_ts - start_ts) // step + 1))
+    first = datetime.fromtimestamp(end_ts - (count - 1) * step, tz=timezone.utc)
+    payload = bars_payload(symbol, count=count, step=timedelta(seconds=step), seed=_stable(symbol) % 1000, start=first)
+    return json.dumps(payload).encode()
+
+
+@lru_cache(maxsize=1024)
+def _canned(kind: str, key: str = "", size: int = 0, step: int = 0) -> bytes:
+    if kind == "quote":
+        # step > 0 — номер тика: цена колеблется вокруг базовой в пределах ±1%
+        base = 100 + _stable(key) % 300
+        last = round(base * (1 + ((_stable(f"{key}:{step}") % 201) - 100) / 10000), 2) if step else base
+        payload = quote_payload(key, last=last)
+    elif kind == "orderbook":
+        payload = orderbook_payload(key, depth=size, mid=100 + _stable(key) % 300)
+    elif kind == "account":
+        payload = account_payload(positions=10)
+        payload["account_id"] = key
+    elif kind == "orders":
+        payload = orders_payload(count=50)
+    elif kind == "trades":
+        payload = trades_payload(count=100)
+    elif kind == "assets":
+        payload = assets_payload(count=size)
+    else:
+        raise KeyError(kind)
+    return json.dumps(payload).encode()
+
+
+def finam_app(
+    latency: LatencyModel, error_rate: float = 0.0, seed: int = 0, tick_ms: float = 0.0, rate_limit: float = 0.0
+) -> FastAPI:
+    """
+    Заглушка Finam TradeAPI; tick_ms > 0 — котировки меняются раз в tick_ms,
+    rate_limit > 0 — сверх стольких запросов в секунду ответ 429 с Retry-After
+    """
+    app = FastAPI()
+    counters = Counters()
+    rng = random.Random(seed)
+    _add_service_routes(app, counters)
+    # Корзина лимита на токен: [токены, время обновления]
+    bucket = [rate_limit, time.monotonic()]
+
+    def over_limit() -> bool:
+        if not rate_limit:
+            return False
+        now = time.monotonic()
+        bucket[0] = min(rate_limit, bucket[0] + (now - bucket[1]) * rate_limit)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return True
+        bucket[0] -= 1
+        return False
+
+    def raw(body: bytes) -> Response:
+        return Response(body, media_type="application/json")
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        if request.url.path.startswith("/__"):
+            return await call_next(request)
+        if over_limit():
+            with counters.lock:
+                counters.requests += 1
+                counters.limited += 1
+            return JSONResponse(
+                {"code": 8, "message": "too many requests (stand-in)"}, status_code=429, headers={"Retry-After": "1"}
+            )
+        if await _delay_or_fail(latency, error_rate, rng, counters):
+            return JSONResponse({"code": 13, "message": "internal error (stand-in)"}, status_code=500)
+        return await call_next(request)
+
+    @app.get("/v1/instruments/{symbol}/quotes/latest")
+    async def quote(symbol: str):
+        step = int(time.time() * 1000 // tick_ms) if tick_ms else 0
+        return raw(_canned("quote", symbol, step=step))
+
+    @app.get("/v1/instruments/{symbol}/orderbook")
+    async def orderbook(symbol: str, depth: int = 10):
+        return raw(_canned("orderbook", symbol, max(1, min(depth, 50))))
+
+    @app.get("/v1/instruments/{symbol}/bars")
+    async def bars(request: Request, symbol: str, timeframe: str = "TIME_FRAME_D"):
+        params = request.query_params
+        return raw(_bars(symbol, timeframe, params.get("interval.start_time"), params.get("interval.end_time")))
+
+    @app.get("/v1/accounts/{account_id}")
+    async def account(account_id: str):
+        return raw(_canned("account", account_id))
+
+    @app.get("/v1/accounts/{account_id}/orders")
+    async def orders(account_id: str):
+        return raw(_canned("orders"))
+
+    @app.get("/v1/accounts/{account_id}/orders/{order_id}")
+    async def order(account_id: str, order_id: str):
+        return dict(json.loads(_canned("orders"))["orders"][0], order_id=order_id)
+
+    @app.post("/v1/accounts/{account_id}/orders")
+    async def create_order(account_id: str, request: Request):
+        body = await request.json()
+        return {"order_id": f"ORD{rng.randint(100000, 999999)}", "status": "ORDER_STATUS_NEW", "order": body}
+
+    @app.delete("/v1/accounts/{account_id}/orders/{order_id}")
+    async def cancel_order(account_id: str, order_id: str):
+        return {"order_id": order_id, "status": "ORDER_STATUS_CANCELED"}
+
+    @app.get("/v1/accounts/{account_id}/trades")
+    async def trades(account_id: str):
+        return raw(_canned("trades"))
+
+    @app.get("/v1/assets")
+    async def assets():
+        return raw(_canned("assets", size=20000))
+
+    @app.post("/v1/sessions/details")
+    async def session_details():
+        return {"created_at": "2025-10-01T00:00:00Z", "expires_at": "2025-10-05T00:00:00Z", "account_ids": ["A12345"]}
+
+    return app
+
+
+def plan_reply(messages: List[Dict[str, str]]) -> str:
+    """Ответ "модели": вызов API для вопроса или разбор результатов"""
+    question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    if question.startswith(API_RESULT_PREFIX):
+        return ANALYSIS_TEXT
+    intent = PLANNER.route(question)
+    if intent.method and (intent.params or not intent.rule.endswith("without_symbol")):
+        return f"API_CALL: {intent.method}\nPARAMS: {json.dumps(intent.params, ensure_ascii=False)}"
+    return "Этот вопрос не требует обращения к API. " + ANALYSIS_TEXT
+
+
+def openrouter_app(
+    latency: LatencyModel,
+    error_rate: float = 0.0,
+    token_ms: float = 0.0,
+    seed: int = 0,
+    weak: Dict[str, WeakModel] | None = None,
+) -> FastAPI:
+    """
+    Заглушка OpenRouter. latency — время до первого фрагмента ответа,
+    token_ms — время генерации одного фрагмента (слова), в том числе без stream.
+    weak — слабые модели по имени (см. WeakModel), остальные отвечают без ошибок.
+    """
+    weak = weak or {}
+    app = FastAPI()
+    counters = Counters()
+    rng = random.Random(seed)
+    _add_service_routes(app, counters)
+
+    @app.post("/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = weak.get(body.get("model") or "")
+        if await _delay_or_fail(latency, error_rate, rng, counters, model.speed if model else 1.0):
+            return JSONResponse({"error": {"message": "upstream error (stand-in)", "code": 502}}, status_code=502)
+        content = plan_reply(messages)
+        if model and rng.random() < model.error_rate:
+            content = degrade_plan(content, rng)
+        content, finish_reason = truncate(content, body.get("max_tokens"))
+        usage = {
+            "prompt_tokens": count_message_tokens(messages),
+            "completion_tokens": estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        words = content.split(" ")
+        word_ms = token_ms * (model.speed if model else 1.0)
+        if not body.get("stream"):
+            # Генерация идёт с той же скоростью, что и в потоке: token_ms на фрагмент (слово)
+            if word_ms:
+                await asyncio.sleep(word_ms * len(words) / 1000)
+            return {
+                "id": "gen-standin",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        async def stream():
+            yield ": OPENROUTER PROCESSING\n\n"
+            for i, word in enumerate(words):
+                delta = word if i == len(words) - 1 else word + " "
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]}, ensure_ascii=False)}\n\n"
+                if word_ms:
+                    await asyncio.sleep(word_ms / 1000)
+            yield f"data: {json.dumps({'choices': [{'delta': {}}], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--finam-port", type=int, default=9001)
+@click.option("--llm-port", type=int, default=9002)
+@click.option("--finam-latency", default="lognormal:40:0.5", help="Задержка Finam, мс (см. LatencyModel)")
+@click.option("--llm-latency", default="lognormal:600:0.4", help="Задержка LLM до первого токена, мс")
+@click.option("--llm-token-ms", type=float, default=10.0, help="Время генерации фрагмента (слова) ответа LLM, мс")
+@click.option("--finam-errors", type=float, default=0.0, help="Доля ответов Finam с ошибкой 500")
+@click.option("--llm-errors", type=float, default=0.0, help="Доля ответов LLM с ошибкой 502")
+@click.option("--llm-weak", default="", help="Слабые модели: model=доля_ошибок[:множитель_задержки],...")
+@click.option("--tick-ms", type=float, default=0.0, help="Период изменения котировок Finam, мс (0 — цены неизменны)")
+@click.option("--finam-rate-limit", type=float, default=0.0, help="Лимит Finam, запросов/с; сверх него 429 (0 — без лимита)")
+@click.option("--seed", type=int, default=0)
+def main(
+    host, finam_port, llm_port, finam_latency, llm_latency, llm_token_ms, finam_errors, llm_errors, llm_weak,
+    tick_ms, finam_rate_limit, seed,
+):
+    """Запустить обе заглушки в одном процессе"""
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            finam_app(LatencyModel.parse(finam_latency), finam_errors, seed, tick_ms, finam_rate_limit),
+            host=host, port=finam_port, log_level="warning", access_log=False,
+        )),
+        uvicorn.Server(uvicorn.Config(
+            openrouter_app(LatencyModel.parse(llm_latency), llm_errors, llm_token_ms, seed, WeakModel.parse(llm_weak)),
+            host=host, port=llm_port, log_level="warning", access_log=False,
+        )),
+    ]
+    print(f"Finam: http://{host}:{finam_port}, OpenRouter: http://{host}:{llm_port}", flush=True)
+
+    async def serve():
+        await asyncio.gather(*(server.serve() for server in servers))
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
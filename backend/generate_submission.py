@@ -4,151 +4,57 @@
 
 Использование:
     python scripts/generate_submission.py --test test.csv --output submission.csv
+    python scripts/generate_submission.py --test test.csv --concurrency 16 --rps 5
+    python scripts/generate_submission.py --test test.csv --resume
+
+Каждый ответ сразу пишется в журнал (по умолчанию <output>.journal.db рядом
+с submission.csv); --resume пропускает уже готовые uid, после прогона
+submission.csv собирается из журнала в порядке test.csv.
 """
 
+import asyncio
 import csv
 import os
 import sys
+from datetime import date
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict
 
 import click
-import httpx
 from dotenv import load_dotenv
 
+from utils.batch import run_batch
+from utils.cascade import ModelCascade
+from utils.instruments import InstrumentDirectory
+from utils.intent_router import IntentRouter
+from utils.journal import ResultJournal
+from utils.llm_cache import LLMCache
+from utils.openrouter import close_llm_client, get_llm_client
+from utils.prompts import PromptCompiler
+from utils.registry import METHODS, ApiCall, parse_api_calls
+from utils.tokens import count_message_tokens
+
 load_dotenv()
 
-SYSTEM_PROMPT = """
-Ты — AI-ассистент трейдера, интегрированный с Finam TradeAPI через Python-клиент. 
-Твоя задача — возвращать вызов метода клиента строго в формате:
-
-API_CALL: <название_метода>
-PARAMS: {"ключ": "значение", ...}
-
-
----
-
-## 📚 Важные факты из документации (REST API Finam)
-
-### Подключение и авторизация  
-- Все запросы идут к базовому пути REST API Finam. ([tradeapi.finam.ru](https://tradeapi.finam.ru/docs/guides/rest/))  
-- Токен / авторизация управляется на стороне клиента / HTTP-заголовков (вне твоей ответственности).  
-
-### Счета (Accounts)  
-- `/accounts` — информация по счетам.  
-- `/accounts/{account_id}` — данные по конкретному счету.  
-
-### Инструменты (Instruments)  
-- `/instruments` — список инструментов / фильтрация.  
-- `/instruments/{symbol}/quotes/latest` — котировка по инструменту.  
-- `/instruments/{symbol}/orderbook` — стакан заявок.  
-- `/instruments/{symbol}/bars` — исторические данные (свечи) / бары.  
-
-### Заявки и ордера (Orders / Trades)  
-- `/accounts/{account_id}/orders` — все заявки по счёту.  
-- `/accounts/{account_id}/orders/{order_id}` — конкретная заявка.  
-- `/accounts/{account_id}/trades` — сделки по счёту (с возможностью фильтрации по времени)  
-- Отмена заявки: `DELETE /accounts/{account_id}/orders/{order_id}`  
-- Создать заявку: `POST /accounts/{account_id}/orders`  
-
----
-
-📌 Доступные методы:
-- get_quote(symbol: str)
-- get_orderbook(symbol: str, depth: int = 10)
-- get_candles(symbol: str, timeframe: str = "D", start: str | None = None, end: str | None = None)
-- get_account(account_id: str) → account_id НЕ передавать
-- get_orders(account_id: str)
-- get_order(account_id: str, order_id: str) → только order_id
-- create_order(account_id: str, order_data)
-- cancel_order(account_id: str, order_id: str)
-- get_trades(account_id: str, start: str | None = None, end: str | None = None)
-- get_positions(account_id: str)
-
-⚠️ Правила:
-- Никогда не передавай account_id в PARAMS — он добавляется автоматически.
-- Если метод неочевиден, выбери ближайший по смыслу (например: цена → get_quote, история → get_candles, заявки → get_orders, позиции → get_positions).
-- Никогда не придумывай неизвестных методов и не используй пустые вызовы.
-- Все строки — только в JSON-формате с двойными кавычками.
-- Биржа: MISX
-- Сегодня: 2025-10-04
-- Формат времени: 2025-01-01T00:00:00Z
-
-Примеры:
-
-Пользователь: Какая цена у Сбербанка?
-AI:
-API_CALL: get_quote
-PARAMS: {"symbol": "SBER@MISX"}
-
-Пользователь: Изменение цены Сбера с января?
-AI:
-API_CALL: get_candles
-PARAMS: {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D", "start": "2025-01-01T00:00:00Z", "end": "2025-10-04T00:00:00Z"}
-"""
+# Дата "сегодня" из промпта; по ней же роутер считает относительные периоды
+PROMPT_TODAY = date(2025, 10, 4)
 
-METHOD_TO_HTTP = {
-    "get_quote": ("GET", "/v1/instruments/{symbol}/quotes/latest"),
-    "get_orderbook": ("GET", "/v1/instruments/{symbol}/orderbook"),
-    "get_candles": ("GET", "/v1/instruments/{symbol}/bars"),
-    "get_account": ("GET", "/v1/accounts/{account_id}"),
-    "get_orders": ("GET", "/v1/accounts/{account_id}/orders"),
-    "get_order": ("GET", "/v1/accounts/{account_id}/orders/{order_id}"),
-    "get_trades": ("GET", "/v1/accounts/{account_id}/trades"),
-    "get_positions": ("GET", "/v1/accounts/{account_id}"),
-    "create_order": ("POST", "/v1/accounts/{account_id}/orders"),
-    "cancel_order": ("DELETE", "/v1/accounts/{account_id}/orders/{order_id}"),
-}
-
-
-def call_openrouter(messages: List[Dict[str, str]], model: str = "openai/gpt-4o-mini") -> Dict[str, Any]:
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY не установлен")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "HTTP-Referer": "https://github.com/your-project",
-        "X-Title": "Finam API Assistant",
-        "Content-Type": "application/json",
-    }
-
-    json_data = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.0,
-        "max_tokens": 128, 
-    }
-
-    with httpx.Client(timeout=30.0) as client:
-        response = client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=json_data,
-        )
-        response.raise_for_status()
-        return response.json()
+# Справочник инструментов только из снимка (INSTRUMENTS_SNAPSHOT): без запросов к Finam
+INSTRUMENTS = InstrumentDirectory(refresh_interval=0)
+INTENT_ROUTER = IntentRouter(today=PROMPT_TODAY, instruments=INSTRUMENTS, local_orders=True)
+# Системный промпт собирается под тему вопроса (utils/prompts.py)
+PROMPTS = PromptCompiler("submission", today=PROMPT_TODAY, router=INTENT_ROUTER)
 
+METHOD_TO_HTTP = {name: (spec.http_method, spec.path) for name, spec in METHODS.items()}
 
-def extract_api_call(text: str):
-    import re
-    import json
 
-    if "API_CALL:" not in text:
-        return None, None
+def parse_api_call(text: str) -> List[ApiCall]:
+    """Первый вызов из ответа LLM списком (формат разбора для каскада)"""
+    return parse_api_calls(text)[:1]
 
-    call_match = re.search(r"API_CALL:\s*(\w+)", text)
-    params_match = re.search(r"PARAMS:\s*(\{.*?\})", text, re.DOTALL)
 
-    if not call_match or not params_match:
-        return None, None
-
-    method = call_match.group(1)
-    try:
-        params = json.loads(params_match.group(1))
-        return method, params
-    except Exception:
-        return None, None
+# Роутер → быстрая модель → сильная модель; каждому вопросу нужен вызов API (utils/cascade.py)
+CASCADE = ModelCascade(INTENT_ROUTER, parse=parse_api_call, strong_max_tokens=128, require_call=True)
 
 
 def convert_to_http_request(method_name: str, params: dict, account_id: str) -> tuple[str, str]:
@@ -168,7 +74,7 @@ def convert_to_http_request(method_name: str, params: dict, account_id: str) ->
         path = path.replace("{account_id}", account_id)
 
     query_params = []
-    if method_name == "get_candles":
+    if method_name in ("get_candles", "get_indicators"):
         if "timeframe" in params:
             query_params.append(f"tf={params['timeframe']}")
         if "start" in params:
@@ -187,7 +93,11 @@ def convert_to_http_request(method_name: str, params: dict, account_id: str) ->
     return http_method, path
 
 
-def smart_fallback(question: str) -> tuple[str, str]:
+def smart_fallback(question: str, uid: str = "{account_id}") -> tuple[str, str]:
+    intent = INTENT_ROUTER.route(question)
+    if intent.method and (intent.params or not intent.rule.endswith("without_symbol")):
+        return convert_to_http_request(intent.method, intent.params, account_id=uid)
+
     q = question.lower()
     if any(w in q for w in ["цена", "котировка", "quote"]):
         return "GET", "/v1/instruments/SBER@MISX/quotes/latest"
@@ -200,37 +110,121 @@ def smart_fallback(question: str) -> tuple[str, str]:
     return "GET", "/v1/instruments"
 
 
-def process_question(uid: str, question: str) -> tuple[str, str]:
-    """Возвращает (http_method, request_path) для вопроса"""
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": question},
-    ]
+async def process_question(uid: str, question: str) -> tuple[str, str, int, bool]:
+    """
+    Возвращает (http_method, request_path, токены промпта LLM, ошибка LLM) для вопроса.
+    При ошибке LLM ответ — эвристика smart_fallback, такой вопрос стоит повторить.
+    """
+    messages: List[Dict[str, str]] = []
+
+    def build_messages() -> List[Dict[str, str]]:
+        prompt = PROMPTS.compile(question)
+        hint = INSTRUMENTS.hint(question)
+        messages[:] = (
+            prompt.system_messages()
+            + ([{"role": "system", "content": hint}] if hint else [])
+            + [{"role": "user", "content": question}]
+        )
+        return messages
 
     try:
-        response = call_openrouter(messages)
-        llm_text = response["choices"][0]["message"]["content"]
+        result = await CASCADE.plan(question, build_messages)
+    except Exception as e:
+        print(f"⚠️ Ошибка для вопроса '{question[:50]}...': {e}", file=sys.stderr)
+        return (*smart_fallback(question, uid), count_message_tokens(messages), True)
+
+    # Оценка токенов промпта по всем запросам к LLM (быстрая и сильная модель)
+    prompt_tokens = count_message_tokens(messages) * (len(result.attempts) - 1) if messages else 0
+    if result.calls:
+        method_name, params = result.calls[0]
+        return (*convert_to_http_request(method_name, params, account_id=uid), prompt_tokens, False)
+    return (*smart_fallback(question, uid), prompt_tokens, False)
+
+
+async def process_all(
+    questions: List[Dict[str, str]],
+    concurrency: int = 8,
+    rps: float | None = None,
+    cache: bool = True,
+    journal: ResultJournal | None = None,
+) -> List[Dict[str, str]]:
+    """Обработать вопросы; с journal каждый результат записывается сразу по готовности"""
+    llm_client = get_llm_client()
+    if not cache and llm_client.cache is not None:
+        llm_client.cache.close()
+        llm_client.cache = None
+    elif llm_client.cache is None:
+        llm_client.cache = LLMCache()
+    llm_cache = llm_client.cache
+
+    # uid -> оценка токенов промпта LLM (вопросы, разобранные роутером, сюда не попадают)
+    prompt_tokens: Dict[str, int] = {}
+
+    async def worker(item: Dict[str, str]) -> Dict[str, str]:
+        http_method, request_path, tokens, llm_failed = await process_question(item["uid"], item["question"])
+        if tokens:
+            prompt_tokens[item["uid"]] = tokens
+        result = {"uid": item["uid"], "type": http_method, "request": request_path}
+        if journal is not None:
+            journal.append(item["uid"], item["question"], result, prompt_tokens=tokens, retry=llm_failed)
+        return result
+
+    def report(index: int, item: Dict[str, str], result: Dict[str, str]) -> None:
+        tokens = prompt_tokens.get(result["uid"])
+        suffix = f" (LLM, ~{tokens} ток.)" if tokens else ""
+        print(f"✅ {result['uid']}: {result['type']} {result['request']}{suffix}")
 
-        method_name, params = extract_api_call(llm_text)
+    try:
+        results, stats = await run_batch(questions, worker, concurrency=concurrency, rps=rps, on_result=report)
+        cache_stats = llm_cache.stats() if llm_cache is not None else None
+        usage = llm_client.usage_stats()
+        cascade_stats = CASCADE.stats()
+    finally:
+        await close_llm_client()
+
+    print(f"\n⏱️ {stats.summary()}")
+    if cache_stats is not None:
+        print(f"🗄️ Кэш LLM: {cache_stats['hits']} попаданий, {cache_stats['misses']} промахов")
+    if prompt_tokens:
+        total_tokens = sum(prompt_tokens.values())
+        print(
+            f"🧮 Промпты LLM: {len(prompt_tokens)} запросов, ~{total_tokens} токенов "
+            f"(в среднем ~{total_tokens // len(prompt_tokens)}); по данным провайдера: "
+            f"{usage['prompt_tokens']} промпт, {usage['cached_prompt_tokens']} из кэша префиксов, "
+            f"{usage['completion_tokens']} ответ"
+        )
+    tiers = [
+        f"{name} {tier['accepted']}/{tier['calls']}" + (f" (${tier['cost_usd']:.4f})" if tier["cost_usd"] else "")
+        for name, tier in cascade_stats.items() if tier["calls"]
+    ]
+    print(f"🪜 Каскад (принято/запросов): {', '.join(tiers)}")
+    return results
 
-        if method_name and params is not None:
-            http_method, request_path = convert_to_http_request(method_name, params, account_id=uid)
-            return http_method, request_path
-        else:
-            return smart_fallback(question)
 
-    except Exception as e:
-        print(f"⚠️ Ошибка для вопроса '{question[:50]}...': {e}", file=sys.stderr)
-        return smart_fallback(question)
+def write_submission(path: Path, results: List[Dict[str, str]]) -> None:
+    """Записать submission.csv атомарно (через временный файл)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["uid", "type", "request"], delimiter=";")
+        writer.writeheader()
+        writer.writerows(results)
+    os.replace(tmp_path, path)
 
 
 @click.command()
 @click.option("--test", "-t", type=click.Path(exists=True), default="test.csv", help="Путь к test.csv")
 @click.option("--output", "-o", type=click.Path(), default="submission.csv", help="Путь к submission.csv")
-def main(test: str, output: str):
+@click.option("--concurrency", "-c", type=int, default=8, show_default=True, help="Число одновременных запросов")
+@click.option("--rps", type=float, default=0.0, help="Ограничение запросов в секунду (0 — без ограничения)")
+@click.option("--cache/--no-cache", default=True, show_default=True, help="Кэшировать ответы LLM на диске")
+@click.option("--journal", type=click.Path(), default=None, help="Журнал результатов (по умолчанию <output>.journal.db)")
+@click.option("--resume", is_flag=True, help="Продолжить прерванный прогон: пропустить готовые uid из журнала")
+def main(test: str, output: str, concurrency: int, rps: float, cache: bool, journal: str | None, resume: bool):
     """Генерация submission.csv"""
     test_path = Path(test)
     output_path = Path(output)
+    journal_path = Path(journal) if journal else output_path.with_suffix(".journal.db")
 
     questions = []
     with open(test_path, encoding="utf-8") as f:
@@ -239,20 +233,38 @@ def main(test: str, output: str):
             questions.append({"uid": row["uid"], "question": row["question"]})
 
     print(f"Загружено {len(questions)} вопросов из {test_path}")
+    if INSTRUMENTS.load_snapshot():
+        print(f"Справочник инструментов: {len(INSTRUMENTS.index)} из {INSTRUMENTS.snapshot_path}")
 
-    results = []
-    for item in questions:
-        uid = item["uid"]
-        question = item["question"]
-        http_method, request_path = process_question(uid, question)
-        results.append({"uid": uid, "type": http_method, "request": request_path})
-        print(f"✅ {uid}: {http_method} {request_path}")
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["uid", "type", "request"], delimiter=";")
-        writer.writeheader()
-        writer.writerows(results)
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+    results_journal = ResultJournal(str(journal_path))
+    try:
+        pending = questions
+        if resume:
+            done = {result["uid"] for result in results_journal.results(questions, include_retry=False)}
+            pending = [item for item in questions if item["uid"] not in done]
+            print(f"Продолжение по журналу {journal_path}: готово {len(done)}, осталось {len(pending)}")
+        else:
+            results_journal.clear()
+
+        if pending:
+            try:
+                asyncio.run(process_all(
+                    pending, concurrency=concurrency, rps=rps or None, cache=cache, journal=results_journal
+                ))
+            except KeyboardInterrupt:
+                saved = len(results_journal.results(questions))
+                print(f"\n⏸️ Прервано: в журнале {saved} из {len(questions)}; продолжить — с флагом --resume",
+                      file=sys.stderr)
+                sys.exit(130)
+
+        results = results_journal.results(questions)
+    finally:
+        results_journal.close()
+
+    if len(results) < len(questions):
+        print(f"⚠️ В журнале нет ответов на {len(questions) - len(results)} вопросов", file=sys.stderr)
+    write_submission(output_path, results)
 
     print(f"\n🎉 Готово! Результат сохранён в {output_path}")
 
@@ -1,14 +1,64 @@
-from fastapi import FastAPI
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 # from fastapi.middleware.cors import CORSMiddleware
 from api import local
 # from starlette.staticfiles import StaticFiles
 # from core.config import settings
 from dotenv import load_dotenv
+from utils.finam import AsyncFinamAPIClient
+from utils.log import get_logger, log_event
+from utils.market_hub import MarketHub
+from utils.metrics import HTTP_REQUEST_SECONDS, server_timing, stage_totals, start_request_timing
+from utils.openrouter import get_llm_client, close_llm_client
 
 
 load_dotenv()
 
-app = FastAPI()
+logger = get_logger("http")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Один пул соединений к Finam и к LLM на весь процесс
+    app.state.finam_client = AsyncFinamAPIClient()
+    # Один цикл опроса на горячий инструмент для всех сессий и живой карточки цены
+    app.state.market_hub = MarketHub(app.state.finam_client)
+    app.state.finam_client.demand_listeners.append(app.state.market_hub.touch)
+    # Справочник инструментов: снимок с диска, затем список активов из Finam и периодическое обновление
+    local.INSTRUMENTS.start(app.state.finam_client)
+    get_llm_client()
+    yield
+    await local.INSTRUMENTS.stop()
+    await app.state.market_hub.stop()
+    await app.state.finam_client.aclose()
+    await close_llm_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """Server-Timing по этапам запроса, гистограмма длительности и выборочный лог"""
+    timings = start_request_timing()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    # Для потоковых ответов здесь известно только время до заголовков
+    if not response.headers.get("content-type", "").startswith("text/event-stream"):
+        response.headers["Server-Timing"] = server_timing(timings, total=elapsed)
+    # Параметров в путях API нет, поэтому путь запроса годится как метка; неизвестные пути — одной меткой
+    path = request.url.path if request.scope.get("route") is not None else "unmatched"
+    HTTP_REQUEST_SECONDS.observe(elapsed, path=path, status=str(response.status_code))
+    log_event(
+        logger, "http.request", logging.INFO,
+        method=request.method, path=path, status=response.status_code, ms=round(elapsed * 1000, 1),
+        stages=stage_totals(timings),
+    )
+    return response
 
 
 app.include_router(local.router, prefix="/api/local", tags=["local"])
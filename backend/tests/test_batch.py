@@ -0,0 +1,54 @@
+"""
+Пакетная обработка (utils/batch.py): исключение воркера останавливает
+весь пул — остальные воркеры отменяются, новые задачи не берутся.
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.batch import run_batch  # noqa: E402
+
+
+def test_results_in_order():
+    async def worker(item: int) -> int:
+        await asyncio.sleep(0.001 * (5 - item))
+        return item * 2
+
+    results, stats = asyncio.run(run_batch(list(range(5)), worker, concurrency=3))
+    assert results == [0, 2, 4, 6, 8]
+    assert stats.total == 5 and stats.errors == 0
+
+
+def test_worker_error_cancels_siblings():
+    started, finished, cancelled = [], [], []
+
+    async def worker(item: int) -> int:
+        started.append(item)
+        if item == 1:
+            raise ValueError("сломанный воркер")
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        finished.append(item)
+        return item
+
+    async def scenario():
+        with pytest.raises(ValueError, match="сломанный воркер"):
+            await run_batch(list(range(20)), worker, concurrency=4)
+        # После возврата из run_batch в фоне ничего не выполняется
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert started == [0, 1, 2, 3]
+    assert finished == []
+    assert sorted(cancelled) == [0, 2, 3]
@@ -0,0 +1,39 @@
+"""
+Кэш ответов Finam: свечи кэшируются бессрочно, только когда закрыт и
+последний бар интервала (end_time + длительность таймфрейма <= сейчас).
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.finam_cache import _is_closed_interval  # noqa: E402
+
+NOW = datetime(2025, 10, 4, 12, 0, tzinfo=timezone.utc)
+
+
+def bars(timeframe: str, end: datetime) -> dict:
+    return {"timeframe": timeframe, "interval.end_time": end.isoformat().replace("+00:00", "Z")}
+
+
+@pytest.mark.parametrize("timeframe,seconds", [("TIME_FRAME_M1", 60), ("TIME_FRAME_H1", 3600), ("TIME_FRAME_D", 86400)])
+def test_closed_only_after_last_bar_ends(timeframe, seconds):
+    end = NOW - timedelta(seconds=seconds)
+    assert _is_closed_interval(bars(timeframe, end), NOW)
+    assert not _is_closed_interval(bars(timeframe, end + timedelta(seconds=1)), NOW)
+
+
+def test_daily_bar_ending_minutes_ago_is_open():
+    assert not _is_closed_interval(bars("TIME_FRAME_D", NOW - timedelta(minutes=5)), NOW)
+
+
+def test_unknown_timeframe_or_no_end_is_open():
+    assert not _is_closed_interval(bars("TIME_FRAME_X", NOW - timedelta(days=365)), NOW)
+    assert not _is_closed_interval({"timeframe": "TIME_FRAME_D"}, NOW)
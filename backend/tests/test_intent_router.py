@@ -0,0 +1,64 @@
+"""
+Роутер намерений: выставление и отмену заявок без LLM разбирает только
+генерация submission; вопросы и отрицания о заявках — не поручения.
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.intent_router import DEFAULT_THRESHOLD, IntentRouter  # noqa: E402
+
+TODAY = date(2025, 10, 4)
+
+# Вопросы "как", "можно ли", "почему", "сколько стоит" и отрицания
+NOT_ORDERS = [
+    ("Как отменить ордер ORD123?", "cancel_order"),
+    ("Как мне снять заявку ORD123", "cancel_order"),
+    ("Не отменяй заявку ORD777, просто покажи статус", "cancel_order"),
+    ("Сколько стоит купить 10 акций Сбера?", "create_order"),
+    ("Можно ли купить 100 акций SBER@MISX?", "create_order"),
+    ("Почему не исполнилась заявка на покупку 10 акций SBER@MISX по 250?", "create_order"),
+    ("Не покупай 10 акций SBER@MISX", "create_order"),
+    ("Как купить 10 акций SBER@MISX по рынку", "create_order"),
+]
+
+ORDERS = [
+    ("Отмени заявку ORD123", "cancel_order"),
+    ("Купи 10 акций SBER@MISX по 250", "create_order"),
+]
+
+
+@pytest.mark.parametrize("local_orders", [False, True])
+@pytest.mark.parametrize("text,method", NOT_ORDERS)
+def test_questions_and_negations_go_to_llm(text, method, local_orders):
+    router = IntentRouter(today=TODAY, local_orders=local_orders)
+    intent = router.route(text)
+    assert not (intent.method == method and intent.is_confident(DEFAULT_THRESHOLD))
+
+
+@pytest.mark.parametrize("text,method", ORDERS)
+def test_orders_need_llm_in_chat(text, method):
+    intent = IntentRouter(today=TODAY).route(text)
+    assert intent.method == method
+    assert not intent.is_confident(DEFAULT_THRESHOLD)
+
+
+@pytest.mark.parametrize("text,method", ORDERS)
+def test_orders_routed_locally_for_submission(text, method):
+    intent = IntentRouter(today=TODAY, local_orders=True).route(text)
+    assert intent.method == method
+    assert intent.is_confident(DEFAULT_THRESHOLD)
+
+
+def test_get_order_stays_local():
+    intent = IntentRouter(today=TODAY).route("Покажи заявку ORD123")
+    assert intent.method == "get_order"
+    assert intent.is_confident(DEFAULT_THRESHOLD)
@@ -0,0 +1,51 @@
+"""
+Интерес к инструментам от клиента Finam: хаб рыночных данных начинает
+опрашивать инструмент только после успешного ответа, иначе тикер от LLM
+вроде FOO@XXXX занимал бы слот хаба на MARKET_HUB_IDLE_TTL.
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.update({"FINAM_CACHE": "0", "FINAM_CANDLE_STORE": "0", "FINAM_RATE_LIMIT": "0"})
+
+from utils.finam import AsyncFinamAPIClient  # noqa: E402
+from utils.market_hub import MarketHub  # noqa: E402
+
+QUOTE = {"symbol": "SBER@MISX", "quote": {"last": {"value": "250.1"}}}
+
+
+async def scenario():
+    client = AsyncFinamAPIClient(base_url="http://127.0.0.1:1", http2=False)
+
+    async def execute_request(method, path, **kwargs):
+        if "SBER@MISX" in path:
+            return QUOTE
+        return {"error": "HTTP 404", "details": "instrument not found"}
+
+    client.execute_request = execute_request
+    hub = MarketHub(client, idle_ttl=300, max_symbols=1)
+    client.demand_listeners.append(hub.touch)
+    try:
+        assert "error" in await client.get_quote("FOO@XXXX")
+        assert "error" in await client.get_orderbook("FOO@XXXX")
+        assert hub.stats()["hot"] == []
+
+        # Единственный слот достаётся настоящему инструменту
+        assert await client.get_quote("SBER@MISX") == QUOTE
+        assert hub.stats()["hot"] == ["SBER@MISX:quote"]
+        assert hub.rejected == 0
+    finally:
+        await hub.stop()
+        await client.aclose()
+
+
+def test_invalid_symbol_starts_no_poll_loop():
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+"""
+Разбор API_CALL/PARAMS из ответа LLM (utils/registry.py) — общий для чата
+и генерации submission.
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generate_submission import parse_api_call  # noqa: E402
+from utils.registry import format_api_call, parse_api_calls  # noqa: E402
+
+ORDER = {
+    "symbol": "SBER@MISX", "quantity": {"value": "10"}, "side": "SIDE_BUY",
+    "type": "ORDER_TYPE_LIMIT", "limit_price": {"value": "250"},
+}
+
+
+def test_nested_params_are_not_truncated():
+    text = f"Выставляю заявку.\n{format_api_call('create_order', ORDER)}\nГотово."
+    assert parse_api_calls(text) == [("create_order", ORDER)]
+    assert parse_api_call(text) == [("create_order", ORDER)]
+
+
+def test_several_calls_pair_with_their_params():
+    text = 'API_CALL: get_quote\nPARAMS: {"symbol": "SBER@MISX"}\nAPI_CALL: get_orderbook\nPARAMS: {"symbol": "GAZP@MISX"}'
+    assert parse_api_calls(text) == [("get_quote", {"symbol": "SBER@MISX"}), ("get_orderbook", {"symbol": "GAZP@MISX"})]
+    assert parse_api_call(text) == [("get_quote", {"symbol": "SBER@MISX"})]
+
+
+def test_broken_or_missing_params_are_skipped():
+    assert parse_api_calls("API_CALL: get_quote\nPARAMS: {\"symbol\": ") == []
+    assert parse_api_calls("API_CALL: get_quote\nAPI_CALL: get_orderbook\nPARAMS: {}") == [("get_orderbook", {})]
+    assert parse_api_calls("Просто текст") == []
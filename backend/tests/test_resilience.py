@@ -0,0 +1,82 @@
+"""
+Автомат Upstream: пробный вызов в half_open, не дошедший до сервиса
+(дедлайн истёк в очереди ограничителя или вызов отменён), не должен
+оставлять автомат в half_open навсегда.
+
+Запуск из backend/:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.resilience import (  # noqa: E402
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CallPolicy,
+    CircuitBreaker,
+    DeadlineExceeded,
+    Upstream,
+)
+
+POLICY = CallPolicy("GET /test", deadline=0.2, retries=0)
+
+
+def make_upstream() -> Upstream:
+    breaker = CircuitBreaker(window=2, min_calls=2, failure_rate=0.5, reset_timeout=0.01)
+    return Upstream("test", breaker=breaker, enabled=True)
+
+
+async def broken() -> None:
+    raise httpx.ConnectError("connection refused")
+
+
+async def healthy() -> str:
+    return "ok"
+
+
+async def open_breaker(upstream: Upstream) -> None:
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            await upstream.call(POLICY, broken)
+    assert upstream.breaker.state == OPEN
+    await asyncio.sleep(0.02)
+
+
+async def slow_admit() -> None:
+    await asyncio.sleep(10)
+
+
+def test_probe_released_when_deadline_expires_in_admit():
+    async def scenario():
+        upstream = make_upstream()
+        await open_breaker(upstream)
+        with pytest.raises(DeadlineExceeded):
+            await upstream.call(POLICY, healthy, admit=slow_admit)
+        assert upstream.breaker.state == HALF_OPEN
+        assert await upstream.call(POLICY, healthy) == "ok"
+        assert upstream.breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_probe_released_when_cancelled_in_admit():
+    async def scenario():
+        upstream = make_upstream()
+        await open_breaker(upstream)
+        task = asyncio.ensure_future(upstream.call(POLICY, healthy, admit=slow_admit))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await upstream.call(POLICY, healthy) == "ok"
+        assert upstream.breaker.state == CLOSED
+
+    asyncio.run(scenario())
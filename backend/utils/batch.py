@@ -0,0 +1,124 @@
+"""
+Конкурентная пакетная обработка: ограниченный пул воркеров на asyncio,
+общий rate limiter и статистика задержек.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Sequence, TypeVar
+
+from utils.ratelimit import TokenBucket
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Перцентиль q (0..100) методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class BatchStats:
+    """Итоги пакетного прогона"""
+
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 95)
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} задач за {self.elapsed:.1f} с, "
+            f"{self.throughput:.2f} задач/с, "
+            f"p50 {self.p50 * 1000:.0f} мс, p95 {self.p95 * 1000:.0f} мс, "
+            f"ошибок {self.errors}"
+        )
+
+
+async def run_batch(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[R]],
+    concurrency: int = 8,
+    rps: float | None = None,
+    on_result: Callable[[int, T, R], Any] | None = None,
+) -> tuple[List[R], BatchStats]:
+    """
+    Обработать `items` функцией `worker` не более чем в `concurrency` потоков.
+
+    Args:
+        items: Входные элементы
+        worker: Асинхронная функция обработки одного элемента
+        concurrency: Размер пула воркеров
+        rps: Ограничение запусков в секунду (None или 0 — без ограничения)
+        on_result: Колбэк (index, item, result) по мере завершения задач
+
+    Returns:
+        (результаты в исходном порядке, статистика)
+
+    Raises:
+        Исключение воркера: ожидаемые сбои воркер сам превращает в результат, поэтому
+        исключение — ошибка прогона; остальные воркеры отменяются, новые задачи не берутся
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(items):
+        queue.put_nowait((index, item))
+
+    limiter = TokenBucket(rps) if rps else None
+    results: List[Any] = [None] * len(items)
+    stats = BatchStats()
+
+    async def run_worker() -> None:
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if limiter:
+                await limiter.acquire()
+            started = time.perf_counter()
+            try:
+                results[index] = await worker(item)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.latencies.append(time.perf_counter() - started)
+            if on_result:
+                on_result(index, item, results[index])
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(run_worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        failed = next((task for task in done if not task.cancelled() and task.exception() is not None), None)
+        if failed is not None:
+            raise failed.exception()  # type: ignore[misc]
+    finally:
+        # Первая ошибка (или отмена вызывающего) останавливает весь пул, а не только свой воркер
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats.elapsed = time.perf_counter() - started
+    return results, stats
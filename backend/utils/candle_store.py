@@ -0,0 +1,206 @@
+"""
+Локальное хранилище свечей: по одному ряду на (symbol, timeframe).
+
+Каждый ряд хранится колонками (timestamp, open, high, low, close, volume)
+в отдельных бинарных файлах и читается через np.memmap, так что запросы
+к уже скачанному диапазону обслуживаются с диска без копирования.
+Рядом лежит meta.json с покрытым интервалом — внутри него бары считаются
+полностью загруженными (выходные и пустые периоды тоже "покрыты").
+В хранилище попадают только закрытые бары.
+"""
+
+import json
+import os
+import re
+import time
+from os.path import dirname, join
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.finam_values import format_timestamp, parse_timestamp, to_float
+
+DEFAULT_STORE_DIR = join(dirname(__file__), "..", "candles")
+
+COLUMNS: Dict[str, np.dtype] = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+
+# Длительность бара, сек — для отсечения незакрытых баров
+TIMEFRAME_SECONDS: Dict[str, int] = {
+    "TIME_FRAME_M1": 60,
+    "TIME_FRAME_M5": 5 * 60,
+    "TIME_FRAME_M15": 15 * 60,
+    "TIME_FRAME_M30": 30 * 60,
+    "TIME_FRAME_H1": 3600,
+    "TIME_FRAME_H2": 2 * 3600,
+    "TIME_FRAME_H4": 4 * 3600,
+    "TIME_FRAME_H8": 8 * 3600,
+    "TIME_FRAME_D": 86400,
+    "TIME_FRAME_W": 7 * 86400,
+    "TIME_FRAME_MN": 31 * 86400,
+    "TIME_FRAME_QR": 92 * 86400,
+}
+
+Bars = Dict[str, np.ndarray]
+
+
+def empty_bars() -> Bars:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def bars_from_response(response: Dict[str, Any]) -> Bars:
+    """Ответ /bars -> колонки numpy, отсортированные по времени"""
+    rows = response.get("bars") or []
+    columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+    for i, bar in enumerate(rows):
+        columns["timestamp"][i] = parse_timestamp(bar["timestamp"])
+        for name in ("open", "high", "low", "close", "volume"):
+            value = to_float(bar.get(name))
+            columns[name][i] = np.nan if value is None else value
+    order = np.argsort(columns["timestamp"], kind="stable")
+    return {name: column[order] for name, column in columns.items()}
+
+
+def bars_to_response(symbol: str, bars: Bars) -> Dict[str, Any]:
+    """Колонки -> ответ в формате Finam /bars"""
+    rows = []
+    for i in range(len(bars["timestamp"])):
+        row: Dict[str, Any] = {"timestamp": format_timestamp(bars["timestamp"][i])}
+        for name in ("open", "high", "low", "close", "volume"):
+            row[name] = {"value": repr(float(bars[name][i]))}
+        rows.append(row)
+    return {"symbol": symbol, "bars": rows}
+
+
+def concat_bars(*parts: Bars) -> Bars:
+    """Склеить ряды; при совпадении timestamp побеждает более поздний ряд"""
+    parts = tuple(p for p in parts if len(p["timestamp"]))
+    if not parts:
+        return empty_bars()
+    merged = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+    # последнее вхождение каждого timestamp: unique по развёрнутому массиву
+    reversed_ts = merged["timestamp"][::-1]
+    _, first_in_reversed = np.unique(reversed_ts, return_index=True)
+    keep = len(reversed_ts) - 1 - first_in_reversed
+    return {name: column[keep] for name, column in merged.items()}
+
+
+class CandleStore:
+    """Колоночное хранилище закрытых баров на memory-mapped файлах"""
+
+    def __init__(self, root: str | None = None) -> None:
+        """
+        Args:
+            root: Каталог хранилища (FINAM_CANDLE_STORE_DIR)
+        """
+        self.root = root or os.getenv("FINAM_CANDLE_STORE_DIR") or DEFAULT_STORE_DIR
+        self._mapped: Dict[Tuple[str, str], Tuple[Bars, Optional[Tuple[int, int]]]] = {}
+
+    @staticmethod
+    def supports(timeframe: str) -> bool:
+        return timeframe in TIMEFRAME_SECONDS
+
+    def _series_dir(self, symbol: str, timeframe: str) -> str:
+        safe_symbol = re.sub(r"[^\w@.-]", "_", symbol)
+        return join(self.root, safe_symbol, timeframe)
+
+    def load(self, symbol: str, timeframe: str) -> Tuple[Bars, Optional[Tuple[int, int]]]:
+        """Весь ряд (memmap-колонки) и покрытый интервал [start, end] или None"""
+        key = (symbol, timeframe)
+        if key in self._mapped:
+            return self._mapped[key]
+
+        series_dir = self._series_dir(symbol, timeframe)
+        meta_path = join(series_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return empty_bars(), None
+
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        count = meta["count"]
+        if count:
+            bars = {
+                name: np.memmap(join(series_dir, f"{name}.bin"), dtype=dtype, mode="r", shape=(count,))
+                for name, dtype in COLUMNS.items()
+            }
+        else:
+            bars = empty_bars()
+        result = (bars, (meta["covered_start"], meta["covered_end"]))
+        self._mapped[key] = result
+        return result
+
+    def read(self, symbol: str, timeframe: str, start: int, end: int) -> Bars:
+        """Бары в [start, end] — срезы memmap, без копирования"""
+        bars, _ = self.load(symbol, timeframe)
+        timestamps = bars["timestamp"]
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        hi = int(np.searchsorted(timestamps, end, side="right"))
+        return {name: column[lo:hi] for name, column in bars.items()}
+
+    def missing(self, symbol: str, timeframe: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Интервалы, которых нет в хранилище и которые нужно докачать"""
+        _, coverage = self.load(symbol, timeframe)
+        if coverage is None:
+            return [(start, end)]
+        covered_start, covered_end = coverage
+        if start > covered_end or end < covered_start:
+            return [(start, end)]
+        gaps = []
+        if start < covered_start:
+            gaps.append((start, covered_start))
+        if end > covered_end:
+            gaps.append((covered_end, end))
+        return gaps
+
+    def closed_until(self, timeframe: str, now: float | None = None) -> int:
+        """Все бары с timestamp не позже этого момента уже закрыты"""
+        now = time.time() if now is None else now
+        return int(now) - TIMEFRAME_SECONDS[timeframe]
+
+    def merge(self, symbol: str, timeframe: str, fresh: Bars, start: int, end: int) -> None:
+        """
+        Добавить скачанные бары за [start, end] и расширить покрытие.
+        Незакрытые бары не сохраняются; несмежный интервал заменяет ряд.
+        """
+        closed_until = self.closed_until(timeframe)
+        end = min(end, closed_until)
+        if end < start:
+            return
+        mask = (fresh["timestamp"] >= start) & (fresh["timestamp"] <= end)
+        fresh = {name: column[mask] for name, column in fresh.items()}
+
+        bars, coverage = self.load(symbol, timeframe)
+        if coverage is None or start > coverage[1] or end < coverage[0]:
+            merged, new_coverage = concat_bars(fresh), (start, end)
+        else:
+            merged = concat_bars(bars, fresh)
+            new_coverage = (min(start, coverage[0]), max(end, coverage[1]))
+
+        self._write(symbol, timeframe, merged, new_coverage)
+
+    def _write(self, symbol: str, timeframe: str, bars: Bars, coverage: Tuple[int, int]) -> None:
+        series_dir = self._series_dir(symbol, timeframe)
+        os.makedirs(series_dir, exist_ok=True)
+        self._mapped.pop((symbol, timeframe), None)
+
+        for name, dtype in COLUMNS.items():
+            np.ascontiguousarray(bars[name], dtype=dtype).tofile(join(series_dir, f"{name}.bin.tmp"))
+
+        # Без meta.json ряд считается отсутствующим: прерванная запись не оставит
+        # рассогласованных колонок
+        meta_path = join(series_dir, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name in COLUMNS:
+            os.replace(join(series_dir, f"{name}.bin.tmp"), join(series_dir, f"{name}.bin"))
+
+        meta = {"count": int(len(bars["timestamp"])), "covered_start": int(coverage[0]), "covered_end": int(coverage[1])}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
@@ -0,0 +1,281 @@
+"""
+Каскад моделей для шага планирования (какой метод API вызвать).
+
+Уровни по возрастанию цены: локальный роутер намерений → быстрая дешёвая
+модель с маленьким max_tokens → сильная модель. Ответ уровня принимается,
+если прошёл проверку по реестру методов (метод известен, обязательные
+параметры на месте, тикер в формате TICKER@BOARD) и не выглядит
+неуверенным; иначе вопрос уходит на следующий уровень.
+
+Модели: LLM_FAST_MODEL (по умолчанию openai/gpt-4.1-nano) и LLM_STRONG_MODEL
+(по умолчанию модель клиента, OPENROUTER_MODEL). LLM_CASCADE=0 — сразу
+сильная модель (роутер остаётся первым уровнем).
+"""
+
+import os
+import re
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.batch import percentile
+from utils.intent_router import Intent, IntentRouter
+from utils.metrics import CASCADE_DECISIONS, record
+from utils.openrouter import call_llm, get_llm_client
+from utils.registry import ApiCall, format_api_call, validate_call
+
+DEFAULT_FAST_MODEL = "openai/gpt-4.1-nano"
+
+# Цена, USD за 1M токенов (промпт, ответ) — для отчёта о стоимости уровней
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "openai/gpt-4.1-nano": (0.10, 0.40),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "openai/gpt-4.1-mini": (0.40, 1.60),
+    "openai/gpt-4.1": (2.00, 8.00),
+    "openai/gpt-4o": (2.50, 10.00),
+    "google/gemini-2.0-flash-001": (0.10, 0.40),
+    "anthropic/claude-3.5-haiku": (0.80, 4.00),
+}
+
+FULL_SYMBOL_RE = re.compile(r"^[A-Z0-9][A-Z0-9._-]*@[A-Z]{3,5}$")
+
+# Предварительный (неуверенный) разбор роутера не ниже этого порога должен
+# совпадать по методу с ответом быстрой модели, иначе — эскалация
+AGREE_FLOOR = 0.5
+
+
+@dataclass(frozen=True)
+class Tier:
+    """Уровень каскада; model=None — локальный роутер"""
+
+    name: str
+    model: Optional[str] = None
+    max_tokens: int = 128
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    accepted: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    # Последние задержки для перцентилей (долгоживущий процесс не копит их бесконечно)
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=4096))
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+
+@dataclass
+class Attempt:
+    """Ответ одного уровня: разобранные вызовы и причина отказа (None — принят)"""
+
+    tier: str
+    calls: List[ApiCall]
+    rejected: Optional[str]
+    seconds: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+
+@dataclass
+class CascadeResult:
+    """Итог каскада: текст ответа ассистента и вызовы принятого уровня"""
+
+    text: str
+    tier: str
+    calls: List[ApiCall]
+    attempts: List[Attempt]
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(attempt.prompt_tokens for attempt in self.attempts)
+
+    @property
+    def cost(self) -> float:
+        return sum(attempt.cost for attempt in self.attempts)
+
+
+def price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Стоимость запроса в USD по MODEL_PRICES (0 для неизвестной модели)"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def check_calls(calls: List[ApiCall]) -> Optional[str]:
+    """Проверка вызовов по реестру: None, если все выполнимы"""
+    for method, params in calls:
+        # Счёт подставляет вызывающий код, здесь проверяется только сам вызов
+        error = validate_call(method, params, account_id="-")
+        if error:
+            return "unknown_method" if error.startswith("Метод не найден") else "missing_params"
+        symbol = params.get("symbol")
+        if symbol is not None and not FULL_SYMBOL_RE.match(str(symbol)):
+            return "bad_symbol"
+    return None
+
+
+class ModelCascade:
+    """Планирование вызова API по уровням: роутер → быстрая модель → сильная модель"""
+
+    def __init__(
+        self,
+        router: IntentRouter,
+        parse: Callable[[str], List[ApiCall]],
+        fast_model: Optional[str] = None,
+        strong_model: Optional[str] = None,
+        fast_max_tokens: int = 96,
+        strong_max_tokens: int = 1024,
+        require_call: bool = False,
+        enabled: Optional[bool] = None,
+        fast_deadline: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            router: Роутер намерений (первый уровень и предварительный разбор)
+            parse: Разбор ответа LLM в список вызовов (API_CALL/PARAMS)
+            fast_model: Быстрая модель (LLM_FAST_MODEL)
+            strong_model: Сильная модель (LLM_STRONG_MODEL, по умолчанию модель клиента)
+            fast_max_tokens: max_tokens быстрой модели — хватает на один вызов с параметрами
+            strong_max_tokens: max_tokens сильной модели
+            require_call: Ответ обязан быть вызовом API (генерация submission);
+                в чате текстовый ответ допустим, если в вопросе нет темы данных
+            enabled: Использовать быструю модель (LLM_CASCADE, по умолчанию да)
+            fast_deadline: Дедлайн быстрой модели, сек (LLM_FAST_DEADLINE); сбой или
+                истёкший дедлайн — эскалация на сильную модель, а не ошибка
+        """
+        if enabled is None:
+            enabled = os.getenv("LLM_CASCADE", "1").lower() in ("1", "true", "yes")
+        self.router = router
+        self.parse = parse
+        self.require_call = require_call
+        self.fast_deadline = fast_deadline or float(os.getenv("LLM_FAST_DEADLINE", "10"))
+        fast_model = fast_model or os.getenv("LLM_FAST_MODEL") or DEFAULT_FAST_MODEL
+        self._strong_model = strong_model or os.getenv("LLM_STRONG_MODEL")
+        self.tiers: List[Tier] = [Tier("router")]
+        if enabled:
+            self.tiers.append(Tier("fast", fast_model, fast_max_tokens))
+        self.tiers.append(Tier("strong", self._strong_model, strong_max_tokens))
+        self._stats: Dict[str, TierStats] = {tier.name: TierStats() for tier in self.tiers}
+
+    def strong_model(self) -> str:
+        # Модель клиента известна только после его создания (get_llm_client)
+        return self._strong_model or get_llm_client().model
+
+    def _review(
+        self, tier: Tier, question: str, draft: Intent, text: str, finish_reason: Optional[str]
+    ) -> Tuple[List[ApiCall], Optional[str]]:
+        """Вызовы из ответа уровня и причина отказа; draft — неуверенный разбор роутера"""
+        calls = self.parse(text)
+        if not calls:
+            if "API_CALL:" in text:
+                return calls, "unparsed"
+            if finish_reason == "length":
+                return calls, "truncated"
+            if self.require_call or self.router.topics(question) - {"unsupported"}:
+                return calls, "no_call"
+            return calls, None
+        problem = check_calls(calls)
+        if problem:
+            return calls, problem
+        if tier.name != "strong":
+            if draft.method and draft.confidence >= AGREE_FLOOR and draft.method != calls[0][0]:
+                return calls, "router_disagrees"
+        return calls, None
+
+    def _account(self, attempt: Attempt) -> None:
+        stats = self._stats[attempt.tier]
+        stats.calls += 1
+        stats.latencies.append(attempt.seconds)
+        stats.prompt_tokens += attempt.prompt_tokens
+        stats.completion_tokens += attempt.completion_tokens
+        stats.cost += attempt.cost
+        if attempt.rejected is None:
+            stats.accepted += 1
+        else:
+            stats.rejected[attempt.rejected] += 1
+        CASCADE_DECISIONS.inc(tier=attempt.tier, outcome=attempt.rejected or "accepted")
+
+    async def plan(
+        self,
+        question: str,
+        messages: Callable[[], List[Dict[str, str]]],
+        temperature: float = 0.0,
+        stage: str = "llm_plan",
+    ) -> CascadeResult:
+        """
+        Спланировать ответ на вопрос.
+
+        Args:
+            question: Вопрос пользователя (для роутера и проверок)
+            messages: Сборка сообщений для LLM (вызывается только если роутер не справился)
+            temperature: Температура запросов к LLM
+            stage: Префикс этапа для метрик (этап уровня — `<stage>_<tier>`)
+
+        Returns:
+            Ответ принятого уровня; если не принят ни один — ответ сильной модели как есть
+        """
+        attempts: List[Attempt] = []
+        started = time.perf_counter()
+        intent = self.router.route(question)
+        router_attempt = Attempt("router", [], "low_confidence", time.perf_counter() - started)
+        if intent.is_confident(self.router.threshold):
+            router_attempt.calls = [(intent.method, intent.params)]
+            router_attempt.rejected = None
+        record("route", router_attempt.seconds)
+        self._account(router_attempt)
+        attempts.append(router_attempt)
+        if router_attempt.rejected is None:
+            return CascadeResult(format_api_call(intent.method, intent.params), "router", router_attempt.calls, attempts)
+
+        built = messages()
+        text = ""
+        for tier in self.tiers[1:]:
+            model = tier.model or self.strong_model()
+            started = time.perf_counter()
+            try:
+                response = await call_llm(
+                    built, temperature=temperature, max_tokens=tier.max_tokens, model=model,
+                    stage=f"{stage}_{tier.name}", deadline=self.fast_deadline if tier.name == "fast" else None,
+                )
+            except RuntimeError:
+                if tier is self.tiers[-1]:
+                    raise
+                attempt = Attempt(tier.name, [], "error", time.perf_counter() - started)
+                self._account(attempt)
+                attempts.append(attempt)
+                continue
+            choice = response["choices"][0]
+            text = choice["message"]["content"]
+            usage = response.get("usage") or {}
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or 0
+            calls, rejected = self._review(tier, question, intent, text, choice.get("finish_reason"))
+            attempt = Attempt(
+                tier.name, calls, rejected, time.perf_counter() - started,
+                prompt_tokens, completion_tokens, price(model, prompt_tokens, completion_tokens),
+            )
+            self._account(attempt)
+            attempts.append(attempt)
+            if rejected is None:
+                return CascadeResult(text, tier.name, calls, attempts)
+        return CascadeResult(text, "strong", attempts[-1].calls, attempts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика по уровням: вызовы, принятые ответы, причины эскалации, задержка, токены, стоимость"""
+        report = {}
+        for tier in self.tiers:
+            stats = self._stats[tier.name]
+            report[tier.name] = {
+                "model": tier.model or ("local" if tier.name == "router" else self.strong_model()),
+                "calls": stats.calls,
+                "accepted": stats.accepted,
+                "rejected": dict(stats.rejected),
+                "p50_ms": round(percentile(stats.latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(stats.latencies, 95) * 1000, 1),
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cost_usd": round(stats.cost, 6),
+            }
+        return report
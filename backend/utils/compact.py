@@ -0,0 +1,199 @@
+"""
+Компактное представление ответов Finam для передачи в LLM.
+
+Вместо repr() сырого JSON (каждое число обёрнуто в {"value": "..."}):
+- свечи — колонки o/h/l/c/v и сводка по всему периоду
+  (first/last/min/max/return/volatility);
+- стакан — топ-N уровней с накопленным объёмом, спред и середина;
+- списки заявок, сделок и позиций — первые N элементов и общее число.
+
+Размер результата ограничивается бюджетом токенов: при превышении число
+баров / уровней / элементов уменьшается пропорционально перерасходу,
+пока результат не поместится.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.candle_store import TIMEFRAME_SECONDS, bars_from_response
+from utils.finam_values import format_timestamp, to_float
+from utils.orderbook import book_from_response
+from utils.tokens import estimate_tokens
+
+# Бюджет токенов на результаты всех вызовов одного хода
+DEFAULT_TOKEN_BUDGET = int(os.getenv("API_RESULT_TOKEN_BUDGET", "1500"))
+PROBE_ITEMS = 8
+
+# Компактор разбирает ответ один раз и возвращает функцию, которая строит
+# представление с не более чем `limit` барами / уровнями / элементами
+Render = Callable[[int], Dict[str, Any]]
+Compactor = Callable[[Dict[str, Any], Dict[str, Any]], Render]
+
+
+def _num(value: Optional[float], digits: int = 4) -> Any:
+    """Число покороче: целые без ".0", остальные округлены"""
+    if value is None or not np.isfinite(value):
+        return None
+    value = round(float(value), digits)
+    return int(value) if value.is_integer() else value
+
+
+def plain(value: Any) -> Any:
+    """Раскрыть обёртки Finam: {"value": "285.5"} -> 285.5, деньги units/nanos -> число"""
+    if isinstance(value, dict):
+        if set(value) == {"value"}:
+            number = to_float(value["value"])
+            return _num(number) if number is not None else value["value"]
+        if "units" in value and set(value) <= {"units", "nanos", "currency_code"}:
+            amount = float(value.get("units") or 0) + float(value.get("nanos") or 0) / 1e9
+            if "currency_code" in value:
+                return {"amount": _num(amount), "currency": value["currency_code"]}
+            return _num(amount)
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, float):
+        return _num(value)
+    return value
+
+
+def compact_bars(params: Dict[str, Any], response: Dict[str, Any]) -> Render:
+    bars = bars_from_response(response)
+    count = len(bars["timestamp"])
+    head: Dict[str, Any] = {
+        "symbol": response.get("symbol") or params.get("symbol"),
+        "timeframe": params.get("timeframe"),
+        "bars": count,
+    }
+    if count:
+        close, low, high = bars["close"], bars["low"], bars["high"]
+        log_returns = np.diff(np.log(close))
+        head["stats"] = {
+            "from": format_timestamp(bars["timestamp"][0]),
+            "to": format_timestamp(bars["timestamp"][-1]),
+            "first_open": _num(bars["open"][0]),
+            "last_close": _num(close[-1]),
+            "min_low": _num(np.nanmin(low)),
+            "max_high": _num(np.nanmax(high)),
+            "return_pct": _num((close[-1] / bars["open"][0] - 1) * 100, 2),
+            "volatility_pct": _num(np.nanstd(log_returns) * 100, 3) if len(log_returns) else None,
+            "volume": _num(np.nansum(bars["volume"]), 0),
+        }
+    intraday = TIMEFRAME_SECONDS.get(params.get("timeframe") or "", 86400) < 86400
+    times = np.datetime_as_string(bars["timestamp"].astype("datetime64[s]"), unit="m" if intraday else "D")
+
+    def render(limit: int) -> Dict[str, Any]:
+        if not count:
+            return head
+        # Колонки — только последние `limit` баров; сводка считается по всем
+        shown = slice(max(0, count - limit), count)
+        result = dict(head)
+        if count > limit:
+            result["shown"] = f"последние {limit}"
+        result["columns"] = {
+            "t": times[shown].tolist(),
+            **{name[0]: np.round(bars[name][shown], 4).tolist() for name in ("open", "high", "low", "close", "volume")},
+        }
+        return result
+    return render
+
+
+def compact_orderbook(params: Dict[str, Any], response: Dict[str, Any]) -> Render:
+    book = book_from_response(response, params.get("symbol", ""))
+    head: Dict[str, Any] = {
+        "symbol": book.symbol,
+        "levels": {"bids": len(book.bid_prices), "asks": len(book.ask_prices)},
+        "total_size": {"bids": _num(book.bid_sizes.sum()), "asks": _num(book.ask_sizes.sum())},
+    }
+    if book.spread is not None:
+        head["spread"] = _num(book.spread)
+        head["mid"] = _num(book.mid)
+    head["format"] = "[price, size, cumulative_size]"
+
+    def levels(prices: np.ndarray, sizes: np.ndarray, limit: int) -> List[List[Any]]:
+        rows = np.column_stack([prices[:limit], sizes[:limit], np.cumsum(sizes[:limit])])
+        return [[_num(value) for value in row] for row in rows.tolist()]
+
+    def render(limit: int) -> Dict[str, Any]:
+        return {
+            **head,
+            "bids": levels(book.bid_prices, book.bid_sizes, limit),
+            "asks": levels(book.ask_prices, book.ask_sizes, limit),
+        }
+    return render
+
+
+def _compact_list(key: str) -> Compactor:
+    def compact(params: Dict[str, Any], response: Dict[str, Any]) -> Render:
+        items = response.get(key)
+        head = plain({k: v for k, v in response.items() if k != key})
+
+        def render(limit: int) -> Dict[str, Any]:
+            if not isinstance(items, list):
+                return head
+            result = {**head, "total": len(items)}
+            if len(items) > limit:
+                result["shown"] = f"первые {limit}"
+            result[key] = plain(items[:limit])
+            return result
+        return render
+    return compact
+
+
+def _compact_plain(params: Dict[str, Any], response: Dict[str, Any]) -> Render:
+    result = plain(response)
+    return lambda limit: result
+
+
+COMPACTORS: Dict[str, Compactor] = {
+    "get_candles": compact_bars,
+    "get_orderbook": compact_orderbook,
+    "get_orders": _compact_list("orders"),
+    "get_trades": _compact_list("trades"),
+    "get_positions": _compact_list("positions"),
+    "get_account": _compact_list("positions"),
+}
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _collection_size(method_name: str, response: Dict[str, Any]) -> int:
+    if method_name == "get_candles":
+        return len(response.get("bars") or [])
+    if method_name == "get_orderbook":
+        return len((response.get("orderbook") or {}).get("rows") or [])
+    return max((len(v) for v in response.values() if isinstance(v, list)), default=0)
+
+
+def compact_result(method_name: str, params: Dict[str, Any], response: Dict[str, Any], budget: Optional[int] = None) -> str:
+    """Результат вызова в компактном JSON, не длиннее `budget` токенов"""
+    budget = budget or DEFAULT_TOKEN_BUDGET
+    if "error" in response:
+        return _dumps(response)
+
+    render = COMPACTORS.get(method_name, _compact_plain)(params, response)
+    size = _collection_size(method_name, response)
+    limit = max(1, size)
+    if size > PROBE_ITEMS:
+        # Оценка размера одного элемента по пробному рендеру, чтобы не
+        # сериализовать длинные ряды целиком
+        base = estimate_tokens(_dumps(render(0)))
+        per_item = max(1e-6, (estimate_tokens(_dumps(render(PROBE_ITEMS))) - base) / PROBE_ITEMS)
+        limit = max(1, min(size, int((budget - base) / per_item)))
+    while True:
+        text = _dumps(render(limit))
+        tokens = estimate_tokens(text)
+        if tokens <= budget or limit == 1:
+            break
+        limit = max(1, min(limit - 1, int(limit * budget / tokens * 0.9)))
+
+    max_bytes = budget * 4
+    encoded = text.encode("utf-8")
+    if len(encoded) > max_bytes:
+        text = encoded[:max_bytes].decode("utf-8", errors="ignore") + "…"
+    return text
@@ -3,11 +3,129 @@
 https://tradeapi.finam.ru/
 """
 
+import asyncio
+import logging
 import os
-from typing import Any
-
+import re
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Callable
+
+import httpx
 import requests
 
+from utils.candle_store import CandleStore, bars_from_response, bars_to_response, concat_bars
+from utils.finam_cache import ResponseCache
+from utils.finam_values import format_timestamp, parse_timestamp
+from utils.indicators import summarize
+from utils.log import get_logger, log_event
+from utils.metrics import FINAM_QUEUE_SECONDS, FINAM_RATE_LIMITED, FINAM_REQUEST_SECONDS, FINAM_UPSTREAM_SECONDS, record
+from utils.orderbook import Book, analyze, book_from_response, diff
+from utils.ratelimit import PriorityScheduler
+from utils.resilience import CallPolicy, Upstream
+
+logger = get_logger("finam")
+
+# Параметры пути -> плейсхолдеры, чтобы метки метрик не зависели от тикера и счёта
+_PATH_PARAMS = (
+    (re.compile(r"^/v1/instruments/[^/]+"), "/v1/instruments/{symbol}"),
+    (re.compile(r"^/v1/accounts/[^/]+"), "/v1/accounts/{account_id}"),
+    (re.compile(r"/orders/[^/]+$"), "/orders/{order_id}"),
+)
+
+
+def endpoint_template(method: str, path: str) -> str:
+    """Метка эндпоинта для метрик: GET /v1/instruments/SBER@MISX/bars -> GET /v1/instruments/{symbol}/bars"""
+    path = path.split("?", 1)[0]
+    for pattern, replacement in _PATH_PARAMS:
+        path = pattern.sub(replacement, path)
+    return f"{method.upper()} {path}"
+
+
+# Политики вызовов по эндпоинтам (первое совпадение): дедлайн и таймаут попытки, сек.
+# GET и чтение сессии идемпотентны; отмена заявки повторяется, но без копий;
+# остальное (выставление заявки) повторяется, только если запрос не ушёл.
+_CALL_POLICIES = (
+    (re.compile(r"^GET /v1/instruments/\{symbol\}/(quotes/latest|orderbook|trades/latest)$"),
+     {"deadline": 5.0, "attempt_timeout": 2.0, "hedge": True}),
+    (re.compile(r"^GET /v1/instruments/\{symbol\}/bars$"), {"deadline": 20.0, "attempt_timeout": 10.0, "hedge": True}),
+    # Полный список активов большой: долгая попытка, без копий
+    (re.compile(r"^GET /v1/assets$"), {"deadline": 120.0, "attempt_timeout": 60.0}),
+    (re.compile(r"^GET "), {"deadline": 10.0, "attempt_timeout": 5.0, "hedge": True}),
+    (re.compile(r"^POST /v1/sessions/details$"), {"deadline": 10.0, "attempt_timeout": 5.0}),
+    (re.compile(r"^DELETE /v1/accounts/\{account_id\}/orders/\{order_id\}$"), {"deadline": 10.0, "attempt_timeout": 5.0}),
+)
+
+
+@lru_cache(maxsize=256)
+def call_policy(endpoint: str) -> CallPolicy:
+    """Политика вызова эндпоинта (см. endpoint_template)"""
+    for pattern, options in _CALL_POLICIES:
+        if pattern.match(endpoint):
+            return CallPolicy(endpoint, **options)
+    return CallPolicy(endpoint, deadline=15.0, idempotent=False)
+
+
+# Классы запросов для ограничителя частоты по приоритету: торговые операции,
+# состояние счёта, рыночные данные (всё остальное)
+_REQUEST_CLASSES = (
+    (re.compile(r"^(POST|DELETE) /v1/accounts/\{account_id\}/orders"), "trading"),
+    (re.compile(r"^\w+ /v1/(accounts|sessions)"), "account"),
+)
+REQUEST_PRIORITIES = {"trading": 0, "account": 1, "market": 2}
+# Сколько последних стаканов хранится для since_previous в analyze_orderbook
+MAX_LAST_BOOKS = 256
+
+
+@lru_cache(maxsize=256)
+def request_class(endpoint: str) -> str:
+    """Класс эндпоинта: trading, account или market"""
+    for pattern, name in _REQUEST_CLASSES:
+        if pattern.match(endpoint):
+            return name
+    return "market"
+
+
+def _rate(name: str, default: str) -> tuple[float, float] | None:
+    """"rate[:burst]" из окружения; 0 — без лимита"""
+    rate, _, burst = os.getenv(name, default).partition(":")
+    if float(rate) <= 0:
+        return None
+    return float(rate), float(burst or rate)
+
+
+def finam_scheduler() -> PriorityScheduler | None:
+    """
+    Ограничитель частоты по настройкам окружения, запросов в секунду[:всплеск]:
+    FINAM_RATE_LIMIT — общий на токен, FINAM_RATE_LIMIT_TRADING / _ACCOUNT / _MARKET —
+    по классам. FINAM_RATE_LIMIT=0 — без ограничителя.
+    """
+    total = _rate("FINAM_RATE_LIMIT", "40:60")
+    if total is None:
+        return None
+    classes = {}
+    for name, default in (("trading", "10:20"), ("account", "10:20"), ("market", "30:60")):
+        rate, burst = _rate(f"FINAM_RATE_LIMIT_{name.upper()}", default) or total
+        classes[name] = (REQUEST_PRIORITIES[name], rate, burst)
+    return PriorityScheduler(classes, total)
+
+
+def retry_after(response: httpx.Response, default: float = 1.0) -> float:
+    """Пауза из заголовка Retry-After (секунды или HTTP-дата), сек"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
 
 class FinamAPIClient:
     """
@@ -84,7 +202,6 @@ class FinamAPIClient:
 
     def get_orderbook(self, symbol: str, depth: int = 10) -> dict[str, Any]:
         """Получить биржевой стакан"""
-        print(symbol, depth)
         return self.execute_request("GET", f"/v1/instruments/{symbol}/orderbook", params={"depth": depth})
 
     def get_candles(
@@ -100,7 +217,6 @@ class FinamAPIClient:
 
     def get_account(self, account_id: str) -> dict[str, Any]:
         """Получить информацию о счете"""
-        print(account_id)
         return self.execute_request("GET", f"/v1/accounts/{account_id}")
 
     def get_orders(self, account_id: str) -> dict[str, Any]:
@@ -134,4 +250,378 @@ class FinamAPIClient:
 
     def get_session_details(self) -> dict[str, Any]:
         """Получить детали текущей сессии"""
-        return self.execute_request("POST", "/v1/sessions/details")
\ No newline at end of file
+        return self.execute_request("POST", "/v1/sessions/details")
+
+    def get_assets(self) -> dict[str, Any]:
+        """Получить список всех инструментов (symbol, ticker, mic, isin, type, name)"""
+        return self.execute_request("GET", "/v1/assets")
+
+class AsyncFinamAPIClient:
+    """
+    Асинхронный клиент Finam TradeAPI поверх общего httpx.AsyncClient
+
+    Создаётся один раз при старте приложения и переиспользует соединения
+    (пул, keep-alive, HTTP/2) между всеми сессиями чата.
+    """
+
+    def __init__(
+        self,
+        access_token: str | None = None,
+        base_url: str | None = None,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        http2: bool | None = None,
+        timeout: float | None = None,
+        cache: ResponseCache | None = None,
+        candle_store: CandleStore | None = None,
+        resilience: Upstream | None = None,
+        scheduler: PriorityScheduler | None = None,
+    ) -> None:
+        """
+        Инициализация клиента
+
+        Args:
+            access_token: Токен доступа к API (из переменной окружения FINAM_ACCESS_TOKEN)
+            base_url: Базовый URL API (по умолчанию из документации)
+            max_connections: Максимум соединений в пуле (FINAM_MAX_CONNECTIONS)
+            max_keepalive_connections: Максимум keep-alive соединений (FINAM_MAX_KEEPALIVE)
+            keepalive_expiry: Время жизни простаивающего соединения, сек (FINAM_KEEPALIVE_EXPIRY)
+            http2: Использовать HTTP/2 (FINAM_HTTP2)
+            timeout: Таймаут запроса, сек (FINAM_TIMEOUT)
+            cache: Кэш рыночных данных (по умолчанию создаётся, если FINAM_CACHE=1)
+            candle_store: Локальное хранилище свечей (по умолчанию создаётся, если FINAM_CANDLE_STORE=1)
+            resilience: Дедлайны, повторы, хеджирование и автомат (по умолчанию из окружения, RESILIENCE)
+            scheduler: Ограничитель частоты с приоритетами (по умолчанию finam_scheduler())
+        """
+        self.access_token = access_token or os.getenv("FINAM_ACCESS_TOKEN", "")
+        self.base_url = base_url or os.getenv("FINAM_API_BASE_URL", "https://api.finam.ru")
+
+        if cache is None and os.getenv("FINAM_CACHE", "1").lower() in ("1", "true", "yes"):
+            cache = ResponseCache()
+        self.cache = cache
+
+        if candle_store is None and os.getenv("FINAM_CANDLE_STORE", "1").lower() in ("1", "true", "yes"):
+            candle_store = CandleStore()
+        self.candle_store = candle_store
+        self.resilience = resilience or Upstream("finam")
+        # Общий на клиент (а значит, на токен) ограничитель частоты: торговые запросы вперёд рыночных данных
+        self.scheduler = scheduler or finam_scheduler()
+        # Последний снимок стакана по инструменту — для сравнения в analyze_orderbook;
+        # LRU: произвольные тикеры из запросов не копятся в долгоживущем процессе
+        self._last_books: "OrderedDict[str, Book]" = OrderedDict()
+        # Слушатели интереса к инструментам: (symbol, "quote" | "orderbook") — хаб рыночных данных
+        self.demand_listeners: list[Callable[[str, str], None]] = []
+
+        if max_connections is None:
+            max_connections = int(os.getenv("FINAM_MAX_CONNECTIONS", "100"))
+        if max_keepalive_connections is None:
+            max_keepalive_connections = int(os.getenv("FINAM_MAX_KEEPALIVE", "20"))
+        if keepalive_expiry is None:
+            keepalive_expiry = float(os.getenv("FINAM_KEEPALIVE_EXPIRY", "30"))
+        if http2 is None:
+            http2 = os.getenv("FINAM_HTTP2", "1").lower() in ("1", "true", "yes")
+        if timeout is None:
+            timeout = float(os.getenv("FINAM_TIMEOUT", "30"))
+
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+
+        headers = {"Content-Type": "application/json"}
+        if self.access_token:
+            headers["Authorization"] = f"{self.access_token}"
+
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """Закрыть пул соединений"""
+        await self.client.aclose()
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Статистика кэша рыночных данных"""
+        return self.cache.stats() if self.cache is not None else {"enabled": False}
+
+    async def execute_request(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:
+        """
+        Выполнить HTTP запрос к Finam TradeAPI
+
+        Args:
+            method: HTTP метод (GET, POST, DELETE и т.д.)
+            path: Путь API (например, /v1/instruments/SBER@MISX/quotes/latest)
+            **kwargs: Дополнительные параметры для httpx
+
+        Returns:
+            Ответ API в виде словаря (ошибки возвращаются как словарь с ключом "error")
+        """
+        endpoint = endpoint_template(method, path)
+        started = time.perf_counter()
+        # Сетевой запрос выполнялся именно в этом вызове (а не взят из кэша / общего запроса)
+        sent = False
+
+        async def send() -> dict[str, Any]:
+            nonlocal sent
+            sent = True
+            return await self._send(method, path, endpoint=endpoint, **kwargs)
+
+        result = None
+        policy = None
+        if self.cache is not None:
+            policy = self.cache.policy_for(method, path, kwargs.get("params"))
+        try:
+            if policy is not None:
+                result = await self.cache.fetch(method, path, kwargs.get("params"), policy, send)
+            else:
+                result = await send()
+            return result
+        finally:
+            if result is None or "error" in result:
+                outcome = "error"
+            else:
+                outcome = "upstream" if sent else "cache"
+            record("finam", time.perf_counter() - started, endpoint, FINAM_REQUEST_SECONDS,
+                   endpoint=endpoint, outcome=outcome)
+
+    async def _send(self, method: str, path: str, endpoint: str | None = None, **kwargs: Any) -> dict[str, Any]:
+        """Запрос к Finam без кэша (с дедлайном, повторами и хеджированием по политике эндпоинта)"""
+        endpoint = endpoint or endpoint_template(method, path)
+        endpoint_class = request_class(endpoint)
+
+        async def admit() -> None:
+            waited = await self.scheduler.acquire(endpoint_class)
+            if waited:
+                record("finam_queue", waited, endpoint_class, FINAM_QUEUE_SECONDS, endpoint_class=endpoint_class)
+
+        try:
+            response = await self.resilience.call(
+                call_policy(endpoint),
+                lambda: self._attempt(method, path, endpoint, **kwargs),
+                admit=admit if self.scheduler is not None else None,
+            )
+
+            if not response.content:
+                return {"status": "success", "message": "Operation completed"}
+
+            return response.json()
+
+        except httpx.HTTPStatusError as e:
+            error_detail = {"error": str(e), "status_code": e.response.status_code}
+
+            try:
+                if e.response.content:
+                    error_detail["details"] = e.response.json()
+            except Exception:
+                error_detail["details"] = e.response.text
+
+            log_event(logger, "finam.http_error", logging.WARNING, endpoint=endpoint, status=e.response.status_code)
+            return error_detail
+
+        except Exception as e:
+            log_event(logger, "finam.request_failed", logging.WARNING, endpoint=endpoint, error=repr(e))
+            return {"error": str(e) or repr(e), "type": type(e).__name__}
+
+    async def _attempt(self, method: str, path: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        """Одна попытка запроса; ошибочный статус — httpx.HTTPStatusError"""
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = str(response.status_code)
+            if response.status_code == 429:
+                # Лимит токена исчерпан: класс запросов ждёт Retry-After, повтор встанет в очередь
+                endpoint_class = request_class(endpoint)
+                FINAM_RATE_LIMITED.inc(endpoint_class=endpoint_class)
+                if self.scheduler is not None:
+                    self.scheduler.pause(endpoint_class, retry_after(response))
+            response.raise_for_status()
+            return response
+        except asyncio.CancelledError:
+            # Копия запроса, проигравшая хеджирование, или истёкший таймаут попытки
+            status = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            FINAM_UPSTREAM_SECONDS.observe(elapsed, endpoint=endpoint, status=status)
+            log_event(logger, "finam.request", logging.DEBUG, endpoint=endpoint, status=status,
+                      ms=round(elapsed * 1000, 1))
+
+    def _demand(self, symbol: str, kind: str, response: dict[str, Any]) -> None:
+        # Только после успешного ответа: тикер от LLM вроде FOO@XXXX не должен
+        # запускать опрос хаба и занимать его слот
+        if "error" in response:
+            return
+        for listener in self.demand_listeners:
+            listener(symbol, kind)
+
+    async def get_quote(self, symbol: str) -> dict[str, Any]:
+        """Получить текущую котировку инструмента"""
+        response = await self.execute_request("GET", f"/v1/instruments/{symbol}/quotes/latest")
+        self._demand(symbol, "quote", response)
+        return response
+
+    async def get_orderbook(self, symbol: str, depth: int = 10) -> dict[str, Any]:
+        """Получить биржевой стакан"""
+        response = await self.execute_request("GET", f"/v1/instruments/{symbol}/orderbook", params={"depth": depth})
+        self._demand(symbol, "orderbook", response)
+        return response
+
+    async def analyze_orderbook(
+        self, symbol: str, depth: int = 50, quantity: float | None = None
+    ) -> dict[str, Any]:
+        """
+        Аналитика стакана: спред, глубина, дисбаланс, оценка исполнения
+        `quantity` лотов в обе стороны и изменения с прошлого запроса (utils/orderbook.py)
+        """
+        response = await self.get_orderbook(symbol, depth)
+        if "error" in response:
+            return response
+        book = book_from_response(response, symbol)
+        result = analyze(book, float(quantity) if quantity else None)
+        previous = self._last_books.get(symbol)
+        if previous is not None:
+            changes = diff(previous, book)
+            for side in ("bids", "asks"):
+                changes[side].pop("levels")
+            result["since_previous"] = changes
+        self._last_books[symbol] = book
+        self._last_books.move_to_end(symbol)
+        while len(self._last_books) > MAX_LAST_BOOKS:
+            self._last_books.popitem(last=False)
+        return result
+
+    async def get_candles(
+        self, symbol: str, timeframe: str = "D", start: str | None = None, end: str | None = None
+    ) -> dict[str, Any]:
+        """
+        Получить исторические свечи
+
+        При включённом хранилище из Finam докачиваются только недостающие
+        голова/хвост интервала, остальное читается с диска.
+        """
+        store = self.candle_store
+        if store is None or not start or not end or not store.supports(timeframe):
+            return await self._fetch_candles(symbol, timeframe, start, end)
+
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        fresh_parts = []
+        for gap_start, gap_end in store.missing(symbol, timeframe, start_ts, end_ts):
+            response = await self._fetch_candles(
+                symbol, timeframe, format_timestamp(gap_start), format_timestamp(gap_end)
+            )
+            if "error" in response:
+                return response
+            fresh = bars_from_response(response)
+            store.merge(symbol, timeframe, fresh, gap_start, gap_end)
+            fresh_parts.append(fresh)
+
+        bars = store.read(symbol, timeframe, start_ts, end_ts)
+        closed_until = store.closed_until(timeframe)
+        for fresh in fresh_parts:
+            # Незакрытые бары в хранилище не попадают, но в ответ — да
+            mask = (fresh["timestamp"] > closed_until) & (fresh["timestamp"] <= end_ts)
+            if mask.any():
+                bars = concat_bars(bars, {name: column[mask] for name, column in fresh.items()})
+        return bars_to_response(symbol, bars)
+
+    async def get_bars_array(
+        self, symbol: str, timeframe: str, start: str, end: str
+    ) -> dict[str, Any]:
+        """
+        Свечи колонками numpy (timestamp, open, high, low, close, volume).
+        Диапазон из хранилища отдаётся срезами memmap без копирования.
+        """
+        if self.candle_store is None or not self.candle_store.supports(timeframe):
+            response = await self._fetch_candles(symbol, timeframe, start, end)
+            return response if "error" in response else bars_from_response(response)
+        response = await self.get_candles(symbol, timeframe, start, end)
+        if "error" in response:
+            return response
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        stored = self.candle_store.read(symbol, timeframe, start_ts, end_ts)
+        if len(stored["timestamp"]) == len(response.get("bars") or []):
+            return stored
+        return bars_from_response(response)
+
+    async def get_indicators(
+        self,
+        symbol: str,
+        timeframe: str = "TIME_FRAME_D",
+        start: str | None = None,
+        end: str | None = None,
+        indicators: list[str] | str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Индикаторы по свечам (доходность, SMA/EMA, RSI, ATR, волатильность,
+        просадка, VWAP) — последние значения, см. utils/indicators.py
+        """
+        if start and end:
+            bars = await self.get_bars_array(symbol, timeframe, start, end)
+        else:
+            response = await self._fetch_candles(symbol, timeframe, start, end)
+            bars = response if "error" in response else bars_from_response(response)
+        if "error" in bars:
+            return bars
+        return {"symbol": symbol, **summarize(bars, timeframe, indicators)}
+
+    async def _fetch_candles(
+        self, symbol: str, timeframe: str, start: str | None, end: str | None
+    ) -> dict[str, Any]:
+        params = {"timeframe": timeframe}
+        if start:
+            params["interval.start_time"] = start
+        if end:
+            params["interval.end_time"] = end
+        return await self.execute_request("GET", f"/v1/instruments/{symbol}/bars", params=params)
+
+    async def get_account(self, account_id: str) -> dict[str, Any]:
+        """Получить информацию о счете"""
+        return await self.execute_request("GET", f"/v1/accounts/{account_id}")
+
+    async def get_orders(self, account_id: str) -> dict[str, Any]:
+        """Получить список ордеров"""
+        return await self.execute_request("GET", f"/v1/accounts/{account_id}/orders")
+
+    async def get_order(self, account_id: str, order_id: str) -> dict[str, Any]:
+        """Получить информацию об ордере"""
+        return await self.execute_request("GET", f"/v1/accounts/{account_id}/orders/{order_id}")
+
+    async def create_order(self, account_id: str, order_data: dict[str, Any]) -> dict[str, Any]:
+        """Создать новый ордер"""
+        return await self.execute_request("POST", f"/v1/accounts/{account_id}/orders", json=order_data)
+
+    async def cancel_order(self, account_id: str, order_id: str) -> dict[str, Any]:
+        """Отменить ордер"""
+        return await self.execute_request("DELETE", f"/v1/accounts/{account_id}/orders/{order_id}")
+
+    async def get_trades(self, account_id: str, start: str | None = None, end: str | None = None) -> dict[str, Any]:
+        """Получить историю сделок"""
+        params = {}
+        if start:
+            params["interval.start_time"] = start
+        if end:
+            params["interval.end_time"] = end
+        return await self.execute_request("GET", f"/v1/accounts/{account_id}/trades", params=params)
+
+    async def get_positions(self, account_id: str) -> dict[str, Any]:
+        """Получить открытые позиции"""
+        return await self.execute_request("GET", f"/v1/accounts/{account_id}")
+
+    async def get_session_details(self) -> dict[str, Any]:
+        """Получить детали текущей сессии"""
+        return await self.execute_request("POST", "/v1/sessions/details")
+
+    async def get_assets(self) -> dict[str, Any]:
+        """Получить список всех инструментов (symbol, ticker, mic, isin, type, name)"""
+        return await self.execute_request("GET", "/v1/assets", timeout=60.0)
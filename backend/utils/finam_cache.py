@@ -0,0 +1,197 @@
+"""
+Кэш ответов Finam TradeAPI с политиками по эндпоинтам и single-flight.
+
+- котировки и стаканы живут доли секунды;
+- закрытые исторические свечи (интервал в прошлом вместе с последним баром) не устаревают
+  и хранятся до вытеснения по LRU;
+- счета, заявки и любые не-GET запросы не кэшируются;
+- одинаковые запросы, выполняющиеся одновременно, объединяются в один
+  запрос к Finam.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Pattern
+
+from utils.candle_store import TIMEFRAME_SECONDS
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Политика кэширования эндпоинта (ttl=None — до вытеснения)"""
+
+    name: str
+    ttl: Optional[float]
+
+
+@dataclass
+class _Rule:
+    pattern: Pattern[str]
+    policy: CachePolicy
+    closed_policy: Optional[CachePolicy] = None
+
+
+def _is_closed_interval(params: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> bool:
+    """
+    Интервал свечей целиком в прошлом и последний бар закрыт — бары уже не изменятся.
+    Бар, начатый до end_time, закрывается только через длительность таймфрейма
+    (как closed_until в candle_store.py); неизвестный таймфрейм — не закрыт.
+    """
+    params = params or {}
+    end = params.get("interval.end_time")
+    bar_seconds = TIMEFRAME_SECONDS.get(str(params.get("timeframe")))
+    if not end or bar_seconds is None:
+        return False
+    try:
+        end_time = datetime.fromisoformat(str(end).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if end_time.tzinfo is None:
+        end_time = end_time.replace(tzinfo=timezone.utc)
+    return end_time + timedelta(seconds=bar_seconds) <= (now or datetime.now(timezone.utc))
+
+
+def _make_key(method: str, path: str, params: Optional[Dict[str, Any]]) -> Hashable:
+    return method, path, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+
+class ResponseCache:
+    """LRU кэш ответов Finam с TTL по эндпоинтам и объединением одинаковых запросов"""
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        quote_ttl: float | None = None,
+        orderbook_ttl: float | None = None,
+        bars_ttl: float | None = None,
+    ) -> None:
+        """
+        Args:
+            max_entries: Максимум записей (FINAM_CACHE_MAX_ENTRIES)
+            quote_ttl: TTL котировок, сек (FINAM_CACHE_QUOTE_TTL)
+            orderbook_ttl: TTL стаканов, сек (FINAM_CACHE_ORDERBOOK_TTL)
+            bars_ttl: TTL незакрытых свечей, сек (FINAM_CACHE_BARS_TTL)
+        """
+        self.max_entries = max_entries or int(os.getenv("FINAM_CACHE_MAX_ENTRIES", "2048"))
+        if quote_ttl is None:
+            quote_ttl = float(os.getenv("FINAM_CACHE_QUOTE_TTL", "0.5"))
+        if orderbook_ttl is None:
+            orderbook_ttl = float(os.getenv("FINAM_CACHE_ORDERBOOK_TTL", "0.25"))
+        if bars_ttl is None:
+            bars_ttl = float(os.getenv("FINAM_CACHE_BARS_TTL", "5"))
+
+        self.rules: List[_Rule] = [
+            _Rule(re.compile(r"^/v1/instruments/[^/]+/quotes/latest$"), CachePolicy("quote", quote_ttl)),
+            _Rule(re.compile(r"^/v1/instruments/[^/]+/orderbook$"), CachePolicy("orderbook", orderbook_ttl)),
+            _Rule(
+                re.compile(r"^/v1/instruments/[^/]+/bars$"),
+                CachePolicy("bars", bars_ttl),
+                closed_policy=CachePolicy("bars_closed", None),
+            ),
+        ]
+
+        self._entries: "OrderedDict[Hashable, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._by_policy: Dict[str, Dict[str, int]] = {}
+
+    def policy_for(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[CachePolicy]:
+        """Политика для запроса или None, если запрос не кэшируется"""
+        if method.upper() != "GET":
+            return None
+        for rule in self.rules:
+            if rule.pattern.match(path):
+                if rule.closed_policy and _is_closed_interval(params):
+                    return rule.closed_policy
+                return rule.policy if rule.policy.ttl else None
+        return None
+
+    def _count(self, policy: CachePolicy, field: str) -> None:
+        counters = self._by_policy.setdefault(policy.name, {"hits": 0, "misses": 0, "coalesced": 0})
+        counters[field] += 1
+
+    def _lookup(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, policy: CachePolicy, value: Dict[str, Any]) -> None:
+        expires_at = time.monotonic() + policy.ttl if policy.ttl else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def fetch(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]],
+        policy: CachePolicy,
+        send: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Вернуть ответ из кэша, присоединиться к уже идущему запросу
+        или выполнить `send()`. Ответы с ошибкой не кэшируются.
+        Возвращаемые словари общие для всех вызывающих — их нельзя изменять.
+        """
+        key = _make_key(method, path, params)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            self._count(policy, "hits")
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            self._count(policy, "coalesced")
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        self._count(policy, "misses")
+        task = asyncio.ensure_future(send())
+        self._inflight[key] = task
+
+        def on_done(done: asyncio.Future) -> None:
+            self._inflight.pop(key, None)
+            if done.cancelled() or done.exception() is not None:
+                return
+            result = done.result()
+            if isinstance(result, dict) and "error" not in result:
+                self._store(key, policy, result)
+
+        task.add_done_callback(on_done)
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "by_policy": {name: dict(counters) for name, counters in self._by_policy.items()},
+        }
@@ -0,0 +1,31 @@
+"""
+Разбор значений из ответов Finam TradeAPI
+"""
+
+from datetime import datetime, timezone
+from typing import Any
+
+
+def to_float(value: Any) -> float | None:
+    """Decimal Finam ({"value": "285.5"}), строка или число -> float"""
+    if isinstance(value, dict):
+        value = value.get("value")
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_timestamp(value: str) -> int:
+    """ISO-время ("2025-01-03T07:00:00Z") -> секунды UNIX"""
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def format_timestamp(seconds: int) -> str:
+    """Секунды UNIX -> ISO-время в формате Finam"""
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
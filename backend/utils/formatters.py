@@ -0,0 +1,233 @@
+"""
+Детерминированные текстовые сводки по результатам простых запросов к Finam.
+
+Позволяют ответить на "цена", "стакан", "свечи", "мои заявки", "позиции"
+без второго вызова LLM. Цена выводится в виде "285.50 ₽ (+1.23%)" —
+этот формат разбирает карточка цены во фронтенде.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.finam_values import to_float
+from utils.orderbook import book_from_response, imbalance
+from utils.registry import ApiCall
+
+Renderer = Callable[[Dict[str, Any], Dict[str, Any]], Optional[str]]
+
+
+def fmt_number(value: Optional[float], digits: int = 2) -> str:
+    if value is None:
+        return "—"
+    return f"{value:,.{digits}f}".replace(",", " ")
+
+
+def fmt_price_change(price: Optional[float], change_pct: Optional[float]) -> str:
+    """"285.50 ₽ (+1.23%)" — формат, который понимает карточка цены"""
+    if change_pct is None:
+        return f"{fmt_number(price)} ₽"
+    return f"{fmt_number(price)} ₽ ({change_pct:+.2f}%)"
+
+
+def _pct(new: Optional[float], old: Optional[float]) -> Optional[float]:
+    if new is None or not old:
+        return None
+    return (new - old) / old * 100
+
+
+def render_quote(params: Dict[str, Any], response: Dict[str, Any]) -> Optional[str]:
+    quote = response.get("quote")
+    if not isinstance(quote, dict):
+        return None
+    symbol = response.get("symbol") or params.get("symbol", "")
+    last = to_float(quote.get("last"))
+    if last is None:
+        return None
+    change = to_float(quote.get("change"))
+    change_pct = _pct(last, last - change) if change is not None else _pct(last, to_float(quote.get("close")))
+
+    bid, ask = to_float(quote.get("bid")), to_float(quote.get("ask"))
+    lines = [f"{fmt_price_change(last, change_pct)} — {symbol}, последняя сделка"]
+    if bid is not None and ask is not None:
+        lines.append(f"Bid {fmt_number(bid)} / Ask {fmt_number(ask)}, спред {fmt_number(ask - bid)}")
+    day = [to_float(quote.get(k)) for k in ("open", "high", "low")]
+    if all(v is not None for v in day):
+        lines.append(f"Открытие {fmt_number(day[0])}, максимум {fmt_number(day[1])}, минимум {fmt_number(day[2])}")
+    volume = to_float(quote.get("volume"))
+    if volume is not None:
+        lines.append(f"Объём {fmt_number(volume, 0)}")
+    return "\n".join(lines)
+
+
+def render_orderbook(params: Dict[str, Any], response: Dict[str, Any], top: int = 5) -> Optional[str]:
+    if not isinstance(response.get("orderbook"), dict):
+        return None
+    book = book_from_response(response, params.get("symbol", ""))
+    if not len(book.bid_prices) and not len(book.ask_prices):
+        return f"Стакан {book.symbol} пуст."
+
+    lines = [f"Стакан {book.symbol}:"]
+    if book.spread is not None:
+        lines.append(
+            f"Лучший bid {fmt_number(book.best_bid)} ({fmt_number(book.bid_sizes[0], 0)}), "
+            f"лучший ask {fmt_number(book.best_ask)} ({fmt_number(book.ask_sizes[0], 0)}), "
+            f"спред {fmt_number(book.spread)} ({book.spread / book.mid * 10000:.1f} б.п.)"
+        )
+    lines.append(
+        f"Объём в стакане: покупка {fmt_number(book.bid_sizes.sum(), 0)}, "
+        f"продажа {fmt_number(book.ask_sizes.sum(), 0)}"
+    )
+    book_imbalance = imbalance(book)
+    if book_imbalance is not None:
+        lines.append(f"Дисбаланс спроса и предложения {book_imbalance:+.2f}")
+    asks = zip(book.ask_prices[:top], book.ask_sizes[:top])
+    bids = zip(book.bid_prices[:top], book.bid_sizes[:top])
+    lines.append(f"Продажа (топ-{top}): " + "; ".join(f"{fmt_number(p)} × {fmt_number(s, 0)}" for p, s in asks))
+    lines.append(f"Покупка (топ-{top}): " + "; ".join(f"{fmt_number(p)} × {fmt_number(s, 0)}" for p, s in bids))
+    return "\n".join(lines)
+
+
+def render_orderbook_analysis(params: Dict[str, Any], response: Dict[str, Any]) -> Optional[str]:
+    if "mid" not in response:
+        return None
+    lines = [f"Стакан {response.get('symbol', '')}:"]
+    if response.get("spread") is not None:
+        lines.append(
+            f"Bid {fmt_number(response['best_bid'])} / Ask {fmt_number(response['best_ask'])}, "
+            f"спред {fmt_number(response['spread'])} ({response['spread_bps']:.1f} б.п.)"
+        )
+    total = response.get("total_size") or {}
+    lines.append(f"Объём в стакане: покупка {fmt_number(total.get('bids'), 0)}, продажа {fmt_number(total.get('asks'), 0)}")
+    if response.get("imbalance") is not None:
+        lines.append(f"Дисбаланс спроса и предложения {response['imbalance']:+.2f}")
+    for title, estimate in (("Покупка", (response.get("fill") or {}).get("buy")), ("Продажа", (response.get("fill") or {}).get("sell"))):
+        if not estimate or estimate.get("vwap") is None:
+            continue
+        line = (
+            f"{title} {fmt_number(estimate['quantity'], 0)}: средняя цена {fmt_number(estimate['vwap'])}, "
+            f"проскальзывание {estimate['slippage_pct']:.3f}% от лучшей цены, уровней {estimate['levels']}"
+        )
+        if not estimate["complete"]:
+            line += f" (в стакане только {fmt_number(estimate['filled'], 0)})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_candles(params: Dict[str, Any], response: Dict[str, Any]) -> Optional[str]:
+    bars = response.get("bars")
+    if not isinstance(bars, list):
+        return None
+    symbol = response.get("symbol") or params.get("symbol", "")
+    if not bars:
+        return f"Нет свечей по {symbol} за указанный период."
+
+    closes = [to_float(b.get("close")) for b in bars]
+    highs = [to_float(b.get("high")) for b in bars]
+    lows = [to_float(b.get("low")) for b in bars]
+    volumes = [to_float(b.get("volume")) or 0.0 for b in bars]
+    first_open = to_float(bars[0].get("open"))
+    last_close = closes[-1]
+    high = max((h for h in highs if h is not None), default=None)
+    low = min((v for v in lows if v is not None), default=None)
+
+    start, end = bars[0].get("timestamp", "")[:10], bars[-1].get("timestamp", "")[:10]
+    return "\n".join([
+        f"{fmt_price_change(last_close, _pct(last_close, first_open))} — {symbol}, изменение за период",
+        f"Период {start} — {end}, свечей: {len(bars)} ({params.get('timeframe', '')})",
+        f"Открытие {fmt_number(first_open)}, закрытие {fmt_number(last_close)}, "
+        f"максимум {fmt_number(high)}, минимум {fmt_number(low)}",
+        f"Суммарный объём {fmt_number(sum(volumes), 0)}",
+    ])
+
+
+def _render_order_line(order: Dict[str, Any]) -> str:
+    details = order.get("order") or {}
+    side = {"SIDE_BUY": "покупка", "SIDE_SELL": "продажа"}.get(details.get("side"), details.get("side", ""))
+    quantity = to_float(details.get("quantity"))
+    price = to_float(details.get("limit_price") or details.get("limitPrice"))
+    status = str(order.get("status", "")).replace("ORDER_STATUS_", "")
+    parts = [f"{order.get('order_id', '?')}: {details.get('symbol', '')} {side}"]
+    if quantity is not None:
+        parts.append(f"{fmt_number(quantity, 0)} шт.")
+    if price is not None:
+        parts.append(f"по {fmt_number(price)}")
+    return " ".join(parts) + f" — {status or 'статус неизвестен'}"
+
+
+def render_orders(params: Dict[str, Any], response: Dict[str, Any], limit: int = 20) -> Optional[str]:
+    orders = response.get("orders")
+    if not isinstance(orders, list):
+        return None
+    if not orders:
+        return "Заявок нет."
+    lines = [f"Заявок: {len(orders)}"] + [_render_order_line(o) for o in orders[:limit]]
+    if len(orders) > limit:
+        lines.append(f"… и ещё {len(orders) - limit}")
+    return "\n".join(lines)
+
+
+def render_order(params: Dict[str, Any], response: Dict[str, Any]) -> Optional[str]:
+    if "order_id" not in response:
+        return None
+    return "Заявка " + _render_order_line(response)
+
+
+def render_positions(params: Dict[str, Any], response: Dict[str, Any], limit: int = 20) -> Optional[str]:
+    positions = response.get("positions")
+    if not isinstance(positions, list):
+        return None
+    lines = [f"Счёт {response.get('account_id', '')}:"]
+    equity = to_float(response.get("equity"))
+    if equity is not None:
+        lines.append(f"Оценка {fmt_number(equity)} ₽")
+    unrealized = to_float(response.get("unrealized_profit"))
+    if unrealized is not None:
+        lines.append(f"Нереализованная прибыль {unrealized:+,.2f} ₽".replace(",", " "))
+    if not positions:
+        lines.append("Открытых позиций нет.")
+    for position in positions[:limit]:
+        quantity = to_float(position.get("quantity"))
+        average = to_float(position.get("average_price"))
+        current = to_float(position.get("current_price"))
+        lines.append(
+            f"{position.get('symbol', '')}: {fmt_price_change(current, _pct(current, average))} к средней, "
+            f"{fmt_number(quantity, 0)} шт., средняя {fmt_number(average)}"
+        )
+    if len(positions) > limit:
+        lines.append(f"… и ещё {len(positions) - limit}")
+    return "\n".join(lines)
+
+
+RENDERERS: Dict[str, Renderer] = {
+    "get_quote": render_quote,
+    "get_orderbook": render_orderbook,
+    "analyze_orderbook": render_orderbook_analysis,
+    "get_candles": render_candles,
+    "get_orders": render_orders,
+    "get_order": render_order,
+    "get_positions": render_positions,
+    "get_account": render_positions,
+}
+
+
+def render_result(method_name: str, params: Dict[str, Any], response: Dict[str, Any]) -> Optional[str]:
+    """Сводка по результату вызова или None, если нужен разбор LLM"""
+    renderer = RENDERERS.get(method_name)
+    if renderer is None:
+        return None
+    if "error" in response:
+        return f"Не удалось выполнить {method_name}: {response['error']}"
+    try:
+        return renderer(params, response)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def render_results(calls: List[ApiCall], responses: List[Dict[str, Any]]) -> Optional[str]:
+    """Ответ на весь ход без LLM; None, если хотя бы один вызов не покрыт шаблонами"""
+    parts = []
+    for (method_name, params), response in zip(calls, responses):
+        text = render_result(method_name, params, response)
+        if text is None:
+            return None
+        parts.append(text)
+    return "\n\n".join(parts) if parts else None
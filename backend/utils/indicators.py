@@ -0,0 +1,222 @@
+"""
+Векторизованные индикаторы по свечам (numpy).
+
+Все функции принимают колонки из utils.candle_store (Bars) или отдельные
+массивы и возвращают ряды той же длины; значения, для которых окна ещё
+не хватает, — NaN. `summarize` сводит выбранные индикаторы к последним
+значениям — в таком виде результат отдаётся ассистенту.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.candle_store import Bars
+from utils.finam_values import format_timestamp
+
+DEFAULT_INDICATORS = ("return", "sma_20", "ema_20", "rsi_14", "atr_14", "volatility", "drawdown", "vwap")
+
+# Периодов в году для годовой волатильности; для внутридневных таймфреймов
+# число баров в торговом дне оценивается по самим данным
+PERIODS_PER_YEAR = {"TIME_FRAME_D": 252, "TIME_FRAME_W": 52, "TIME_FRAME_MN": 12, "TIME_FRAME_QR": 4}
+TRADING_DAYS_PER_YEAR = 252
+
+# Порядок (1 - alpha)^k, до которого EWM считается одним блоком без потери точности
+_EWM_MIN_SCALE = 1e-200
+
+_INDICATOR_RE = re.compile(r"^([a-z]+)(?:[_:](\d+))?$")
+
+
+def returns(close: np.ndarray) -> np.ndarray:
+    """Простая доходность бар к бару"""
+    out = np.full(len(close), np.nan)
+    out[1:] = close[1:] / close[:-1] - 1
+    return out
+
+
+def log_returns(close: np.ndarray) -> np.ndarray:
+    out = np.full(len(close), np.nan)
+    out[1:] = np.diff(np.log(close))
+    return out
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Простая скользящая средняя через кумулятивную сумму"""
+    out = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return out
+    cumsum = np.cumsum(np.insert(np.asarray(values, dtype=float), 0, 0.0))
+    out[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return out
+
+
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Экспоненциальное сглаживание y[t] = (1 - alpha) * y[t-1] + alpha * x[t], y[0] = x[0].
+
+    Рекурсия раскрывается в замкнутую форму через cumsum; ряд режется на блоки,
+    внутри которых множители (1 - alpha)^-k не переполняют float64.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty(len(values))
+    if not len(values):
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = values
+        return out
+    block = max(1, int(np.log(_EWM_MIN_SCALE) / np.log(decay))) if decay < 1 else len(values)
+
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(len(chunk))
+        out[start:start + len(chunk)] = powers * (decay * previous + np.cumsum(alpha * chunk / powers))
+        previous = out[start + len(chunk) - 1]
+    return out
+
+
+def ema(values: np.ndarray, window: int) -> np.ndarray:
+    """Экспоненциальная скользящая средняя (alpha = 2 / (window + 1))"""
+    out = ewm(values, 2.0 / (window + 1))
+    out[: window - 1] = np.nan
+    return out
+
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """RSI с сглаживанием Уайлдера (alpha = 1 / window)"""
+    out = np.full(len(close), np.nan)
+    if len(close) <= window:
+        return out
+    delta = np.diff(close)
+    avg_gain = ewm(np.clip(delta, 0, None), 1.0 / window)
+    avg_loss = ewm(np.clip(-delta, 0, None), 1.0 / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+    out[1:] = values
+    out[:window] = np.nan
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    out = np.asarray(high - low, dtype=float)
+    if len(close) > 1:
+        previous = close[:-1]
+        out[1:] = np.maximum.reduce([out[1:], np.abs(high[1:] - previous), np.abs(low[1:] - previous)])
+    return out
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    """Average True Range (Уайлдер)"""
+    out = ewm(true_range(high, low, close), 1.0 / window)
+    out[: window - 1] = np.nan
+    return out
+
+
+def periods_per_year(timestamps: np.ndarray, timeframe: str) -> float:
+    if timeframe in PERIODS_PER_YEAR:
+        return PERIODS_PER_YEAR[timeframe]
+    days = len(np.unique(np.asarray(timestamps) // 86400)) or 1
+    return TRADING_DAYS_PER_YEAR * len(timestamps) / days
+
+
+def realized_volatility(close: np.ndarray, periods: float) -> float:
+    """Годовая реализованная волатильность по лог-доходностям"""
+    if len(close) < 3:
+        return float("nan")
+    return float(np.nanstd(np.diff(np.log(close)), ddof=1) * np.sqrt(periods))
+
+
+def drawdown(close: np.ndarray) -> np.ndarray:
+    """Просадка от исторического максимума (0 или отрицательная доля)"""
+    return close / np.maximum.accumulate(close) - 1
+
+
+def max_drawdown(close: np.ndarray) -> Tuple[float, int, int]:
+    """Максимальная просадка и индексы пика и дна"""
+    if not len(close):
+        return float("nan"), -1, -1
+    series = drawdown(close)
+    trough = int(np.argmin(series))
+    peak = int(np.argmax(close[: trough + 1]))
+    return float(series[trough]), peak, trough
+
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """Накопленная VWAP по типичной цене (H + L + C) / 3"""
+    typical = (high + low + close) / 3
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.cumsum(typical * volume) / np.cumsum(volume)
+
+
+def parse_indicators(indicators: Optional[Iterable[str] | str]) -> List[Tuple[str, Optional[int]]]:
+    """["sma_50", "rsi", "ema:9"] или "sma_50,rsi" -> [("sma", 50), ("rsi", None), ("ema", 9)]"""
+    if indicators is None:
+        indicators = DEFAULT_INDICATORS
+    if isinstance(indicators, str):
+        indicators = indicators.split(",")
+    parsed = []
+    for item in indicators:
+        match = _INDICATOR_RE.match(str(item).strip().lower())
+        if not match:
+            raise ValueError(f"Неизвестный индикатор: {item}")
+        parsed.append((match.group(1), int(match.group(2)) if match.group(2) else None))
+    return parsed
+
+
+def _last(values: np.ndarray, digits: int = 4) -> Optional[float]:
+    if not len(values) or not np.isfinite(values[-1]):
+        return None
+    return round(float(values[-1]), digits)
+
+
+def summarize(bars: Bars, timeframe: str, indicators: Optional[Iterable[str] | str] = None) -> Dict[str, Any]:
+    """Последние значения выбранных индикаторов по ряду баров"""
+    timestamps = np.asarray(bars["timestamp"])
+    close = np.asarray(bars["close"], dtype=float)
+    high = np.asarray(bars["high"], dtype=float)
+    low = np.asarray(bars["low"], dtype=float)
+    volume = np.asarray(bars["volume"], dtype=float)
+
+    result: Dict[str, Any] = {"timeframe": timeframe, "bars": int(len(close))}
+    if not len(close):
+        return result
+    result.update({
+        "from": format_timestamp(timestamps[0]),
+        "to": format_timestamp(timestamps[-1]),
+        "last_close": _last(close),
+    })
+
+    values: Dict[str, Any] = {}
+    for name, window in parse_indicators(indicators):
+        if name == "return":
+            values["return_pct"] = round(float((close[-1] / bars["open"][0] - 1) * 100), 2)
+        elif name == "sma":
+            window = window or 20
+            values[f"sma_{window}"] = _last(sma(close, window))
+        elif name == "ema":
+            window = window or 20
+            values[f"ema_{window}"] = _last(ema(close, window))
+        elif name == "rsi":
+            window = window or 14
+            values[f"rsi_{window}"] = _last(rsi(close, window), 2)
+        elif name == "atr":
+            window = window or 14
+            values[f"atr_{window}"] = _last(atr(high, low, close, window))
+        elif name == "volatility":
+            vol = realized_volatility(close, periods_per_year(timestamps, timeframe))
+            values["volatility_annual_pct"] = round(vol * 100, 2) if np.isfinite(vol) else None
+        elif name == "drawdown":
+            depth, peak, trough = max_drawdown(close)
+            values["max_drawdown_pct"] = round(depth * 100, 2)
+            values["drawdown_peak"] = format_timestamp(timestamps[peak])
+            values["drawdown_trough"] = format_timestamp(timestamps[trough])
+            values["current_drawdown_pct"] = round(float(drawdown(close)[-1]) * 100, 2)
+        elif name == "vwap":
+            values["vwap"] = _last(vwap(high, low, close, volume))
+        else:
+            raise ValueError(f"Неизвестный индикатор: {name}")
+    result["indicators"] = values
+    return result
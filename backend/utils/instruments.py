@@ -0,0 +1,561 @@
+"""
+Справочник инструментов Finam в памяти: TICKER@BOARD по тикеру, началу
+названия, названию с опечаткой или сленгу ("Сбер", "Норникель").
+
+Список активов (GET /v1/assets) загружается один раз при старте и
+обновляется раз в INSTRUMENTS_REFRESH_INTERVAL. Последний успешно
+загруженный список сохраняется в снимок (INSTRUMENTS_SNAPSHOT), с которого
+справочник поднимается при старте и без доступа к Finam
+(generate_submission.py).
+
+Слова названий приводятся к ключу: нижний регистр, ё -> е, отсечение
+окончаний (простой стеммер), транслитерация в латиницу и упрощение
+написания (x -> ks, y -> i, удвоенные буквы), поэтому "Роснефти",
+"Роснефть" и "rosneft" дают один ключ. По ключам строятся:
+  - словарь ключ -> инструменты (слово целиком),
+  - отсортированный список ключей (начало слова, bisect),
+  - словарь удалений одной буквы (опечатка в одну букву: пропуск, лишняя,
+    замена или перестановка соседних).
+Поиск — несколько обращений к словарям на слово запроса, без перебора
+всего списка. Инструменты пронумерованы в порядке предпочтения (акции
+раньше облигаций, MISX раньше других бирж, обыкновенные раньше
+привилегированных), поэтому при равной оценке побеждает меньший номер.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from os.path import dirname, join
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.log import get_logger, log_event
+
+logger = get_logger("instruments")
+
+DEFAULT_SNAPSHOT_PATH = join(dirname(__file__), "..", "instruments.json")
+
+# Сленг и названия, которых нет в официальных именах эмитентов. Ключи
+# проходят ту же нормализацию, что и запрос ("сбера" = "сбер");
+# инструменты, которых нет в списке Finam, пропускаются
+SLANG: Dict[str, str] = {
+    "сбер": "SBER@MISX",
+    "норникель": "GMKN@MISX",
+    "норильский": "GMKN@MISX",
+    "nornickel": "GMKN@MISX",
+    "мосбиржа": "MOEX@MISX",
+    "газпромнефть": "SIBN@MISX",
+    "тинькофф": "TCSG@MISX",
+    "tinkoff": "TCSG@MISX",
+    "хедхантер": "HEAD@MISX",
+    "headhunter": "HEAD@MISX",
+    "пятерочка": "FIVE@MISX",
+    "эппл": "AAPL@XNGS",
+    "эпл": "AAPL@XNGS",
+    "тесла": "TSLA@XNGS",
+    "майкрософт": "MSFT@XNGS",
+    "амазон": "AMZN@XNGS",
+}
+
+# Организационно-правовые формы и пометки класса акций — не часть названия
+STOPWORDS = frozenset({
+    "пао", "оао", "зао", "ооо", "ао", "ап", "мкпао", "ипао", "нк", "сз", "ук", "пиф", "бпиф", "опиф", "зпиф", "др",
+    "inc", "corp", "corporation", "co", "company", "ltd", "plc", "llc", "sa", "ag", "nv", "se", "the", "com",
+    "class", "cl", "adr", "gdr",
+})
+PREFERRED_MARKS = frozenset({"ап", "pref", "preferred"})
+# Общие слова названий: в свободном тексте не указывают на компанию ("сколько стоит банк")
+GENERIC_WORDS = (
+    "банк", "группа", "компания", "холдинг", "россия", "российский", "международный", "национальный",
+    "нефть", "энергия", "финанс", "инвест", "капитал", "индекс", "фонд", "bank", "group", "holding",
+    "international", "national", "global", "energy", "capital", "financial", "first", "american", "index", "fund",
+)
+
+# Порядок предпочтения при равной оценке и множитель оценки по типу
+TYPE_RANK = {"EQUITIES": 0, "FUNDS": 1, "FUTURES": 2, "BONDS": 3}
+TYPE_WEIGHT = {"EQUITIES": 1.0, "FUNDS": 0.97, "FUTURES": 0.95}
+BOARD_RANK = {"MISX": 0, "RTSX": 1, "XNGS": 2, "XNYS": 3}
+# Типы, чьи названия ищутся в свободном тексте (find_in_text)
+HEAD_TYPES = frozenset({"EQUITIES", "FUNDS"})
+
+# Ограничения поиска: инструментов на ключ, ключей и инструментов по началу слова
+MAX_POSTINGS = 256
+MAX_PREFIX_KEYS = 32
+MAX_PREFIX_IDS = 128
+# Слово считается названием компании в тексте, если встречается не больше чем в стольких названиях
+HEAD_MAX_DF = 8
+
+# Порядок видов совпадения: итоговый вид — худший из слов запроса
+MATCH_ORDER = {"symbol": 0, "ticker": 1, "alias": 2, "name": 3, "prefix": 4, "fuzzy": 5}
+
+_WORD_RE = re.compile(r"[0-9a-zа-я]+")
+_TEXT_WORD_RE = re.compile(r"[0-9A-Za-zА-Яа-яЁё]+")
+_TICKER_IN_TEXT_RE = re.compile(r"[A-Z][A-Za-z0-9]{1,6}")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_REPEATS_RE = re.compile(r"(.)\1+")
+
+_RU_ENDINGS = tuple(sorted((
+    "иями", "ями", "ами", "ией", "его", "ого", "ему", "ому", "ыми", "ими", "иях", "ях", "ах", "ов", "ев",
+    "ей", "ой", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ом", "ем", "ам", "ям", "ую", "юю",
+    "ия", "ии", "ию", "а", "я", "у", "ю", "ы", "и", "е", "о", "ь", "й",
+), key=len, reverse=True))
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i", "й": "i",
+    "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "i", "ь": "", "э": "e",
+    "ю": "iu", "я": "ia",
+})
+# Упрощение латинского написания к виду транслитерации
+_LATIN = (("ph", "f"), ("ck", "k"), ("x", "ks"), ("w", "v"), ("q", "k"), ("c", "k"), ("y", "i"))
+
+
+def words(text: str) -> List[str]:
+    """Слова текста: нижний регистр, ё -> е, без знаков препинания"""
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+def stem(word: str) -> str:
+    """Отсечение окончания: русские падежные окончания, английское множественное -s"""
+    if _CYRILLIC_RE.search(word):
+        for ending in _RU_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= 3:
+                return word[:-len(ending)]
+        return word
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=1 << 16)
+def word_key(word: str, stemmed: bool = True) -> str:
+    """Ключ слова для индекса: основа в латинице без удвоенных букв ("Роснефти" -> "rosneft")"""
+    if stemmed:
+        word = stem(word)
+    if not _CYRILLIC_RE.search(word):
+        for old, new in _LATIN:
+            word = word.replace(old, new)
+    return _REPEATS_RE.sub(r"\1", word.translate(_TRANSLIT))
+
+
+def _deletes(key: str) -> Iterator[str]:
+    return (key[:i] + key[i + 1:] for i in range(len(key)))
+
+
+@dataclass(frozen=True)
+class Instrument:
+    """Инструмент из списка активов Finam"""
+
+    symbol: str
+    ticker: str
+    mic: str
+    name: str
+    type: str = ""
+    isin: str = ""
+
+    @classmethod
+    def from_asset(cls, asset: Dict[str, Any]) -> Optional["Instrument"]:
+        """Запись ответа /v1/assets; None — без тикера или биржи"""
+        ticker = str(asset.get("ticker") or "")
+        mic = str(asset.get("mic") or "")
+        symbol = str(asset.get("symbol") or (f"{ticker}@{mic}" if ticker and mic else ""))
+        if "@" not in symbol:
+            return None
+        ticker, _, mic = symbol.partition("@")
+        return cls(
+            symbol=symbol,
+            ticker=ticker,
+            mic=mic,
+            name=str(asset.get("name") or ""),
+            type=str(asset.get("type") or ""),
+            isin=str(asset.get("isin") or ""),
+        )
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """Кандидат разрешения названия: оценка 0..1 и вид совпадения"""
+
+    symbol: str
+    name: str
+    score: float
+    match: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class InstrumentIndex:
+    """Неизменяемый индекс списка инструментов (при обновлении строится новый)"""
+
+    def __init__(self, instruments: Iterable[Instrument]) -> None:
+        unique = {instrument.symbol: instrument for instrument in instruments}
+        parsed = [(instrument, words(instrument.name)) for instrument in unique.values()]
+        parsed.sort(key=lambda item: (
+            TYPE_RANK.get(item[0].type, 9),
+            BOARD_RANK.get(item[0].mic, 9),
+            bool(PREFERRED_MARKS.intersection(item[1])),
+            len(item[0].name),
+            item[0].symbol,
+        ))
+        self.instruments: List[Instrument] = [instrument for instrument, _ in parsed]
+        self.by_symbol: Dict[str, int] = {}
+        self.by_ticker: Dict[str, List[int]] = {}
+        self.tickers_exact: Dict[str, int] = {}
+        # Число значимых слов названия — для доли названия, покрытой запросом
+        self.sizes: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        # Слово целиком -> ключ: стеммер режет и несклоняемое ("Газпром" -> "газпр"),
+        # а в запросе то же слово может прийти без окончания или латиницей
+        self.forms: Dict[str, str] = {}
+        # Значимые ключи названий (без цифр) по инструментам — для названий в тексте
+        significant: List[List[str]] = []
+
+        for i, (instrument, name_words) in enumerate(parsed):
+            self.by_symbol[instrument.symbol.upper()] = i
+            self.by_ticker.setdefault(instrument.ticker.upper(), []).append(i)
+            self.tickers_exact.setdefault(instrument.ticker, i)
+            keys = []
+            for word in name_words:
+                key = word_key(word) if word not in STOPWORDS else ""
+                if key and key not in keys:
+                    keys.append(key)
+                    full = word_key(word, stemmed=False)
+                    if full != key:
+                        self.forms.setdefault(full, key)
+            for key in keys:
+                postings.setdefault(key, []).append(i)
+            named = [key for key in keys if not any(ch.isdigit() for ch in key)]
+            significant.append(named)
+            self.sizes.append(max(1, len(named)))
+
+        self.words: Dict[str, Tuple[int, ...]] = {key: tuple(ids) for key, ids in postings.items()}
+        self.keys: List[str] = sorted(self.words)
+        self.tickers: List[str] = sorted(self.by_ticker)
+        # Удаления одной буквы -> ключи (ключи от 4 букв: короткие слова с опечаткой неразличимы)
+        self.deletes: Dict[str, List[str]] = {}
+        for key in self.keys:
+            if len(key) >= 4:
+                self.deletes.setdefault(key, []).append(key)
+                for variant in set(_deletes(key)):
+                    self.deletes.setdefault(variant, []).append(key)
+
+        self.slang: Dict[str, int] = {}
+        for alias, symbol in SLANG.items():
+            if symbol.upper() in self.by_symbol:
+                self.slang[" ".join(self.key(word) for word in words(alias))] = self.by_symbol[symbol.upper()]
+
+        # Названия компаний в тексте: первое значимое слово (от 4 букв, редкое в списке)
+        # и пара первых слов ("Газпром нефть")
+        frequency: Dict[str, int] = {}
+        for i, named in enumerate(significant):
+            if self.instruments[i].type in HEAD_TYPES:
+                for key in named:
+                    frequency[key] = frequency.get(key, 0) + 1
+        generic = {self.key(word) for word in GENERIC_WORDS}
+        self.heads: Dict[str, int] = {}
+        self.head_pairs: Dict[Tuple[str, str], int] = {}
+        for i, named in enumerate(significant):
+            if self.instruments[i].type not in HEAD_TYPES or not named:
+                continue
+            if len(named) >= 2:
+                self.head_pairs.setdefault((named[0], named[1]), i)
+            head = next((key for key in named[:2] if len(key) >= 4 and key not in generic), None)
+            if head is not None and frequency[head] <= HEAD_MAX_DF:
+                self.heads.setdefault(head, i)
+
+    @classmethod
+    def from_assets(cls, assets: Iterable[Dict[str, Any]]) -> "InstrumentIndex":
+        """Индекс по списку активов Finam (архивные пропускаются)"""
+        return cls(
+            instrument for instrument in (
+                Instrument.from_asset(asset) for asset in assets if not asset.get("is_archived")
+            ) if instrument is not None
+        )
+
+    def key(self, word: str) -> str:
+        """Ключ слова запроса (words()) с учётом форм слов из названий"""
+        key = word_key(word)
+        if key in self.words:
+            return key
+        return self.forms.get(key) or self.forms.get(word_key(word, stemmed=False)) or key
+
+    def __len__(self) -> int:
+        return len(self.instruments)
+
+    def get(self, symbol: str) -> Optional[Instrument]:
+        i = self.by_symbol.get(symbol.upper())
+        return self.instruments[i] if i is not None else None
+
+    def _candidate(self, i: int, score: float, match: str) -> Candidate:
+        instrument = self.instruments[i]
+        return Candidate(instrument.symbol, instrument.name, round(score, 3), match)
+
+    def _match_key(self, key: str) -> Iterator[Tuple[Tuple[int, ...], float, str]]:
+        """Инструменты по ключу слова запроса: (номера, вес, вид совпадения)"""
+        exact = self.words.get(key)
+        if exact:
+            yield exact[:MAX_POSTINGS], 1.0, "name"
+        if len(key) >= 2:
+            budget = MAX_PREFIX_IDS
+            start = bisect_left(self.keys, key)
+            for longer in self.keys[start:start + MAX_PREFIX_KEYS]:
+                if not longer.startswith(key) or budget <= 0:
+                    break
+                if longer != key:
+                    ids = self.words[longer][:budget]
+                    budget -= len(ids)
+                    yield ids, 0.5 + 0.4 * len(key) / len(longer), "prefix"
+        if not exact and len(key) >= 4:
+            similar = set(self.deletes.get(key, ()))
+            for variant in _deletes(key):
+                similar.update(self.deletes.get(variant, ()))
+            for other in similar:
+                yield self.words[other][:MAX_POSTINGS], 0.7, "fuzzy"
+
+    def resolve(self, query: str, limit: int = 5) -> List[Candidate]:
+        """
+        Кандидаты TICKER@BOARD для запроса по убыванию оценки.
+
+        Оценки: полный TICKER@BOARD — 1.0, тикер — 0.95, сленг — 0.9, название —
+        до 0.85 (доля слов запроса и доля названия, тип инструмента); начало слова
+        и опечатка в одну букву весят меньше целого слова.
+        """
+        query = query.strip()
+        if not query or not self.instruments:
+            return []
+        best: Dict[int, Tuple[float, str]] = {}
+
+        def offer(i: int, score: float, match: str) -> None:
+            if score > best.get(i, (0.0, ""))[0]:
+                best[i] = (score, match)
+
+        compact = query.replace(" ", "").upper()
+        if compact in self.by_symbol:
+            offer(self.by_symbol[compact], 1.0, "symbol")
+        ticker = compact.partition("@")[0]
+        for i in self.by_ticker.get(ticker, ()):
+            offer(i, 0.95, "ticker")
+        if ticker.isascii() and ticker.isalnum() and len(ticker) >= 2:
+            start = bisect_left(self.tickers, ticker)
+            for longer in self.tickers[start:start + MAX_PREFIX_KEYS]:
+                if not longer.startswith(ticker):
+                    break
+                for i in self.by_ticker[longer]:
+                    offer(i, 0.6 + 0.3 * len(ticker) / len(longer), "prefix")
+
+        query_words = words(query)
+        keys = [self.key(word) for word in query_words if word not in STOPWORDS]
+        keys = [key for key in keys if key]
+        for alias in (" ".join(keys), *keys):
+            if alias in self.slang:
+                offer(self.slang[alias], 0.9, "alias")
+
+        if keys:
+            # Номер инструмента -> [сумма весов, совпавших слов, худший вид совпадения]
+            totals: Dict[int, List[Any]] = {}
+            for key in keys:
+                per_key: Dict[int, Tuple[float, str]] = {}
+                for ids, weight, match in self._match_key(key):
+                    for i in ids:
+                        if weight > per_key.get(i, (0.0, ""))[0]:
+                            per_key[i] = (weight, match)
+                for i, (weight, match) in per_key.items():
+                    total = totals.setdefault(i, [0.0, 0, "name"])
+                    total[0] += weight
+                    total[1] += 1
+                    if MATCH_ORDER[match] > MATCH_ORDER[total[2]]:
+                        total[2] = match
+            for i, (weight, matched, match) in totals.items():
+                coverage = min(1.0, matched / self.sizes[i])
+                score = 0.85 * weight / len(keys) * (0.7 + 0.3 * coverage)
+                offer(i, score * TYPE_WEIGHT.get(self.instruments[i].type, 0.9), match)
+
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1][0], item[0]))
+        return [self._candidate(i, score, match) for i, (score, match) in top]
+
+    def find_in_text(self, text: str) -> List[Tuple[str, Candidate]]:
+        """
+        Инструменты, упомянутые в свободном тексте, в порядке появления:
+        (упоминание, кандидат). Ищутся только надёжные признаки — тикер,
+        написанный как тикер ("SBER", "SiZ5"), сленг и название компании
+        (первое слово названия акции или фонда, редкое в списке); явный
+        TICKER@BOARD разбирает вызывающий код.
+        """
+        if not self.instruments:
+            return []
+        tokens = [
+            m for m in _TEXT_WORD_RE.finditer(text)
+            if text[m.end():m.end() + 1] != "@" and text[m.start() - 1:m.start()] != "@"
+        ]
+        keys = [self.key(words(m.group())[0]) for m in tokens]
+        found: List[Tuple[str, Candidate]] = []
+        seen = set()
+        skip = False
+        for position, m in enumerate(tokens):
+            if skip:
+                skip = False
+                continue
+            key = keys[position]
+            mention = m.group()
+            pair = (key, keys[position + 1]) if position + 1 < len(keys) else None
+            if pair is not None and (" ".join(pair) in self.slang or pair in self.head_pairs):
+                i, score, match = (
+                    (self.slang[" ".join(pair)], 0.9, "alias") if " ".join(pair) in self.slang
+                    else (self.head_pairs[pair], 0.85, "name")
+                )
+                mention = text[m.start():tokens[position + 1].end()]
+                skip = True
+            elif _TICKER_IN_TEXT_RE.fullmatch(mention) and mention in self.tickers_exact:
+                i, score, match = self.tickers_exact[mention], 0.95, "ticker"
+            elif key in self.slang:
+                i, score, match = self.slang[key], 0.9, "alias"
+            elif key in self.heads:
+                i, score, match = self.heads[key], 0.85, "name"
+            else:
+                continue
+            candidate = self._candidate(i, score, match)
+            if candidate.symbol not in seen:
+                seen.add(candidate.symbol)
+                found.append((mention, candidate))
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "instruments": len(self.instruments),
+            "keys": len(self.keys),
+            "deletes": len(self.deletes),
+            "heads": len(self.heads) + len(self.head_pairs),
+        }
+
+
+class InstrumentDirectory:
+    """
+    Текущий индекс инструментов: снимок на диске, загрузка из Finam и
+    периодическое обновление. Новый индекс строится в отдельном потоке и
+    подменяет старый целиком, так что поиск не ждёт обновления.
+    """
+
+    def __init__(self, snapshot_path: str | None = None, refresh_interval: float | None = None) -> None:
+        """
+        Args:
+            snapshot_path: Файл снимка списка активов (INSTRUMENTS_SNAPSHOT)
+            refresh_interval: Период обновления из Finam, сек (INSTRUMENTS_REFRESH_INTERVAL);
+                0 — только снимок, без запросов к Finam
+        """
+        self.snapshot_path = snapshot_path or os.getenv("INSTRUMENTS_SNAPSHOT", DEFAULT_SNAPSHOT_PATH)
+        if refresh_interval is None:
+            refresh_interval = float(os.getenv("INSTRUMENTS_REFRESH_INTERVAL", "86400"))
+        self.refresh_interval = refresh_interval
+        self.index = InstrumentIndex(())
+        self.source = "empty"
+        # Время получения списка из Finam (для снимка — время его сохранения)
+        self.updated_at = 0.0
+        self.build_seconds = 0.0
+        self.refreshes = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _swap(self, assets: Sequence[Dict[str, Any]], source: str, updated_at: float) -> None:
+        started = time.perf_counter()
+        index = InstrumentIndex.from_assets(assets)
+        self.build_seconds = time.perf_counter() - started
+        self.index = index
+        self.source = source
+        self.updated_at = updated_at
+        log_event(logger, "instruments.loaded", logging.INFO, source=source, instruments=len(index),
+                  build_ms=round(self.build_seconds * 1000, 1))
+
+    def load_snapshot(self) -> bool:
+        """Поднять индекс из снимка; False — снимка нет или он повреждён"""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            log_event(logger, "instruments.snapshot_error", logging.WARNING, path=self.snapshot_path, error=str(e))
+            return False
+        assets = data.get("assets") if isinstance(data, dict) else None
+        if not assets:
+            return False
+        self._swap(assets, "snapshot", data.get("saved_at") or os.path.getmtime(self.snapshot_path))
+        return True
+
+    def save_snapshot(self, assets: Sequence[Dict[str, Any]]) -> None:
+        """Записать снимок (через временный файл: прерванная запись не портит прошлый снимок)"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "assets": list(assets)}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def refresh(self, client: Any) -> bool:
+        """Загрузить список активов из Finam (AsyncFinamAPIClient), перестроить индекс и снимок"""
+        response = await client.get_assets()
+        assets = response.get("assets")
+        if "error" in response or not assets:
+            self.errors += 1
+            log_event(logger, "instruments.refresh_error", logging.WARNING, error=str(response.get("error", "empty")))
+            return False
+        await asyncio.to_thread(self._swap, assets, "finam", time.time())
+        self.refreshes += 1
+        try:
+            await asyncio.to_thread(self.save_snapshot, assets)
+        except OSError as e:
+            log_event(logger, "instruments.snapshot_error", logging.WARNING, path=self.snapshot_path, error=str(e))
+        return True
+
+    def start(self, client: Any) -> None:
+        """Фоновая задача: снимок, затем обновления из Finam (при старте приложения)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(client))
+
+    async def _run(self, client: Any) -> None:
+        if self.source == "empty":
+            await asyncio.to_thread(self.load_snapshot)
+        if self.refresh_interval <= 0:
+            return
+        # Свежий снимок не перезагружается сразу; при ошибках — повтор через 1, 2, 4... мин
+        delay = max(0.0, self.updated_at + self.refresh_interval - time.time())
+        backoff = 60.0
+        while True:
+            await asyncio.sleep(delay)
+            if await self.refresh(client):
+                delay, backoff = self.refresh_interval, 60.0
+            else:
+                delay, backoff = min(backoff, self.refresh_interval), backoff * 2
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def resolve(self, query: str, limit: int = 5) -> List[Candidate]:
+        return self.index.resolve(query, limit)
+
+    def find_in_text(self, text: str) -> List[Tuple[str, Candidate]]:
+        return self.index.find_in_text(text)
+
+    def hint(self, text: str) -> str:
+        """Подсказка для LLM с тикерами упомянутых инструментов ("" — ничего не найдено)"""
+        found = self.find_in_text(text)
+        if not found:
+            return ""
+        return "Инструменты из вопроса: " + "; ".join(f"{mention} → {c.symbol}" for mention, c in found)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "source": self.source,
+            "age_seconds": round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            "build_ms": round(self.build_seconds * 1000, 1),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
@@ -0,0 +1,460 @@
+"""
+Локальный роутер намерений: разбирает типовые вопросы без обращения к LLM.
+
+Возвращает метод клиента Finam (ключ METHOD_TO_HTTP / метод FinamAPIClient),
+его параметры и оценку уверенности. При низкой уверенности вызывающий код
+должен обратиться к LLM.
+"""
+
+import calendar
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Pattern, Set, Tuple
+
+from utils.registry import METHODS
+
+if TYPE_CHECKING:
+    from utils.instruments import InstrumentDirectory
+
+DEFAULT_THRESHOLD = 0.75
+
+# Названия и сленг -> TICKER@BOARD. Более длинные названия идут раньше коротких
+# ("Газпром нефть" раньше "Газпрома").
+NAME_ALIASES: List[Tuple[str, str]] = [
+    (r"газпром\w*\s+нефт\w*", "SIBN@MISX"),
+    (r"газпром\w*", "GAZP@MISX"),
+    (r"сбер\w*", "SBER@MISX"),
+    (r"роснефт\w*", "ROSN@MISX"),
+    (r"лукойл\w*", "LKOH@MISX"),
+    (r"норникел\w*", "GMKN@MISX"),
+    (r"норильск\w*", "GMKN@MISX"),
+    (r"втб", "VTBR@MISX"),
+    (r"магнит\w*", "MGNT@MISX"),
+    (r"аэрофлот\w*", "AFLT@MISX"),
+    (r"новат[эе]к\w*", "NVTK@MISX"),
+    (r"полюс\w*", "PLZL@MISX"),
+    (r"яндекс\w*", "YNDX@MISX"),
+    (r"мтс", "MTSS@MISX"),
+    (r"северстал\w*", "CHMF@MISX"),
+    (r"татнефт\w*", "TATN@MISX"),
+    (r"сургутнефтегаз\w*", "SNGS@MISX"),
+    (r"алрос\w*", "ALRS@MISX"),
+    (r"фосагро\w*", "PHOR@MISX"),
+    (r"озон\w*", "OZON@MISX"),
+    (r"ozon", "OZON@MISX"),
+    (r"тинькофф\w*", "TCSG@MISX"),
+    (r"tcs\s+group", "TCSG@MISX"),
+    (r"x5(?:\s+retail\s+group)?", "FIVE@MISX"),
+    (r"vk", "VKCO@MISX"),
+    (r"пик", "PIKK@MISX"),
+    (r"мосбирж\w*", "MOEX@MISX"),
+    (r"русал\w*", "RUAL@MISX"),
+    (r"интер\s+рао", "IRAO@MISX"),
+    (r"нлмк", "NLMK@MISX"),
+    (r"фск(?:\s+еэс)?", "FEES@MISX"),
+    (r"юнипро", "UPRO@MISX"),
+    (r"транснефт\w*", "TRNFP@MISX"),
+    (r"распадск\w*", "RASP@MISX"),
+    (r"русагро", "AGRO@MISX"),
+    (r"полиметалл\w*", "POLY@MISX"),
+    (r"headhunter", "HEAD@MISX"),
+    (r"детск\w+\s+мир\w*", "DSKY@MISX"),
+    (r"apple", "AAPL@XNGS"),
+    (r"tesla", "TSLA@XNGS"),
+    (r"microsoft", "MSFT@XNGS"),
+    (r"amazon", "AMZN@XNGS"),
+]
+
+# Индекс названий по первым двум буквам: текст сканируется по словам,
+# и регулярка проверяется только для названий с подходящим началом
+_WORD_RE = re.compile(r"\w+")
+_ALIAS_INDEX: Dict[str, List[Tuple[Pattern[str], str]]] = {}
+for _alias, _symbol in NAME_ALIASES:
+    _ALIAS_INDEX.setdefault(_alias[:2], []).append((re.compile(rf"(?:{_alias})(?!\w)"), _symbol))
+
+
+def _find_aliases(text: str):
+    """Инструменты, упомянутые по названию, в порядке появления в тексте"""
+    lowered = text.lower()
+    for word in _WORD_RE.finditer(lowered):
+        for pattern, symbol in _ALIAS_INDEX.get(word.group()[:2], ()):
+            if pattern.match(lowered, word.start()):
+                yield symbol
+                break
+
+
+SYMBOL_RE = re.compile(r"(?<![\w@])([A-Za-z][A-Za-z0-9_]*@[A-Z]{3,5})(?![\w@])")
+ORDER_ID_RE = re.compile(r"(?<!\w)(ORD[A-Z0-9]+)(?!\w)")
+NUMBER = r"(\d+(?:[.,]\d+)?)"
+
+# Темы, которые роутер не умеет обслуживать сам (маржа под шорт, лоты,
+# расписание сессий, справочные поля инструмента, токен и т.д.)
+_UNSUPPORTED_RE = re.compile(
+    r"шорт|коротк|лот[аеуы]?\b|isin|\bmic\b|обеспечен|\bго\b|время|"
+    r"(?:вечерн|утренн|основн|торгов)\w* сесси(?!ю)|(?:о|моей|этой) сесси|токен|опцион|"
+    r"экспирац|шаг\w* цены|десятичн|тип\w*\b|режим\w* торгов|ставк\w* риска|"
+    r"hard to borrow|заимствован|ограничен|запре[тщ]|доступ|задержк|бирж[иа]\b|"
+    r"идентификатор|называется|торгуется|открывается|закрывается|работает|параметр",
+    re.IGNORECASE,
+)
+
+_MULTI_RE = re.compile(r"сравни|сопостав", re.IGNORECASE)
+# Вопрос о заявке, а не поручение: "как отменить", "можно ли купить", "почему не исполнилась"
+_ASK_RE = re.compile(
+    r"\?|\bкак\b|можно ли|\bли\b|почему|зачем|сколько стоит|стоит ли|что будет|что если|что значит|"
+    r"объясни|расскажи|подскажи|\bесть смысл",
+    re.IGNORECASE,
+)
+# Отрицание действия: "не отменяй", "не надо покупать"
+_NEGATION_RE = re.compile(r"\bне\s+(?:надо\s+|нужно\s+|стоит\s+|буду\s+)?(?:отмен|сним|снять|убер|удал|куп|покуп|прода)|\bнельзя\b", re.IGNORECASE)
+_CANCEL_RE = re.compile(r"отмен|сним|снять|убрать|убери|удали", re.IGNORECASE)
+_ORDER_WORD_RE = re.compile(r"ордер|заявк|приказ", re.IGNORECASE)
+_ORDERS_LIST_RE = re.compile(
+    r"\b(мои|моих|все|список|покажи|выведи|отобрази|какие)\b|в работе|активн|исполнен", re.IGNORECASE
+)
+_BUY_RE = re.compile(r"купи|покупк|покупа", re.IGNORECASE)
+_SELL_RE = re.compile(r"прода[йжтв]|продаж", re.IGNORECASE)
+_ORDERBOOK_RE = re.compile(
+    r"стакан|глубин\w* (?:рынка|стакана)|ордербук|очеред\w* заявок|bid и ask|бид и аск|"
+    r"уровн\w* на (?:покупку|продажу)|предложени\w* на продажу|стоит на покупку",
+    re.IGNORECASE,
+)
+_CANDLES_RE = re.compile(
+    r"свеч|график|бар[ыов]?\b|исторически|таймфрейм|дневк|цен\w* (?:закрытия|открытия)|"
+    r"(?:максимальн|минимальн)\w* цен|максимум|минимум|изменени\w* цен",
+    re.IGNORECASE,
+)
+_QUOTE_RE = re.compile(
+    r"котировк|цен[аыу]\b|сколько (?:сейчас )?стоит|последн\w+ цен",
+    re.IGNORECASE,
+)
+_TRADES_RE = re.compile(
+    r"сделк|сделок|транзакци|операци|выписк|торговал|списан|пополнени|вывод\w* средств|перевод|комисси",
+    re.IGNORECASE,
+)
+# Обезличенные сделки по инструменту: у клиента нет такого метода
+_MARKET_TRADES_RE = re.compile(r"лент\w* (?:обезличенных )?сделок|последн\w* сделк|поток сделок", re.IGNORECASE)
+_POSITIONS_RE = re.compile(r"позици|портфел|моих акци|сколько у меня", re.IGNORECASE)
+_ACCOUNT_RE = re.compile(
+    r"сч[её]т|баланс|кэш|equity|маржа|прибыл|\bп/у\b|\bpnl\b|денег|денежн",
+    re.IGNORECASE,
+)
+
+# Аналитика по свечам и по стакану (get_indicators / analyze_orderbook)
+_INDICATORS_RE = re.compile(
+    r"тренд|индикатор|\brsi\b|\bsma\b|\bema\b|\batr\b|\bvwap\b|скользящ|волатильн|доходност|просадк|динамик",
+    re.IGNORECASE,
+)
+_BOOK_ANALYTICS_RE = re.compile(r"спред|ликвидн|проскальз|дисбаланс", re.IGNORECASE)
+
+# Темы вопроса для сборки промпта (utils/prompts.py)
+TOPICS = ("market", "history", "account", "trading", "multi", "unsupported")
+
+_TIMEFRAMES: List[Tuple[Pattern[str], str]] = [
+    (re.compile(r"\b15[- ]?минут|15m\b", re.IGNORECASE), "TIME_FRAME_M15"),
+    (re.compile(r"\b30[- ]?минут|30m\b", re.IGNORECASE), "TIME_FRAME_M30"),
+    (re.compile(r"\b5[- ]?минут|\b5m\b", re.IGNORECASE), "TIME_FRAME_M5"),
+    (re.compile(r"\b1[- ]?минут|минутн", re.IGNORECASE), "TIME_FRAME_M1"),
+    (re.compile(r"\b2[- ]?час|двухчас", re.IGNORECASE), "TIME_FRAME_H2"),
+    (re.compile(r"\b4[- ]?час|четыр[её]хчас", re.IGNORECASE), "TIME_FRAME_H4"),
+    (re.compile(r"\b8[- ]?час", re.IGNORECASE), "TIME_FRAME_H8"),
+    (re.compile(r"часов", re.IGNORECASE), "TIME_FRAME_H1"),
+    (re.compile(r"квартальн", re.IGNORECASE), "TIME_FRAME_QR"),
+    (re.compile(r"месячн", re.IGNORECASE), "TIME_FRAME_MN"),
+    (re.compile(r"недельн|таймфрейм\w* w\b", re.IGNORECASE), "TIME_FRAME_W"),
+    (re.compile(r"дневн|дневк|\b1 день|таймфрейм\w* d\b", re.IGNORECASE), "TIME_FRAME_D"),
+]
+
+_MONTHS = {
+    "январ": 1, "феврал": 2, "март": 3, "апрел": 4, "ма[йя]": 5, "июн": 6,
+    "июл": 7, "август": 8, "сентябр": 9, "октябр": 10, "ноябр": 11, "декабр": 12,
+}
+_MONTH_RE = re.compile(r"\b(?:за|в)\s+(" + "|".join(_MONTHS) + r")\w*(?:\s+(\d{4}))?", re.IGNORECASE)
+
+
+@dataclass
+class Intent:
+    """Результат локального разбора вопроса"""
+
+    method: Optional[str]
+    params: Dict[str, Any] = field(default_factory=dict)
+    confidence: float = 0.0
+    rule: str = ""
+
+    def is_confident(self, threshold: float = DEFAULT_THRESHOLD) -> bool:
+        return self.method is not None and self.confidence >= threshold
+
+
+def _fmt(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class IntentRouter:
+    """
+    Первичный разбор вопросов пользователя на скомпилированных шаблонах.
+    """
+
+    def __init__(
+        self,
+        today: date | None = None,
+        threshold: float = DEFAULT_THRESHOLD,
+        instruments: "InstrumentDirectory | None" = None,
+        local_orders: bool = False,
+    ) -> None:
+        """
+        Args:
+            today: Текущая дата для относительных периодов ("сегодня", "с начала года")
+            threshold: Порог уверенности, ниже которого нужен LLM
+            instruments: Справочник инструментов Finam — названия вне NAME_ALIASES
+            local_orders: Разбирать без LLM и неидемпотентные методы (выставление и отмену
+                заявок). Только для генерации submission: в чате вызов сразу уходит в Finam
+        """
+        self._today = today
+        self.threshold = threshold
+        self.instruments = instruments
+        self.local_orders = local_orders
+
+    @property
+    def today(self) -> date:
+        return self._today or date.today()
+
+    # --- извлечение сущностей ---
+
+    def extract_symbol(self, text: str) -> Tuple[Optional[str], float]:
+        """Тикер из текста и уверенность в нём (явный TICKER@BOARD надёжнее названия)"""
+        match = SYMBOL_RE.search(text)
+        if match:
+            return match.group(1), 1.0
+        for symbol in _find_aliases(text):
+            return symbol, 0.9
+        # Справочник знает все инструменты Finam, но по названию в тексте уверенность ниже
+        if self.instruments is not None:
+            for _, candidate in self.instruments.find_in_text(text):
+                return candidate.symbol, min(candidate.score, 0.8)
+        return None, 0.0
+
+    def count_symbols(self, text: str) -> int:
+        """Сколько разных инструментов упомянуто в тексте"""
+        symbols = {m.group(1) for m in SYMBOL_RE.finditer(text)}
+        symbols.update(_find_aliases(text))
+        if self.instruments is not None:
+            symbols.update(candidate.symbol for _, candidate in self.instruments.find_in_text(text))
+        return len(symbols)
+
+    @staticmethod
+    def extract_order_id(text: str) -> Optional[str]:
+        match = ORDER_ID_RE.search(text)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def extract_timeframe(text: str) -> Optional[str]:
+        for pattern, timeframe in _TIMEFRAMES:
+            if pattern.search(text):
+                return timeframe
+        return None
+
+    def extract_period(self, text: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """(start, end, распознан ли период явно)"""
+        q = text.lower()
+        today = self.today
+        day_start = datetime.combine(today, time.min)
+        day_end = datetime.combine(today, time(23, 59, 59))
+
+        if "вчера" in q:
+            yesterday = day_start - timedelta(days=1)
+            return _fmt(yesterday), _fmt(yesterday.replace(hour=23, minute=59, second=59)), True
+        if "сегодня" in q or ("текущ" in q and "сесси" in q):
+            return _fmt(day_start), _fmt(day_end), True
+        if re.search(r"последн\w* час", q):
+            return _fmt(day_end - timedelta(hours=1)), _fmt(day_end), True
+        if re.search(r"прошл\w* недел|последн\w* (?:торгов\w* )?недел", q):
+            return _fmt(day_start - timedelta(days=7)), _fmt(day_start), True
+        if re.search(r"текущ\w* недел", q):
+            return _fmt(day_start - timedelta(days=today.weekday())), _fmt(day_end), True
+        if re.search(r"прошл\w* месяц", q):
+            last_month_end = day_start.replace(day=1) - timedelta(days=1)
+            return _fmt(last_month_end.replace(day=1)), _fmt(last_month_end.replace(hour=23, minute=59, second=59)), True
+        if re.search(r"последн\w* месяц", q):
+            return _fmt(day_start - timedelta(days=30)), _fmt(day_start), True
+        if re.search(r"текущ\w* месяц|этом месяце", q):
+            return _fmt(day_start.replace(day=1)), _fmt(day_end), True
+        if re.search(r"(?:этом|текущем|последн\w*) квартал", q):
+            quarter_start = day_start.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+            if "последн" in q:
+                quarter_start = day_start - timedelta(days=91)
+            return _fmt(quarter_start), _fmt(day_start), True
+        match = re.search(r"последни[ех]\s+(\d+)\s+(дн|дня|лет|год|недел|месяц)", q)
+        if match:
+            count, unit = int(match.group(1)), match.group(2)
+            days = {"дн": 1, "дня": 1, "лет": 365, "год": 365, "недел": 7, "месяц": 30}[unit]
+            return _fmt(day_start - timedelta(days=count * days)), _fmt(day_start), True
+        if re.search(r"начала года|этом году|с января", q):
+            return _fmt(day_start.replace(month=1, day=1)), _fmt(day_start), True
+        match = _MONTH_RE.search(q)
+        if match:
+            month = next(n for stem, n in _MONTHS.items() if re.match(stem, match.group(1)))
+            year = int(match.group(2)) if match.group(2) else today.year
+            last_day = calendar.monthrange(year, month)[1]
+            return (
+                _fmt(datetime(year, month, 1)),
+                _fmt(datetime(year, month, last_day, 23, 59, 59)),
+                True,
+            )
+        return _fmt(day_start.replace(month=1, day=1)), _fmt(day_start), False
+
+    def extract_order(self, text: str, symbol: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Тело заявки для create_order и уверенность разбора"""
+        q = text.lower()
+        if _SELL_RE.search(q):
+            side = "SIDE_SELL"
+        elif _BUY_RE.search(q):
+            side = "SIDE_BUY"
+        else:
+            return None, 0.0
+
+        quantity = re.search(r"(\d+)\s*(?:акци|лот|фьючерс|штук|шт\b|контракт|[A-Za-z]\w*@)", text)
+        if not quantity:
+            return None, 0.0
+
+        order: Dict[str, Any] = {
+            "symbol": symbol,
+            "quantity": {"value": f"{float(quantity.group(1))}"},
+            "side": side,
+        }
+        stop = re.search(r"(?:до|стоп[- ]цена)\s+" + NUMBER, q)
+        limit = re.search(r"(?:по\s+(?:цене\s+|лимитной цене\s+)?|лимит цена\s+|дешевле\s+)" + NUMBER, q)
+        if "стоп" in q and stop:
+            order["stopPrice"] = {"value": stop.group(1).replace(",", ".")}
+            if limit and "лимит" in q:
+                order["type"] = "ORDER_TYPE_STOP_LIMIT"
+                order["limitPrice"] = {"value": limit.group(1).replace(",", ".")}
+            else:
+                order["type"] = "ORDER_TYPE_STOP"
+        elif re.search(r"по рынку|рыночн|текущей цене|немедленно продай|по лучшей", q) or not limit:
+            order["type"] = "ORDER_TYPE_MARKET"
+        else:
+            order["type"] = "ORDER_TYPE_LIMIT"
+            order["limitPrice"] = {"value": limit.group(1).replace(",", ".")}
+
+        if re.search(r"до отмены|gtc", q):
+            order["timeInForce"] = "TIME_IN_FORCE_GOOD_TILL_CANCEL"
+        elif re.search(r"fill or kill|\bfok\b", q):
+            order["timeInForce"] = "TIME_IN_FORCE_FILL_OR_KILL"
+        elif re.search(r"\bioc\b|исполнить или отменить|не исполнится немедленно", q):
+            order["timeInForce"] = "TIME_IN_FORCE_IOC"
+        else:
+            order["timeInForce"] = "TIME_IN_FORCE_DAY"
+        return order, 0.85
+
+    # --- разбор ---
+
+    def topics(self, text: str) -> Set[str]:
+        """
+        Темы вопроса (см. TOPICS): какие группы методов могут понадобиться.
+        В отличие от route() не выбирает один метод, а перечисляет все подходящие.
+        """
+        found: Set[str] = set()
+        order_id = ORDER_ID_RE.search(text)
+        if _QUOTE_RE.search(text) or _ORDERBOOK_RE.search(text) or _BOOK_ANALYTICS_RE.search(text):
+            found.add("market")
+        if _CANDLES_RE.search(text) or _INDICATORS_RE.search(text) or self.extract_timeframe(text):
+            found.add("history")
+        if (
+            _POSITIONS_RE.search(text) or _ACCOUNT_RE.search(text) or _TRADES_RE.search(text)
+            or _ORDER_WORD_RE.search(text) or order_id
+        ):
+            found.add("account")
+        if _BUY_RE.search(text) or _SELL_RE.search(text) or (_CANCEL_RE.search(text) and (order_id or _ORDER_WORD_RE.search(text))):
+            found.add("trading")
+        symbols = self.count_symbols(text)
+        if not found and symbols:
+            # Упомянут только инструмент — как и в route(), вероятнее всего котировка
+            found.add("market")
+        if _MULTI_RE.search(text) or symbols > 1:
+            found.add("multi")
+        if _UNSUPPORTED_RE.search(text):
+            found.add("unsupported")
+        return found
+
+    def route(self, text: str) -> Intent:
+        """Определить метод, параметры и уверенность для вопроса"""
+        order_id = self.extract_order_id(text)
+        symbol, symbol_conf = self.extract_symbol(text)
+        unsupported = bool(_UNSUPPORTED_RE.search(text))
+
+        intent = self._match(text, order_id, symbol, symbol_conf)
+        if unsupported and intent.method != "get_order":
+            intent.confidence = min(intent.confidence, 0.4)
+        if _MULTI_RE.search(text) or (symbol and self.count_symbols(text) > 1):
+            # Несколько инструментов или сравнение — нужен план из нескольких вызовов от LLM
+            intent.confidence = min(intent.confidence, 0.4)
+        spec = METHODS.get(intent.method or "")
+        if spec is not None and not spec.idempotent:
+            if _ASK_RE.search(text) or _NEGATION_RE.search(text):
+                # Вопрос о заявке или отказ от действия — не поручение выставить или отменить
+                intent.confidence = min(intent.confidence, 0.3)
+                intent.rule += ":question"
+            elif not self.local_orders:
+                # Заявку выставляет или отменяет только план LLM, а не шаблон
+                intent.confidence = min(intent.confidence, self.threshold - 0.05)
+        return intent
+
+    def _match(self, text: str, order_id: Optional[str], symbol: Optional[str], symbol_conf: float) -> Intent:
+        if order_id:
+            if _CANCEL_RE.search(text):
+                return Intent("cancel_order", {"order_id": order_id}, 0.95, "cancel_order")
+            return Intent("get_order", {"order_id": order_id}, 0.9, "get_order")
+
+        if _CANCEL_RE.search(text) and _ORDER_WORD_RE.search(text):
+            # Отмена без номера заявки — нужен контекст, который есть только у LLM
+            return Intent("get_orders", {}, 0.3, "cancel_without_id")
+
+        if symbol and (_BUY_RE.search(text) or _SELL_RE.search(text)) and not _TRADES_RE.search(text):
+            order, order_conf = self.extract_order(text, symbol)
+            if order:
+                if re.search(r"\bесли\b", text, re.IGNORECASE) and "stopPrice" not in order:
+                    # Условная заявка, условие которой не распознано
+                    order_conf = 0.5
+                return Intent("create_order", order, order_conf * symbol_conf, "create_order")
+
+        if _ORDERBOOK_RE.search(text):
+            if symbol:
+                return Intent("get_orderbook", {"symbol": symbol}, 0.9 * symbol_conf, "orderbook")
+            return Intent("get_orderbook", {}, 0.2, "orderbook_without_symbol")
+
+        if _CANDLES_RE.search(text) or (symbol and self.extract_timeframe(text)):
+            if not symbol:
+                return Intent("get_candles", {}, 0.2, "candles_without_symbol")
+            start, end, explicit = self.extract_period(text)
+            timeframe = self.extract_timeframe(text) or "TIME_FRAME_D"
+            confidence = (0.85 if explicit else 0.75) * symbol_conf
+            params = {"symbol": symbol, "timeframe": timeframe, "start": start, "end": end}
+            return Intent("get_candles", params, confidence, "candles")
+
+        if symbol and _MARKET_TRADES_RE.search(text):
+            return Intent("get_trades", {}, 0.4, "market_trades")
+
+        if _TRADES_RE.search(text):
+            start, end, explicit = self.extract_period(text)
+            if explicit:
+                return Intent("get_trades", {"start": start, "end": end}, 0.8, "trades")
+            return Intent("get_trades", {}, 0.8, "trades")
+
+        if _ORDER_WORD_RE.search(text) and _ORDERS_LIST_RE.search(text):
+            return Intent("get_orders", {}, 0.85, "orders")
+
+        if _QUOTE_RE.search(text) and symbol:
+            return Intent("get_quote", {"symbol": symbol}, 0.9 * symbol_conf, "quote")
+
+        if _POSITIONS_RE.search(text):
+            return Intent("get_positions", {}, 0.85, "positions")
+
+        if _ACCOUNT_RE.search(text):
+            return Intent("get_account", {}, 0.8, "account")
+
+        if symbol:
+            # Упомянут только инструмент — вероятнее всего, интересует котировка
+            return Intent("get_quote", {"symbol": symbol}, 0.5 * symbol_conf, "symbol_only")
+
+        return Intent(None, {}, 0.0, "")
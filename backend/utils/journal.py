@@ -0,0 +1,83 @@
+"""
+Журнал результатов пакетной генерации (generate_submission.py) на SQLite.
+
+Каждый ответ записывается сразу по готовности, поэтому прерванный прогон
+можно продолжить (--resume): готовые uid пропускаются, итоговый CSV
+собирается из журнала в порядке вопросов. Запись привязана к хэшу текста
+вопроса — если вопрос под тем же uid изменился, он считается не готовым.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultJournal:
+    """Журнал (uid -> type, request) с дозаписью по одной строке"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL + NORMAL: каждая запись переживает падение процесса, fsync не на каждую строку
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                uid TEXT PRIMARY KEY,
+                question_hash TEXT NOT NULL,
+                type TEXT NOT NULL,
+                request TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                retry INTEGER NOT NULL,
+                finished_at REAL NOT NULL
+            )
+        """)
+
+    def append(self, uid: str, question: str, result: Dict[str, str], prompt_tokens: int = 0, retry: bool = False) -> None:
+        """
+        Записать результат вопроса.
+
+        Args:
+            uid: Идентификатор вопроса
+            question: Текст вопроса (хранится хэш)
+            result: {"type": ..., "request": ...}
+            prompt_tokens: Оценка токенов промпта LLM (0 — ответ без LLM)
+            retry: Ответ — запасной вариант после ошибки LLM; при --resume вопрос повторяется
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (uid, question_hash(question), result["type"], result["request"], prompt_tokens, int(retry), time.time()),
+            )
+
+    def results(self, questions: Iterable[Dict[str, str]], include_retry: bool = True) -> List[Dict[str, str]]:
+        """
+        Записанные результаты {"uid", "type", "request"} в порядке вопросов.
+        include_retry=False — только окончательные (без запасных ответов после ошибки LLM).
+        """
+        query = "SELECT uid, question_hash, type, request FROM results"
+        if not include_retry:
+            query += " WHERE retry = 0"
+        with self._lock:
+            stored = {uid: (qhash, http_method, request) for uid, qhash, http_method, request in self._conn.execute(query)}
+        ordered = []
+        for item in questions:
+            row = stored.get(item["uid"])
+            if row is not None and row[0] == question_hash(item["question"]):
+                ordered.append({"uid": item["uid"], "type": row[1], "request": row[2]})
+        return ordered
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,131 @@
+"""
+Персистентный кэш ответов LLM на SQLite.
+
+Ключ — (модель, хэш системного промпта, хэш остальных сообщений, temperature).
+Записи живут не дольше TTL, при превышении лимита вытесняются по LRU.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from os.path import dirname, join
+from typing import Any, Dict, List
+
+DEFAULT_CACHE_PATH = join(dirname(__file__), "..", "llm_cache.db")
+
+
+def _hash(value: Any) -> str:
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Кэш ответов LLM с TTL, LRU-вытеснением и счётчиками попаданий"""
+
+    def __init__(self, path: str | None = None, ttl: float | None = None, max_entries: int | None = None) -> None:
+        """
+        Args:
+            path: Путь к файлу SQLite (LLM_CACHE_PATH)
+            ttl: Время жизни записи, сек (LLM_CACHE_TTL, 0 — бессрочно)
+            max_entries: Максимум записей (LLM_CACHE_MAX_ENTRIES)
+        """
+        self.path = path or os.getenv("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "604800"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                system_hash TEXT NOT NULL,
+                messages_hash TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    @staticmethod
+    def make_key(
+        model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int
+    ) -> tuple[str, str, str]:
+        """Возвращает (key, system_hash, messages_hash)"""
+        system = [m["content"] for m in messages if m.get("role") == "system"]
+        rest = [m for m in messages if m.get("role") != "system"]
+        system_hash = _hash(system)
+        messages_hash = _hash(rest)
+        key = _hash([model, system_hash, messages_hash, temperature, max_tokens])
+        return key, system_hash, messages_hash
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """Ответ из кэша или None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(response)
+
+    def set(
+        self,
+        key: str,
+        model: str,
+        system_hash: str,
+        messages_hash: str,
+        temperature: float,
+        response: Dict[str, Any],
+    ) -> None:
+        """Сохранить ответ и вытеснить самые давно использованные записи сверх лимита"""
+        now = time.time()
+        payload = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, system_hash, messages_hash, temperature, payload, now, now),
+            )
+            if self.max_entries:
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,97 @@
+"""
+Структурное логирование с семплированием.
+
+Записи — события с полями: log_event(logger, "finam.request", path=..., ms=...).
+Формат (LOG_FORMAT): json — одна JSON-строка на событие, text — "event k=v ...".
+Уровень — LOG_LEVEL (по умолчанию INFO). Частые отладочные события пишутся
+с долей LOG_SAMPLE_RATE (0..1), ошибки и предупреждения — всегда.
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Any, Optional
+
+_configured = False
+
+
+class _EventFormatter(logging.Formatter):
+    def __init__(self, fmt: str) -> None:
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", {})
+        if self.fmt == "json":
+            payload = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                payload["exc"] = self.formatException(record.exc_info)
+            return json.dumps(payload, ensure_ascii=False, default=str)
+
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        pairs = " ".join(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}" for key, value in fields.items())
+        line = f"{stamp} {record.levelname:<7} {record.name} {record.getMessage()} {pairs}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _configure() -> None:
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_EventFormatter(os.getenv("LOG_FORMAT", "text").lower()))
+    root = logging.getLogger("finaicus")
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Логгер в иерархии finaicus (настраивается при первом вызове)"""
+    _configure()
+    return logging.getLogger(f"finaicus.{name}")
+
+
+def default_sample_rate() -> float:
+    return float(os.getenv("LOG_SAMPLE_RATE", "1"))
+
+
+def log_event(
+    logger: logging.Logger,
+    event: str,
+    level: int = logging.INFO,
+    sample_rate: Optional[float] = None,
+    exc_info: bool = False,
+    **fields: Any,
+) -> None:
+    """
+    Записать событие с полями.
+
+    Args:
+        logger: Логгер из get_logger
+        event: Имя события ("llm.call", "finam.request", ...)
+        level: Уровень logging
+        sample_rate: Доля записываемых событий; None — LOG_SAMPLE_RATE.
+            Для WARNING и выше не применяется.
+        exc_info: Приложить текущее исключение
+        **fields: Поля события
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        rate = default_sample_rate() if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+    logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
@@ -0,0 +1,234 @@
+"""
+Хаб рыночных данных: один цикл опроса Finam на «горячий» инструмент.
+
+Инструмент становится горячим, когда его котировку или стакан запросили
+через AsyncFinamAPIClient (get_quote / get_orderbook) или на него подписался
+слушатель. Пока интерес не угас (MARKET_HUB_IDLE_TTL без запросов и без
+подписчиков), хаб опрашивает Finam раз в интервал, держит последний снимок
+в памяти и рассылает изменения всем подписчикам. Число запросов к Finam
+зависит от числа разных инструментов, а не от числа пользователей.
+"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.finam_values import to_float
+from utils.metrics import MARKET_HUB_POLLS
+
+KINDS = ("quote", "orderbook")
+
+Key = Tuple[str, str]  # (symbol, kind)
+
+
+@dataclass
+class Snapshot:
+    """Последние данные по инструменту"""
+
+    symbol: str
+    kind: str
+    data: Dict[str, Any]
+    updated_at: float
+    version: int = 1
+
+    def to_message(self) -> Dict[str, Any]:
+        return {
+            "type": self.kind,
+            "symbol": self.symbol,
+            "version": self.version,
+            "ts": round(self.updated_at, 3),
+            "data": self.data,
+        }
+
+
+def quote_view(response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Поля котировки для карточки цены: last, change_pct, bid, ask, volume, timestamp"""
+    quote = response.get("quote")
+    if not isinstance(quote, dict):
+        return None
+    last = to_float(quote.get("last"))
+    if last is None:
+        return None
+    change = to_float(quote.get("change"))
+    previous = last - change if change is not None else to_float(quote.get("close"))
+    return {
+        "last": last,
+        "change_pct": round((last - previous) / previous * 100, 4) if previous else None,
+        "bid": to_float(quote.get("bid")),
+        "ask": to_float(quote.get("ask")),
+        "volume": to_float(quote.get("volume")),
+        "timestamp": quote.get("timestamp"),
+    }
+
+
+class Subscription:
+    """Очередь обновлений одного слушателя; при переполнении вытесняются самые старые"""
+
+    def __init__(self, hub: "MarketHub", keys: Set[Key], maxsize: int = 256) -> None:
+        self.hub = hub
+        self.keys = keys
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, snapshot: Snapshot) -> None:
+        # Медленный слушатель не тормозит рассылку: теряет старые обновления, а не новые
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(snapshot)
+
+    async def get(self) -> Snapshot:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class MarketHub:
+    """Циклы опроса горячих инструментов, снимки в памяти и рассылка подписчикам"""
+
+    def __init__(
+        self,
+        client: Any,
+        quote_interval: float | None = None,
+        orderbook_interval: float | None = None,
+        idle_ttl: float | None = None,
+        max_symbols: int | None = None,
+        orderbook_depth: int = 10,
+    ) -> None:
+        """
+        Args:
+            client: AsyncFinamAPIClient (опрос идёт через execute_request — с общим кэшем)
+            quote_interval: Период опроса котировок, сек (MARKET_HUB_QUOTE_INTERVAL)
+            orderbook_interval: Период опроса стаканов, сек (MARKET_HUB_ORDERBOOK_INTERVAL)
+            idle_ttl: Сколько опрашивать инструмент без запросов и подписчиков, сек (MARKET_HUB_IDLE_TTL)
+            max_symbols: Максимум одновременных циклов опроса (MARKET_HUB_MAX_SYMBOLS)
+            orderbook_depth: Глубина опрашиваемого стакана
+        """
+        self.client = client
+        self.intervals = {
+            "quote": quote_interval or float(os.getenv("MARKET_HUB_QUOTE_INTERVAL", "1")),
+            "orderbook": orderbook_interval or float(os.getenv("MARKET_HUB_ORDERBOOK_INTERVAL", "1")),
+        }
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("MARKET_HUB_IDLE_TTL", "300"))
+        self.max_symbols = max_symbols or int(os.getenv("MARKET_HUB_MAX_SYMBOLS", "50"))
+        self.orderbook_depth = orderbook_depth
+
+        self._loops: Dict[Key, asyncio.Task] = {}
+        self._last_demand: Dict[Key, float] = {}
+        self._snapshots: Dict[Key, Snapshot] = {}
+        self._subscribers: Set[Subscription] = set()
+        self.polls = 0
+        self.errors = 0
+        self.published = 0
+        self.rejected = 0
+
+    def touch(self, symbol: str, kind: str = "quote") -> None:
+        """Отметить интерес к инструменту; цикл опроса запускается, если его ещё нет"""
+        if kind not in KINDS or not symbol:
+            return
+        key = (symbol, kind)
+        self._last_demand[key] = time.monotonic()
+        if key in self._loops:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if len(self._loops) >= self.max_symbols:
+            self.rejected += 1
+            return
+        self._loops[key] = loop.create_task(self._poll(key))
+
+    def subscribe(self, symbols: Iterable[str], kinds: Iterable[str] = ("quote",), maxsize: int = 256) -> Subscription:
+        """Подписка на обновления; текущие снимки кладутся в очередь сразу"""
+        keys = {(symbol, kind) for symbol in symbols for kind in kinds if kind in KINDS}
+        subscription = Subscription(self, keys, maxsize)
+        self._subscribers.add(subscription)
+        for key in keys:
+            self.touch(*key)
+            if key in self._snapshots:
+                subscription.offer(self._snapshots[key])
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        # Без подписчиков инструмент ещё idle_ttl считается горячим — на случай переподключения
+        now = time.monotonic()
+        for key in subscription.keys:
+            self._last_demand[key] = now
+
+    def snapshot(self, symbol: str, kind: str = "quote") -> Optional[Snapshot]:
+        return self._snapshots.get((symbol, kind))
+
+    def _watched(self, key: Key) -> bool:
+        return any(key in subscription.keys for subscription in self._subscribers)
+
+    async def _fetch(self, key: Key) -> Dict[str, Any]:
+        symbol, kind = key
+        if kind == "quote":
+            return await self.client.execute_request("GET", f"/v1/instruments/{symbol}/quotes/latest")
+        return await self.client.execute_request(
+            "GET", f"/v1/instruments/{symbol}/orderbook", params={"depth": self.orderbook_depth}
+        )
+
+    def _publish(self, key: Key, data: Dict[str, Any]) -> None:
+        previous = self._snapshots.get(key)
+        if previous is not None and previous.data == data:
+            return
+        snapshot = Snapshot(key[0], key[1], data, time.time(), previous.version + 1 if previous else 1)
+        self._snapshots[key] = snapshot
+        for subscription in list(self._subscribers):
+            if key in subscription.keys:
+                subscription.offer(snapshot)
+                self.published += 1
+
+    async def _poll(self, key: Key) -> None:
+        interval = self.intervals[key[1]]
+        delay = interval
+        try:
+            # Случайный сдвиг старта, чтобы циклы разных инструментов не били в Finam одновременно
+            await asyncio.sleep(random.uniform(0, interval / 4))
+            while True:
+                idle = time.monotonic() - self._last_demand.get(key, 0.0)
+                if idle > self.idle_ttl and not self._watched(key):
+                    return
+                self.polls += 1
+                response = await self._fetch(key)
+                if "error" in response:
+                    self.errors += 1
+                    MARKET_HUB_POLLS.inc(kind=key[1], outcome="error")
+                    # При ошибках Finam опрос реже, до 30 с; последний снимок остаётся
+                    delay = min(delay * 2, 30.0)
+                else:
+                    MARKET_HUB_POLLS.inc(kind=key[1], outcome="ok")
+                    data = quote_view(response) if key[1] == "quote" else response.get("orderbook")
+                    if data is not None:
+                        self._publish(key, data)
+                    delay = interval
+                await asyncio.sleep(delay)
+        finally:
+            self._loops.pop(key, None)
+
+    async def stop(self) -> None:
+        """Остановить все циклы опроса (при остановке приложения)"""
+        loops = list(self._loops.values())
+        for task in loops:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        hot: List[str] = sorted(f"{symbol}:{kind}" for symbol, kind in self._loops)
+        return {
+            "hot": hot,
+            "loops": len(hot),
+            "subscribers": len(self._subscribers),
+            "polls": self.polls,
+            "errors": self.errors,
+            "published": self.published,
+            "dropped": sum(subscription.dropped for subscription in self._subscribers),
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,289 @@
+"""
+Метрики процесса в формате Prometheus и тайминги этапов запроса.
+
+Счётчики и гистограммы — в памяти процесса, /metrics отдаёт их текстом
+(text/plain; version=0.0.4). Этапы обработки (`timed`) одновременно
+пишутся в гистограмму и в список таймингов текущего HTTP-запроса
+(contextvar), из которого middleware собирает заголовок Server-Timing.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Границы бакетов задержки, сек: от кэша (доли мс) до долгих ответов LLM
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+# Семейство метрик для render(): (имя, help, тип, [(метки, значение)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0.0)
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами (накопительные счётчики, как в Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> (счётчики по бакетам, сумма, число наблюдений)
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * len(self.buckets), [0.0, 0.0])
+                self._values[key] = entry
+            counts, totals = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames))
+        return int(entry[1][1]) if entry else 0
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        for key, (counts, (total, observations)) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {int(observations)}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {int(observations)}"
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self, extra: Iterable[Family] = ()) -> str:
+        """Текст для /metrics; extra — семейства, вычисляемые в момент запроса (gauge)"""
+        out: List[str] = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        for name, help, kind, samples in extra:
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "finaicus_stage_seconds", "Длительность этапов обработки сообщения", ("stage",)
+)
+FINAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "finaicus_finam_request_seconds", "Вызовы Finam через клиент (с учётом кэша)", ("endpoint", "outcome")
+)
+FINAM_UPSTREAM_SECONDS = REGISTRY.histogram(
+    "finaicus_finam_upstream_seconds", "HTTP-запросы к Finam (промахи кэша)", ("endpoint", "status")
+)
+FINAM_QUEUE_SECONDS = REGISTRY.histogram(
+    "finaicus_finam_queue_seconds", "Ожидание в очереди ограничителя частоты Finam", ("endpoint_class",)
+)
+FINAM_RATE_LIMITED = REGISTRY.counter(
+    "finaicus_finam_rate_limited_total", "Ответы Finam 429 (превышен лимит запросов)", ("endpoint_class",)
+)
+LLM_REQUESTS = REGISTRY.counter("finaicus_llm_requests_total", "Запросы к LLM", ("outcome",))
+LLM_TOKENS = REGISTRY.counter("finaicus_llm_tokens_total", "Токены LLM по данным провайдера", ("kind",))
+CASCADE_DECISIONS = REGISTRY.counter(
+    "finaicus_cascade_decisions_total", "Решения каскада моделей по уровням", ("tier", "outcome")
+)
+MARKET_HUB_POLLS = REGISTRY.counter(
+    "finaicus_market_hub_polls_total", "Опросы Finam хабом рыночных данных", ("kind", "outcome")
+)
+RESILIENCE_EVENTS = REGISTRY.counter(
+    "finaicus_resilience_events_total", "Повторы, хеджирование, дедлайны и отказы автомата", ("upstream", "event")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "finaicus_http_request_seconds", "Обработка HTTP-запросов бэкендом", ("path", "status")
+)
+
+# Тайминги текущего HTTP-запроса: (этап, сек, описание)
+_timings: ContextVar[Optional[List[Tuple[str, float, str]]]] = ContextVar("timings", default=None)
+
+
+def start_request_timing() -> List[Tuple[str, float, str]]:
+    """Начать сбор таймингов для текущего запроса (вызывается в middleware)"""
+    timings: List[Tuple[str, float, str]] = []
+    _timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float, description: str = "", histogram: Histogram = STAGE_SECONDS, **labels: str) -> None:
+    """Записать длительность этапа в гистограмму и в тайминги текущего запроса"""
+    histogram.observe(seconds, **(labels or {"stage": stage}))
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds, description))
+
+
+@contextmanager
+def timed(stage: str, description: str = "") -> Iterator[None]:
+    """Замер этапа: with timed("dispatch"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, description)
+
+
+def server_timing(timings: Iterable[Tuple[str, float, str]], total: Optional[float] = None) -> str:
+    """Значение заголовка Server-Timing (длительности в мс)"""
+    parts = []
+    for stage, seconds, description in timings:
+        part = f"{stage};dur={seconds * 1000:.1f}"
+        if description:
+            part += f';desc="{_escape(description)}"'
+        parts.append(part)
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def stage_totals(timings: Iterable[Tuple[str, float, str]]) -> Dict[str, float]:
+    """Суммарное время по этапам, мс (несколько вызовов Finam за запрос складываются)"""
+    totals: Dict[str, float] = {}
+    for stage, seconds, _ in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds * 1000
+    return {stage: round(ms, 1) for stage, ms in totals.items()}
+
+
+def cache_families(finam_cache: Optional[Dict], llm_cache: Optional[Dict], sessions: Optional[Dict] = None) -> List[Family]:
+    """Gauge-метрики из статистики кэшей (ResponseCache.stats, LLMCache.stats, SessionStore.stats)"""
+    lookups: List[Tuple[Dict[str, str], float]] = []
+    rates: List[Tuple[Dict[str, str], float]] = []
+    if finam_cache and finam_cache.get("enabled", True):
+        for policy, counters in (finam_cache.get("by_policy") or {}).items():
+            for result, value in counters.items():
+                lookups.append(({"cache": f"finam_{policy}", "result": result}, value))
+        rates.append(({"cache": "finam"}, finam_cache.get("hit_rate", 0.0)))
+    if llm_cache:
+        lookups.append(({"cache": "llm", "result": "hits"}, llm_cache.get("hits", 0)))
+        lookups.append(({"cache": "llm", "result": "misses"}, llm_cache.get("misses", 0)))
+        rates.append(({"cache": "llm"}, llm_cache.get("hit_rate", 0.0)))
+    families: List[Family] = [
+        ("finaicus_cache_lookups", "Обращения к кэшам по результату", "gauge", lookups),
+        ("finaicus_cache_hit_ratio", "Доля попаданий в кэш", "gauge", rates),
+    ]
+    if sessions:
+        families.append((
+            "finaicus_sessions", "Сессии чата в памяти", "gauge",
+            [({}, sessions.get("sessions", 0))],
+        ))
+    return families
+
+
+def hub_families(hub: Dict) -> List[Family]:
+    """Gauge-метрики хаба рыночных данных (MarketHub.stats)"""
+    return [
+        ("finaicus_market_hub_loops", "Циклы опроса горячих инструментов", "gauge", [({}, hub.get("loops", 0))]),
+        ("finaicus_market_hub_subscribers", "Подписчики хаба (WebSocket)", "gauge", [({}, hub.get("subscribers", 0))]),
+        ("finaicus_market_hub_dropped", "Обновления, вытесненные из очередей медленных подписчиков", "gauge",
+         [({}, hub.get("dropped", 0))]),
+    ]
+
+
+def resilience_families(upstreams: Dict[str, Dict]) -> List[Family]:
+    """Состояние автоматов по сервисам (Upstream.stats): 0 — closed, 1 — half_open, 2 — open"""
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    return [(
+        "finaicus_circuit_state", "Состояние автомата сервиса", "gauge",
+        [({"upstream": name}, states.get(stats.get("state", "closed"), 0)) for name, stats in upstreams.items()],
+    )]
+
+
+def instruments_families(instruments: Dict) -> List[Family]:
+    """Размер и возраст справочника инструментов (InstrumentDirectory.stats)"""
+    families: List[Family] = [
+        ("finaicus_instruments", "Инструменты в справочнике", "gauge", [({}, instruments.get("instruments", 0))]),
+    ]
+    if instruments.get("age_seconds") is not None:
+        families.append((
+            "finaicus_instruments_age_seconds", "Возраст списка инструментов", "gauge",
+            [({"source": instruments.get("source", "")}, instruments["age_seconds"])],
+        ))
+    return families
+
+
+def scheduler_families(scheduler: Dict) -> List[Family]:
+    """Глубина очередей ограничителя частоты Finam по классам (PriorityScheduler.stats)"""
+    return [(
+        "finaicus_finam_queue_depth", "Запросы Finam, ожидающие в очереди", "gauge",
+        [({"endpoint_class": name}, stats["depth"]) for name, stats in scheduler.items()],
+    )]
@@ -1,72 +1,335 @@
 import os
 import httpx
 import json
-import re
-from typing import Any, Dict, List
+import time
+from typing import Any, AsyncIterator, Dict, List
 from dotenv import load_dotenv
 from os.path import join, dirname
 
+from utils.llm_cache import LLMCache
+from utils.metrics import LLM_REQUESTS, LLM_TOKENS, STAGE_SECONDS, record
+from utils.resilience import CallPolicy, Upstream
+
 dotenv_path = join(dirname(__file__), '../.env')
 load_dotenv(dotenv_path)
 
 
-def call_llm(messages: List[Dict[str, str]], temperature: float = 0.7) -> Dict[str, Any]:
+DEFAULT_MODEL = "openai/gpt-4o-mini"
+
+
+class LLMClient:
     """
-    Отправляет запрос в OpenRouter API и возвращает ответ в формате OpenAI.
+    Долгоживущий асинхронный клиент OpenRouter (chat/completions в формате OpenAI).
+
+    Держит пул keep-alive соединений, поэтому TCP+TLS рукопожатие
+    выполняется один раз на процесс, а не на каждый вызов.
     """
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY не установлен в переменных окружения")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "HTTP-Referer": "https://github.com/your-username/your-project",  
-        "X-Title": "Trading Assistant",
-        "Content-Type": "application/json",
-    }
-
-    json_data = {
-        "model": "openai/gpt-4o-mini",
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": 1024,
-    }
 
-    try:
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(
-                url="https://openrouter.ai/api/v1/chat/completions",  
-                headers=headers,
-                json=json_data,
-            )
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        model: str | None = None,
+        timeout: float | None = None,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        cache: LLMCache | None = None,
+        resilience: Upstream | None = None,
+    ) -> None:
+        """
+        Args:
+            api_key: Ключ OpenRouter (OPENROUTER_API_KEY)
+            base_url: Базовый URL API (OPENROUTER_BASE)
+            model: Модель по умолчанию (OPENROUTER_MODEL)
+            timeout: Таймаут запроса, сек (OPENROUTER_TIMEOUT)
+            max_connections: Максимум соединений в пуле (OPENROUTER_MAX_CONNECTIONS)
+            max_keepalive_connections: Максимум keep-alive соединений (OPENROUTER_MAX_KEEPALIVE)
+            keepalive_expiry: Время жизни простаивающего соединения, сек (OPENROUTER_KEEPALIVE_EXPIRY)
+            cache: Кэш ответов (None — без кэша)
+            resilience: Дедлайны, повторы и автомат (по умолчанию из окружения, RESILIENCE)
+        """
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENROUTER_BASE") or "https://openrouter.ai/api/v1").rstrip("/")
+        self.model = model or os.getenv("OPENROUTER_MODEL") or DEFAULT_MODEL
+        self.cache = cache
+        self.resilience = resilience or Upstream("openrouter")
+
+        if timeout is None:
+            timeout = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
+        # Дедлайн вызова с повторами и таймаут одной попытки; копия запроса стоит токенов,
+        # поэтому хеджирование LLM включается явно (LLM_HEDGE=1)
+        self.deadline = float(os.getenv("LLM_DEADLINE", str(timeout)))
+        self.attempt_timeout = float(os.getenv("LLM_ATTEMPT_TIMEOUT", str(min(timeout, 30.0))))
+        self.hedge = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+        if max_connections is None:
+            max_connections = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "50"))
+        if max_keepalive_connections is None:
+            max_keepalive_connections = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "20"))
+        if keepalive_expiry is None:
+            keepalive_expiry = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "60"))
+
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        # Суммарный расход токенов по ответам провайдера (usage); cached_prompt_tokens —
+        # часть промпта, обслуженная из кэша префиксов провайдера
+        self.usage: Dict[str, int] = {
+            "calls": 0,
+            "cache_hits": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_prompt_tokens": 0,
+        }
+
+    def _record_usage(self, usage: Dict[str, Any] | None) -> None:
+        self.usage["calls"] += 1
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        counts = {
+            "prompt": usage.get("prompt_tokens") or 0,
+            "completion": usage.get("completion_tokens") or 0,
+            "cached_prompt": details.get("cached_tokens") or 0,
+        }
+        for kind, count in counts.items():
+            self.usage[f"{kind}_tokens"] += count
+            LLM_TOKENS.inc(count, kind=kind)
+
+    def usage_stats(self) -> Dict[str, int]:
+        """Счётчики вызовов и токенов с момента создания клиента"""
+        return dict(self.usage)
+
+    async def aclose(self) -> None:
+        """Закрыть пул соединений"""
+        await self.client.aclose()
+
+    def _policy(self, model: str, deadline: float | None, stream: bool = False) -> CallPolicy:
+        # Ответ модели не меняет состояние — запрос идемпотентен; поток копией не дублируется
+        return CallPolicy(
+            f"chat {model}",
+            deadline=deadline or self.deadline,
+            attempt_timeout=min(self.attempt_timeout, deadline or self.deadline),
+            hedge=self.hedge and not stream,
+        )
+
+    async def _post(self, headers: Dict[str, str], json_data: Dict[str, Any]) -> httpx.Response:
+        response = await self.client.post("/chat/completions", headers=headers, json=json_data)
+        response.raise_for_status()
+        return response
+
+    async def _open_stream(self, headers: Dict[str, str], json_data: Dict[str, Any]) -> httpx.Response:
+        """Открыть потоковый ответ (до заголовков); ошибочный статус — httpx.HTTPStatusError с телом"""
+        request = self.client.build_request("POST", "/chat/completions", headers=headers, json=json_data)
+        response = await self.client.send(request, stream=True)
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
             response.raise_for_status()
-            return response.json()
-    except httpx.HTTPStatusError as e:
-        error_detail = e.response.json() if e.response.content else {"error": str(e)}
-        raise RuntimeError(f"OpenRouter API error: {error_detail}") from e
-    except Exception as e:
-        raise RuntimeError(f"Network or parsing error: {e}") from e
+        return response
 
+    def _headers(self) -> Dict[str, str]:
+        if not self.api_key:
+            raise ValueError("OPENROUTER_API_KEY не установлен в переменных окружения")
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "HTTP-Referer": "https://github.com/your-username/your-project",
+            "X-Title": "Trading Assistant",
+            "Content-Type": "application/json",
+        }
 
-def extract_api_call(text: str) -> tuple[str | None, dict | None]:
-    """
-    Извлекает API_CALL и PARAMS из ответа LLM.
-    Возвращает (method_name, params_dict) или (None, None)
-    """
-    if "API_CALL:" not in text:
-        return None, None
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        model: str | None = None,
+        deadline: float | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Отправляет запрос в OpenRouter API и возвращает ответ в формате OpenAI.
+        При включённом кэше повторный идентичный запрос обслуживается без сети.
+        deadline — бюджет на вызов с повторами, сек (по умолчанию LLM_DEADLINE).
+        """
+        model = model or self.model
+        if self.cache is not None:
+            key, system_hash, messages_hash = self.cache.make_key(model, messages, temperature, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.usage["cache_hits"] += 1
+                LLM_REQUESTS.inc(outcome="cache")
+                return cached
 
-    call_match = re.search(r"API_CALL:\s*(\w+)", text)
-    params_match = re.search(r"PARAMS:\s*(\{.*?\})", text, re.DOTALL)
+        headers = self._headers()
+        json_data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+        try:
+            response = await self.resilience.call(
+                self._policy(model, deadline), lambda: self._post(headers, json_data)
+            )
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            LLM_REQUESTS.inc(outcome="error")
+            error_detail = e.response.json() if e.response.content else {"error": str(e)}
+            raise RuntimeError(f"OpenRouter API error: {error_detail}") from e
+        except Exception as e:
+            LLM_REQUESTS.inc(outcome="error")
+            raise RuntimeError(f"Network or parsing error: {e}") from e
 
-    if not call_match or not params_match:
-        return None, None
+        LLM_REQUESTS.inc(outcome="ok")
+        self._record_usage(result.get("usage"))
+        if self.cache is not None:
+            self.cache.set(key, model, system_hash, messages_hash, temperature, result)
+        return result
 
-    method = call_match.group(1)
-    params_str = params_match.group(1).strip()
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        model: str | None = None,
+        deadline: float | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Потоковый вариант chat(): отдаёт фрагменты текста ответа по мере генерации
+        (stream=True, server-sent events OpenRouter). Ответ из кэша отдаётся одним фрагментом.
+        Повторы возможны только до начала потока: после первого фрагмента ошибка уходит наружу.
+        """
+        model = model or self.model
+        if self.cache is not None:
+            key, system_hash, messages_hash = self.cache.make_key(model, messages, temperature, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.usage["cache_hits"] += 1
+                LLM_REQUESTS.inc(outcome="cache")
+                yield cached["choices"][0]["message"]["content"]
+                return
 
+        headers = self._headers()
+        json_data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+
+        parts: List[str] = []
+        usage: Dict[str, Any] | None = None
+        try:
+            try:
+                response = await self.resilience.call(
+                    self._policy(model, deadline, stream=True), lambda: self._open_stream(headers, json_data)
+                )
+            except httpx.HTTPStatusError as e:
+                raise RuntimeError(f"OpenRouter API error: {e.response.text}") from e
+            try:
+                async for line in response.aiter_lines():
+                    # Строки-комментарии (": OPENROUTER PROCESSING") и пустые пропускаем
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    # Расход токенов приходит в последнем фрагменте
+                    usage = chunk.get("usage") or usage
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await response.aclose()
+        except RuntimeError:
+            LLM_REQUESTS.inc(outcome="error")
+            raise
+        except Exception as e:
+            LLM_REQUESTS.inc(outcome="error")
+            raise RuntimeError(f"Network or parsing error: {e}") from e
+
+        LLM_REQUESTS.inc(outcome="ok")
+        self._record_usage(usage)
+        if self.cache is not None:
+            result = {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}
+            self.cache.set(key, model, system_hash, messages_hash, temperature, result)
+
+
+_llm_client: LLMClient | None = None
+
+
+def get_llm_client() -> LLMClient:
+    """Общий на процесс LLM клиент (создаётся при первом обращении)"""
+    global _llm_client
+    if _llm_client is None:
+        cache_enabled = os.getenv("LLM_CACHE", "1").lower() in ("1", "true", "yes")
+        _llm_client = LLMClient(cache=LLMCache() if cache_enabled else None)
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """Закрыть общий LLM клиент (при остановке приложения / скрипта)"""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        if _llm_client.cache is not None:
+            _llm_client.cache.close()
+        _llm_client = None
+
+
+async def call_llm(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    model: str | None = None,
+    stage: str = "llm",
+    deadline: float | None = None,
+) -> Dict[str, Any]:
+    """
+    Отправляет запрос в OpenRouter API через общий клиент и возвращает ответ в формате OpenAI.
+    Длительность пишется в метрики и Server-Timing как этап `stage`.
+    """
+    started = time.perf_counter()
+    try:
+        return await get_llm_client().chat(
+            messages, temperature=temperature, max_tokens=max_tokens, model=model, deadline=deadline
+        )
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+async def stream_llm(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    model: str | None = None,
+    stage: str = "llm",
+    deadline: float | None = None,
+) -> AsyncIterator[str]:
+    """
+    Потоковый запрос в OpenRouter API через общий клиент: фрагменты текста ответа.
+    В метрики пишутся время до первого фрагмента (`<stage>_first_token`) и полное время.
+    """
+    started = time.perf_counter()
+    first = True
     try:
-        params = json.loads(params_str)
-        return method, params
-    except json.JSONDecodeError:
-        return None, None
\ No newline at end of file
+        async for delta in get_llm_client().stream_chat(
+            messages, temperature=temperature, max_tokens=max_tokens, model=model, deadline=deadline
+        ):
+            if first:
+                first = False
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage=f"{stage}_first_token")
+            yield delta
+    finally:
+        record(stage, time.perf_counter() - started)
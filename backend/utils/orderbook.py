@@ -0,0 +1,175 @@
+"""
+Аналитика стакана: спред, середина, накопленная глубина, дисбаланс,
+средняя цена исполнения (VWAP) и проскальзывание для заданного объёма,
+разница между двумя снимками одного стакана.
+
+Стакан хранится массивами numpy, отсортированными от лучшей цены;
+все расчёты — векторные, на стакане в 50 уровней занимают микросекунды.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.finam_values import to_float
+
+
+@dataclass
+class Book:
+    """Снимок стакана: цены и объёмы по сторонам, от лучшей цены"""
+
+    symbol: str
+    bid_prices: np.ndarray
+    bid_sizes: np.ndarray
+    ask_prices: np.ndarray
+    ask_sizes: np.ndarray
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return float(self.bid_prices[0]) if len(self.bid_prices) else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return float(self.ask_prices[0]) if len(self.ask_prices) else None
+
+    @property
+    def spread(self) -> Optional[float]:
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        return float(self.ask_prices[0] - self.bid_prices[0])
+
+    @property
+    def mid(self) -> Optional[float]:
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        return float(self.ask_prices[0] + self.bid_prices[0]) / 2
+
+
+def book_from_response(response: Dict[str, Any], symbol: str = "") -> Book:
+    """Ответ /orderbook -> Book"""
+    bid_prices: List[float] = []
+    bid_sizes: List[float] = []
+    ask_prices: List[float] = []
+    ask_sizes: List[float] = []
+    for row in (response.get("orderbook") or {}).get("rows") or []:
+        price = to_float(row.get("price"))
+        if price is None:
+            continue
+        # строка стакана относится к одной стороне: buy_size или sell_size
+        if row.get("buy_size"):
+            size = to_float(row["buy_size"])
+            if size:
+                bid_prices.append(price)
+                bid_sizes.append(size)
+        if row.get("sell_size"):
+            size = to_float(row["sell_size"])
+            if size:
+                ask_prices.append(price)
+                ask_sizes.append(size)
+
+    bid_order = np.argsort(bid_prices)[::-1]
+    ask_order = np.argsort(ask_prices)
+    return Book(
+        symbol=response.get("symbol") or symbol,
+        bid_prices=np.asarray(bid_prices, dtype=float)[bid_order],
+        bid_sizes=np.asarray(bid_sizes, dtype=float)[bid_order],
+        ask_prices=np.asarray(ask_prices, dtype=float)[ask_order],
+        ask_sizes=np.asarray(ask_sizes, dtype=float)[ask_order],
+    )
+
+
+def imbalance(book: Book, levels: Optional[int] = None) -> Optional[float]:
+    """(bid - ask) / (bid + ask) по объёму первых `levels` уровней, от -1 до 1"""
+    bid = float(book.bid_sizes[:levels].sum())
+    ask = float(book.ask_sizes[:levels].sum())
+    if bid + ask == 0:
+        return None
+    return (bid - ask) / (bid + ask)
+
+
+def fill(book: Book, side: str, quantity: float) -> Dict[str, Any]:
+    """
+    Исполнение рыночной заявки на `quantity` по текущему стакану.
+
+    side: "buy" (забирает предложение) или "sell" (забирает спрос).
+    Возвращает VWAP, исполненный объём, число затронутых уровней,
+    проскальзывание от лучшей цены и от середины (в % от цены).
+    """
+    buying = side.lower() in ("buy", "side_buy")
+    prices, sizes = (book.ask_prices, book.ask_sizes) if buying else (book.bid_prices, book.bid_sizes)
+    if not len(prices) or quantity <= 0:
+        return {"side": "buy" if buying else "sell", "quantity": quantity, "filled": 0.0, "vwap": None}
+
+    cumulative = np.cumsum(sizes)
+    # уровни, целиком съедаемые заявкой, и частично исполненный последний
+    full = int(np.searchsorted(cumulative, quantity, side="left"))
+    taken = np.minimum(sizes, np.maximum(quantity - (cumulative - sizes), 0.0))
+    filled = float(taken.sum())
+    vwap = float(np.dot(taken, prices) / filled)
+
+    best, mid = float(prices[0]), book.mid
+    direction = 1 if buying else -1
+    return {
+        "side": "buy" if buying else "sell",
+        "quantity": quantity,
+        "filled": filled,
+        "complete": filled >= quantity,
+        "levels": min(full + 1, len(prices)),
+        "vwap": vwap,
+        "worst_price": float(prices[min(full, len(prices) - 1)]),
+        "slippage_pct": direction * (vwap - best) / best * 100,
+        "slippage_from_mid_pct": direction * (vwap - mid) / mid * 100 if mid else None,
+        "cost": vwap * filled,
+    }
+
+
+def _side_diff(old_prices: np.ndarray, old_sizes: np.ndarray, new_prices: np.ndarray, new_sizes: np.ndarray) -> Dict[str, Any]:
+    prices = np.union1d(old_prices, new_prices)
+    old = np.zeros(len(prices))
+    new = np.zeros(len(prices))
+    old[np.searchsorted(prices, old_prices)] = old_sizes
+    new[np.searchsorted(prices, new_prices)] = new_sizes
+    changed = old != new
+    return {
+        "added": int(np.count_nonzero((old == 0) & (new > 0))),
+        "removed": int(np.count_nonzero((old > 0) & (new == 0))),
+        "changed": int(np.count_nonzero(changed & (old > 0) & (new > 0))),
+        "size_delta": float(new.sum() - old.sum()),
+        "levels": np.column_stack([prices[changed], old[changed], new[changed]]).tolist(),
+    }
+
+
+def diff(previous: Book, current: Book) -> Dict[str, Any]:
+    """Изменения между двумя снимками стакана по каждой стороне: [цена, было, стало]"""
+    return {
+        "bids": _side_diff(previous.bid_prices, previous.bid_sizes, current.bid_prices, current.bid_sizes),
+        "asks": _side_diff(previous.ask_prices, previous.ask_sizes, current.ask_prices, current.ask_sizes),
+        "mid_change": (
+            current.mid - previous.mid if current.mid is not None and previous.mid is not None else None
+        ),
+    }
+
+
+def analyze(book: Book, quantity: Optional[float] = None, levels: int = 10) -> Dict[str, Any]:
+    """Сводка по стакану; при заданном `quantity` — оценка исполнения в обе стороны"""
+    spread, mid = book.spread, book.mid
+    result: Dict[str, Any] = {
+        "symbol": book.symbol,
+        "best_bid": book.best_bid,
+        "best_ask": book.best_ask,
+        "spread": spread,
+        "spread_bps": spread / mid * 10000 if spread is not None and mid else None,
+        "mid": mid,
+        "levels": {"bids": len(book.bid_prices), "asks": len(book.ask_prices)},
+        "total_size": {"bids": float(book.bid_sizes.sum()), "asks": float(book.ask_sizes.sum())},
+        f"depth_top{levels}": {
+            "bids": float(book.bid_sizes[:levels].sum()),
+            "asks": float(book.ask_sizes[:levels].sum()),
+        },
+        "imbalance": imbalance(book),
+        f"imbalance_top{levels}": imbalance(book, levels),
+    }
+    if quantity:
+        result["fill"] = {"buy": fill(book, "buy", quantity), "sell": fill(book, "sell", quantity)}
+    return result
@@ -0,0 +1,310 @@
+"""
+Сборка системного промпта под тему вопроса.
+
+Промпт делится на разделы: ядро профиля (роль, формат ответа, общие
+правила) и разделы по группам методов — описания методов, таблица
+таймфреймов, примеры. В запрос попадают только разделы тем, найденных
+в вопросе (IntentRouter.topics); если тема не распознана — весь промпт.
+
+Ядро всегда идёт первым и не зависит от вопроса, разделы — в одном и
+том же порядке, поэтому одинаковые наборы дают побайтно одинаковый
+текст и префикс запроса попадает в кэш промптов провайдера.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+from utils.intent_router import IntentRouter
+from utils.registry import METHODS
+from utils.tokens import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+PROFILES = ("chat", "submission")
+
+_CHAT_CORE = """Ты — AI-ассистент трейдера, интегрированный с Finam TradeAPI через Python-клиент. Твоё имя - FINAICUS
+
+Твоя задача — помочь пользователю, **возвращая вызов метода клиента**, а не HTTP-запрос.
+
+### 🔧 Формат ответа (ОБЯЗАТЕЛЬНО!):
+
+Если нужен API-запрос, ответ должен содержать **ровно две строки**:
+
+API_CALL: <название_метода>
+PARAMS: {{"ключ": "значение", ...}}
+
+Если для ответа нужно несколько запросов (например, сравнить несколько инструментов),
+верни несколько таких пар подряд — они будут выполнены параллельно.
+
+> ⚠️ ВАЖНО:
+> - **Никогда не передавай `account_id` в `PARAMS`** — он будет добавлен автоматически.
+> - Все строки — в двойных кавычках, как в JSON.
+> - Если вопрос не требует API — отвечай напрямую, без блока `API_CALL`.
+> - Биржа MISX
+> - сейчас дата {today:%d.%m.%Y}
+> - 2025-01-01T00:00:00Z - формат времени
+> - Ты МОЖЕШЬ давать рекомендации
+
+**Пользователь:** Что такое спред?
+**Ты:**
+Спред — это разница между лучшей ценой покупки (bid) и продажи (ask). Чем он меньше, тем выше ликвидность актива.
+
+Отвечай на русском, будь точным и полезным."""
+
+_SUBMISSION_CORE = """Ты — AI-ассистент трейдера, интегрированный с Finam TradeAPI через Python-клиент.
+Твоя задача — возвращать вызов метода клиента строго в формате:
+
+API_CALL: <название_метода>
+PARAMS: {{"ключ": "значение", ...}}
+
+⚠️ Правила:
+- Никогда не передавай account_id в PARAMS — он добавляется автоматически.
+- Если метод неочевиден, выбери ближайший по смыслу (например: цена → get_quote, история → get_candles, заявки → get_orders, позиции → get_positions).
+- Никогда не придумывай неизвестных методов и не используй пустые вызовы.
+- Все строки — только в JSON-формате с двойными кавычками.
+- Биржа: MISX
+- Сегодня: {today:%Y-%m-%d}
+- Формат времени: 2025-01-01T00:00:00Z"""
+
+METHOD_LINES: Dict[str, str] = {
+    "get_quote": "`get_quote(symbol: str)` — текущая котировка",
+    "get_orderbook": "`get_orderbook(symbol: str, depth: int = 10)` — стакан",
+    "analyze_orderbook": (
+        "`analyze_orderbook(symbol: str, depth: int = 50, quantity: float | None = None)` — спред, глубина и "
+        "дисбаланс стакана; с `quantity` — средняя цена и проскальзывание при покупке/продаже этого объёма"
+    ),
+    "get_candles": (
+        "`get_candles(symbol: str, timeframe: str = \"D\", start: str | None = None, end: str | None = None)` — свечи"
+    ),
+    "get_indicators": (
+        "`get_indicators(symbol: str, timeframe: str = \"TIME_FRAME_D\", start: str | None = None, "
+        "end: str | None = None, indicators: list[str] | None = None)` — индикаторы по свечам, уже посчитанные: "
+        "`return`, `sma_N`, `ema_N`, `rsi_N`, `atr_N`, `volatility`, `drawdown`, `vwap` (по умолчанию все)"
+    ),
+    "get_account": "`get_account(account_id: str)` — информация о счёте (account_id НЕ указывай)",
+    "get_positions": "`get_positions(account_id: str)` — позиции",
+    "get_orders": "`get_orders(account_id: str)` — заявки по счёту",
+    "get_order": "`get_order(account_id: str, order_id: str)` — конкретная заявка (указывай только order_id)",
+    "get_trades": "`get_trades(account_id: str, start: str | None = None, end: str | None = None)` — сделки по счёту",
+    "create_order": "`create_order(account_id: str, order_data: dict)` — создать заявку (передавай только тело заявки)",
+    "cancel_order": "`cancel_order(account_id: str, order_id: str)` — отменить заявку (указывай только order_id)",
+}
+
+# Группы методов по темам роутера; разделы темы "trading" включают и "account":
+# чтобы отменить заявку без номера, её сначала нужно найти в get_orders
+METHOD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "market": ("get_quote", "get_orderbook", "analyze_orderbook"),
+    "history": ("get_candles", "get_indicators"),
+    "account": ("get_account", "get_positions", "get_orders", "get_order", "get_trades"),
+    "trading": ("create_order", "cancel_order"),
+}
+
+_TIMEFRAMES = """Таймфреймы и глубина данных:
+- TIME_FRAME_M1 — 7 дней
+- TIME_FRAME_M5, TIME_FRAME_M15, TIME_FRAME_M30, TIME_FRAME_H1, TIME_FRAME_H2, TIME_FRAME_H4, TIME_FRAME_H8 — 30 дней
+- TIME_FRAME_D — 365 дней
+- TIME_FRAME_W, TIME_FRAME_MN, TIME_FRAME_QR — 5 лет"""
+
+_ORDER_RULES = """Тело заявки для `create_order`: `symbol`, `quantity` ({"value": "10.0"}), `side` (SIDE_BUY / SIDE_SELL),
+`type` (ORDER_TYPE_MARKET / ORDER_TYPE_LIMIT / ORDER_TYPE_STOP / ORDER_TYPE_STOP_LIMIT), `timeInForce`
+(по умолчанию TIME_IN_FORCE_DAY), `limitPrice` / `stopPrice` ({"value": "240"}) для лимитных и стоп-заявок."""
+
+_DOCS = """## 📚 Важные факты из документации (REST API Finam)
+
+### Счета (Accounts)
+- `/accounts/{account_id}` — данные по конкретному счету.
+
+### Инструменты (Instruments)
+- `/instruments` — список инструментов / фильтрация.
+- `/instruments/{symbol}/quotes/latest` — котировка по инструменту.
+- `/instruments/{symbol}/orderbook` — стакан заявок.
+- `/instruments/{symbol}/bars` — исторические данные (свечи) / бары.
+
+### Заявки и сделки (Orders / Trades)
+- `/accounts/{account_id}/orders` — все заявки по счёту.
+- `/accounts/{account_id}/orders/{order_id}` — конкретная заявка.
+- `/accounts/{account_id}/trades` — сделки по счёту (с возможностью фильтрации по времени)
+- Отмена заявки: `DELETE /accounts/{account_id}/orders/{order_id}`
+- Создать заявку: `POST /accounts/{account_id}/orders`"""
+
+# Примеры по темам: (вопрос, ответ)
+EXAMPLES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "market": (
+        ("Какая цена у Сбербанка?", 'API_CALL: get_quote\nPARAMS: {"symbol": "SBER@MISX"}'),
+        (
+            "Какое будет проскальзывание, если купить 5000 акций Лукойла по рынку?",
+            'API_CALL: analyze_orderbook\nPARAMS: {"symbol": "LKOH@MISX", "quantity": 5000}',
+        ),
+    ),
+    "history": (
+        (
+            "Изменение цены Сбера с января?",
+            'API_CALL: get_candles\nPARAMS: {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D", '
+            '"start": "2025-01-01T00:00:00Z", "end": "2025-10-04T00:00:00Z"}',
+        ),
+        (
+            "Какой тренд у Сбера за полгода?",
+            'API_CALL: get_indicators\nPARAMS: {"symbol": "SBER@MISX", "timeframe": "TIME_FRAME_D", '
+            '"start": "2025-04-04T00:00:00Z", "end": "2025-10-04T00:00:00Z", '
+            '"indicators": ["return", "sma_20", "sma_50", "rsi_14", "drawdown"]}',
+        ),
+    ),
+    "account": (
+        ("Покажи мои ордера.", "API_CALL: get_orders\nPARAMS: {}"),
+        ("Какие у меня позиции?", "API_CALL: get_positions\nPARAMS: {}"),
+    ),
+    "trading": (
+        (
+            "Купи 10 акций Газпрома по 240 руб.",
+            'API_CALL: create_order\nPARAMS: {"symbol": "GAZP@MISX", "quantity": {"value": "10.0"}, '
+            '"side": "SIDE_BUY", "type": "ORDER_TYPE_LIMIT", "timeInForce": "TIME_IN_FORCE_DAY", '
+            '"limitPrice": {"value": "240"}}',
+        ),
+        ("Отмени заявку ORD123456.", 'API_CALL: cancel_order\nPARAMS: {"order_id": "ORD123456"}'),
+    ),
+    "multi": (
+        (
+            "Сравни цены Сбера и Газпрома.",
+            'API_CALL: get_quote\nPARAMS: {"symbol": "SBER@MISX"}\n'
+            'API_CALL: get_quote\nPARAMS: {"symbol": "GAZP@MISX"}',
+        ),
+    ),
+}
+
+# Разделы в каноническом порядке; тема включает перечисленные разделы
+SECTION_ORDER = (
+    "methods", "timeframes", "order_rules", "docs",
+    "examples_market", "examples_history", "examples_account", "examples_trading", "examples_multi",
+)
+TOPIC_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "market": ("methods", "examples_market"),
+    "history": ("methods", "timeframes", "examples_history"),
+    "account": ("methods", "examples_account"),
+    "trading": ("methods", "order_rules", "examples_account", "examples_trading"),
+    "multi": ("examples_multi",),
+    # Справочные вопросы (сессии, лоты, ГО, опционы): методов под них нет,
+    # нужны описания эндпоинтов, а не примеры
+    "unsupported": ("methods", "docs"),
+}
+TOPIC_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "market": ("market",),
+    "history": ("history",),
+    "account": ("account",),
+    "trading": ("account", "trading"),
+}
+
+
+def _render_examples(topic: str) -> str:
+    return "\n\n".join(
+        f"**Пользователь:** {question}  \n**Ты:**  \n{answer}" for question, answer in EXAMPLES[topic]
+    )
+
+
+def _render_methods(groups: FrozenSet[str]) -> str:
+    """Описания методов выбранных групп; методы реестра вне групп попадают только в полный набор"""
+    if groups >= set(METHOD_GROUPS):
+        names: Iterable[str] = METHODS
+    else:
+        names = [name for group in METHOD_GROUPS if group in groups for name in METHOD_GROUPS[group]]
+    return "📚 Доступные методы и их параметры:\n\n" + "\n".join(f"- {METHOD_LINES[name]}" for name in names)
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Собранный промпт: неизменное ядро и разделы под вопрос"""
+
+    core: str
+    scoped: str
+    sections: Tuple[str, ...]
+    topics: FrozenSet[str]
+    full: bool
+
+    @property
+    def text(self) -> str:
+        return f"{self.core}\n\n{self.scoped}" if self.scoped else self.core
+
+    @property
+    def tokens(self) -> int:
+        """Токены системных сообщений запроса (с накладными расходами на сообщение)"""
+        return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in self.system_messages())
+
+    def system_messages(self) -> List[Dict[str, str]]:
+        """Ядро и разделы отдельными системными сообщениями: ядро — общий префикс всех запросов"""
+        messages = [{"role": "system", "content": self.core}]
+        if self.scoped:
+            messages.append({"role": "system", "content": self.scoped})
+        return messages
+
+
+class PromptCompiler:
+    """Сборщик системного промпта для профиля "chat" (ассистент) или "submission" (только API_CALL)"""
+
+    def __init__(self, profile: str = "chat", today: date | None = None, router: IntentRouter | None = None) -> None:
+        """
+        Args:
+            profile: "chat" или "submission"
+            today: Дата "сегодня" в промпте (по умолчанию дата роутера)
+            router: Роутер, определяющий темы вопроса
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Неизвестный профиль промпта: {profile}")
+        self.profile = profile
+        self.router = router or IntentRouter(today=today)
+        today = today or self.router.today
+        self.core = (_CHAT_CORE if profile == "chat" else _SUBMISSION_CORE).format(today=today)
+        self._sections: Dict[str, str] = {
+            "timeframes": _TIMEFRAMES,
+            "order_rules": _ORDER_RULES,
+            "docs": _DOCS,
+            **{f"examples_{topic}": _render_examples(topic) for topic in EXAMPLES},
+        }
+        self.render = lru_cache(maxsize=64)(self._render)
+
+    def _render(self, sections: Tuple[str, ...], groups: FrozenSet[str]) -> str:
+        parts = []
+        for name in sections:
+            parts.append(_render_methods(groups) if name == "methods" else self._sections[name])
+        return "\n\n---\n\n".join(parts)
+
+    def full(self) -> CompiledPrompt:
+        """Полный промпт: все методы и все разделы"""
+        return CompiledPrompt(
+            core=self.core,
+            scoped=self.render(SECTION_ORDER, frozenset(METHOD_GROUPS)),
+            sections=SECTION_ORDER,
+            topics=frozenset(),
+            full=True,
+        )
+
+    def topics(self, question: str, history: Sequence[str] = ()) -> FrozenSet[str]:
+        """
+        Темы вопроса; для уточнений без собственной темы ("а за неделю?")
+        берутся темы последней реплики пользователя, в которой они были.
+        """
+        found = self.router.topics(question)
+        if not found - {"multi"}:
+            for previous in reversed(history):
+                previous_topics = self.router.topics(previous)
+                if previous_topics - {"multi"}:
+                    found |= previous_topics
+                    break
+        return frozenset(found)
+
+    def compile(self, question: str, history: Sequence[str] = ()) -> CompiledPrompt:
+        """Промпт для вопроса: ядро и разделы найденных тем (или полный промпт)"""
+        topics = self.topics(question, history)
+        groups = frozenset(group for topic in topics for group in TOPIC_GROUPS.get(topic, ()))
+        if not groups:
+            if "unsupported" not in topics:
+                return self.full()
+            groups = frozenset(METHOD_GROUPS)
+        wanted = {name for topic in topics for name in TOPIC_SECTIONS.get(topic, ())}
+        sections = tuple(name for name in SECTION_ORDER if name in wanted)
+        return CompiledPrompt(
+            core=self.core,
+            scoped=self.render(sections, groups),
+            sections=sections,
+            topics=topics,
+            full=False,
+        )
+
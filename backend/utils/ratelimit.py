@@ -0,0 +1,175 @@
+"""
+Ограничители частоты запросов
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket: не более `rate` операций в секунду
+    с допустимым всплеском до `capacity` операций.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        """
+        Args:
+            rate: Скорость пополнения, токенов в секунду
+            capacity: Размер корзины (по умолчанию max(1, rate))
+        """
+        if rate <= 0:
+            raise ValueError("rate должен быть положительным")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready_in(self, tokens: float = 1.0) -> float:
+        """Через сколько секунд в корзине будет `tokens` токенов (0 — уже есть)"""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def take(self, tokens: float = 1.0) -> None:
+        """Забрать токены без ожидания (после ready_in() == 0)"""
+        self._refill()
+        self._tokens -= tokens
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены `seconds` секунд (например, по Retry-After)"""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Дождаться и забрать `tokens` токенов"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class PriorityScheduler:
+    """
+    Очередь запросов с лимитом по классам и общим лимитом.
+
+    У каждого класса свой TokenBucket, все вместе делят общий. Пока токены
+    есть, запрос проходит сразу; иначе ждёт в очереди, и освободившийся
+    токен получает ожидающий с наименьшим priority (при равенстве — раньше
+    пришедший) среди тех, чей класс не исчерпал свой лимит.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, Tuple[int, float, float]],
+        total: Tuple[float, float] | None = None,
+    ) -> None:
+        """
+        Args:
+            classes: Класс -> (priority, rate, capacity); меньший priority обслуживается первым
+            total: Общий лимит (rate, capacity) на все классы (None — без общего лимита)
+        """
+        self.priorities = {name: priority for name, (priority, _, _) in classes.items()}
+        self.buckets = {name: TokenBucket(rate, capacity) for name, (_, rate, capacity) in classes.items()}
+        self.total = TokenBucket(*total) if total else None
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+        self.counters: Dict[str, Dict[str, float]] = {
+            name: {"granted": 0, "queued": 0, "wait_seconds": 0.0, "paused": 0} for name in classes
+        }
+
+    def _ready_in(self, name: str) -> float:
+        wait = self.buckets[name].ready_in()
+        if self.total is not None:
+            wait = max(wait, self.total.ready_in())
+        return wait
+
+    def _take(self, name: str) -> None:
+        self.buckets[name].take()
+        if self.total is not None:
+            self.total.take()
+        self.counters[name]["granted"] += 1
+
+    async def acquire(self, name: str) -> float:
+        """Дождаться очереди класса `name`; возвращает время ожидания, сек"""
+        if not self._waiters and self._ready_in(name) == 0:
+            self._take(name)
+            return 0.0
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self.priorities[name], next(self._seq), name, future))
+        self.counters[name]["queued"] += 1
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        # Отменённое ожидание диспетчер просто пропустит (future.done())
+        await future
+        waited = time.monotonic() - started
+        self.counters[name]["wait_seconds"] += waited
+        return waited
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._waiters = [waiter for waiter in self._waiters if not waiter[3].done()]
+            heapq.heapify(self._waiters)
+            if not self._waiters:
+                return
+            sleep = None
+            for priority, seq, name, future in sorted(self._waiters):
+                wait = self._ready_in(name)
+                if wait == 0:
+                    self._take(name)
+                    future.set_result(None)
+                    sleep = 0.0
+                    break
+                sleep = wait if sleep is None else min(sleep, wait)
+            if sleep:
+                self._wakeup.clear()
+                # Новый ожидающий может оказаться из класса, у которого токены есть
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), sleep)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(0)
+
+    def pause(self, name: str, seconds: float) -> None:
+        """Приостановить класс на `seconds` секунд (ответ 429 с Retry-After)"""
+        self.buckets[name].pause(seconds)
+        self.counters[name]["paused"] += 1
+
+    def depth(self) -> Dict[str, int]:
+        """Ожидающие запросы по классам"""
+        depth = {name: 0 for name in self.buckets}
+        for _, _, name, future in self._waiters:
+            if not future.done():
+                depth[name] += 1
+        return depth
+
+    def stats(self) -> Dict[str, Any]:
+        depth = self.depth()
+        return {
+            name: {
+                "priority": self.priorities[name],
+                "rate": self.buckets[name].rate,
+                "depth": depth[name],
+                "granted": int(counters["granted"]),
+                "queued": int(counters["queued"]),
+                "avg_wait_ms": round(counters["wait_seconds"] / counters["queued"] * 1000, 1) if counters["queued"] else 0.0,
+                "paused": int(counters["paused"]),
+            }
+            for name, counters in self.counters.items()
+        }
@@ -0,0 +1,139 @@
+"""
+Реестр методов клиента Finam, которые может вызывать ассистент.
+
+Описывает параметры каждого метода, нужен ли счёт, HTTP-маршрут и
+идемпотентность, и выполняет вызовы (в том числе несколько параллельно).
+"""
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+ApiCall = Tuple[str, Dict[str, Any]]
+
+API_CALL_RE = re.compile(r"API_CALL:\s*(\w+)")
+PARAMS_RE = re.compile(r"PARAMS:\s*(?=\{)")
+
+
+@dataclass(frozen=True)
+class MethodSpec:
+    """Описание метода клиента"""
+
+    name: str
+    http_method: str
+    path: str
+    required: Tuple[str, ...] = ()
+    optional: Tuple[str, ...] = ()
+    requires_account: bool = False
+    body: bool = False  # PARAMS целиком передаются телом запроса (create_order)
+    idempotent: bool = True
+
+    @property
+    def params(self) -> Tuple[str, ...]:
+        return self.required + self.optional
+
+
+METHODS: Dict[str, MethodSpec] = {
+    spec.name: spec
+    for spec in [
+        MethodSpec("get_quote", "GET", "/v1/instruments/{symbol}/quotes/latest", required=("symbol",)),
+        MethodSpec("get_orderbook", "GET", "/v1/instruments/{symbol}/orderbook", required=("symbol",), optional=("depth",)),
+        MethodSpec(
+            "analyze_orderbook", "GET", "/v1/instruments/{symbol}/orderbook",
+            required=("symbol",), optional=("depth", "quantity"),
+        ),
+        MethodSpec(
+            "get_candles", "GET", "/v1/instruments/{symbol}/bars",
+            required=("symbol",), optional=("timeframe", "start", "end"),
+        ),
+        MethodSpec(
+            "get_indicators", "GET", "/v1/instruments/{symbol}/bars",
+            required=("symbol",), optional=("timeframe", "start", "end", "indicators"),
+        ),
+        MethodSpec("get_account", "GET", "/v1/accounts/{account_id}", requires_account=True),
+        MethodSpec("get_orders", "GET", "/v1/accounts/{account_id}/orders", requires_account=True),
+        MethodSpec(
+            "get_order", "GET", "/v1/accounts/{account_id}/orders/{order_id}",
+            required=("order_id",), requires_account=True,
+        ),
+        MethodSpec(
+            "get_trades", "GET", "/v1/accounts/{account_id}/trades",
+            optional=("start", "end"), requires_account=True,
+        ),
+        MethodSpec("get_positions", "GET", "/v1/accounts/{account_id}", requires_account=True),
+        MethodSpec(
+            "create_order", "POST", "/v1/accounts/{account_id}/orders",
+            required=("symbol",), requires_account=True, body=True, idempotent=False,
+        ),
+        MethodSpec(
+            "cancel_order", "DELETE", "/v1/accounts/{account_id}/orders/{order_id}",
+            required=("order_id",), requires_account=True, idempotent=False,
+        ),
+    ]
+}
+
+
+def validate_call(method_name: str, params: Dict[str, Any], account_id: Optional[str] = None) -> Optional[str]:
+    """Текст ошибки, если вызов нельзя выполнить, иначе None"""
+    spec = METHODS.get(method_name)
+    if spec is None:
+        return f"Метод не найден: {method_name}"
+    if spec.requires_account and not account_id:
+        return "account_id обязателен для этого метода"
+    missing = [name for name in spec.required if not params.get(name)]
+    if missing:
+        return f"{', '.join(missing)} обязателен для {method_name}"
+    return None
+
+
+def format_api_call(method: str, params: Dict[str, Any]) -> str:
+    """Вызов метода в том же формате, что возвращает LLM"""
+    return f"API_CALL: {method}\nPARAMS: {json.dumps(params, ensure_ascii=False)}"
+
+
+def parse_api_calls(text: str) -> List[ApiCall]:
+    """Все пары API_CALL/PARAMS из ответа LLM по порядку (обратное к format_api_call)"""
+    if "API_CALL:" not in text:
+        return []
+    calls: List[ApiCall] = []
+    call_matches = list(API_CALL_RE.finditer(text))
+    for i, call_match in enumerate(call_matches):
+        block_end = call_matches[i + 1].start() if i + 1 < len(call_matches) else len(text)
+        params_match = PARAMS_RE.search(text, call_match.end(), block_end)
+        if not params_match:
+            continue
+        try:
+            # raw_decode, а не регулярка: PARAMS может содержать вложенные объекты (create_order)
+            params, _ = json.JSONDecoder().raw_decode(text, params_match.end())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(params, dict):
+            calls.append((call_match.group(1), params))
+    return calls
+
+
+async def dispatch(client: Any, method_name: str, params: Dict[str, Any], account_id: Optional[str] = None) -> Dict[str, Any]:
+    """Выполнить один вызов метода клиента; ошибки возвращаются словарём с ключом "error" """
+    error = validate_call(method_name, params, account_id)
+    if error:
+        return {"error": error}
+
+    spec = METHODS[method_name]
+    func = getattr(client, method_name)
+    try:
+        if spec.body:
+            return await func(account_id, params)
+        # Лишние ключи от LLM отбрасываются, чтобы не ловить TypeError
+        kwargs = {name: params[name] for name in spec.params if name in params}
+        if spec.requires_account:
+            return await func(account_id, **kwargs)
+        return await func(**kwargs)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def dispatch_many(client: Any, calls: List[ApiCall], account_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Выполнить несколько вызовов параллельно, результаты — в порядке вызовов"""
+    return list(await asyncio.gather(*(dispatch(client, name, params, account_id) for name, params in calls)))
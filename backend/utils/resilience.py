@@ -0,0 +1,367 @@
+"""
+Устойчивость вызовов внешних сервисов (Finam TradeAPI, OpenRouter).
+
+- Дедлайн на весь вызов вместе с повторами и таймаут одной попытки —
+  по политике метода (CallPolicy).
+- Повторы с экспоненциальной паузой и полным джиттером, только когда
+  повтор безопасен: запрос идемпотентный или не дошёл до сервера
+  (ошибка соединения). Заявка не отправляется дважды.
+- Хеджирование идемпотентных запросов: если ответа нет дольше
+  перцентиля задержки метода (RESILIENCE_HEDGE_PERCENTILE), уходит копия
+  запроса и берётся первый успешный ответ. Доля копий ограничена
+  (RESILIENCE_HEDGE_MAX_RATIO), чтобы медленный сервис не получил двойную нагрузку.
+- Автомат (circuit breaker) на сервис: при доле сбоев выше порога вызовы
+  сразу завершаются CircuitOpenError, через паузу пропускается пробный.
+
+RESILIENCE=0 — старое поведение: одна попытка без дедлайна и автомата.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from utils.batch import percentile
+from utils.metrics import RESILIENCE_EVENTS
+
+T = TypeVar("T")
+
+# Ответы, после которых запрос можно повторить: перегрузка и сбои на стороне сервиса
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Сервис признан недоступным, вызов отклонён без обращения к сети"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Истёк дедлайн вызова (с учётом повторов)"""
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """
+    Политика вызова метода.
+
+    name: Метка для метрик и статистики задержек (эндпоинт)
+    deadline: Бюджет на вызов целиком, сек
+    attempt_timeout: Таймаут одной попытки, сек (None — остаток дедлайна)
+    retries: Максимум повторов
+    idempotent: Повтор не меняет результат (GET, отмена заявки); иначе повтор только если запрос не ушёл
+    hedge: Разрешено хеджирование (только вместе с idempotent)
+    """
+
+    name: str
+    deadline: float
+    attempt_timeout: Optional[float] = None
+    retries: int = 2
+    idempotent: bool = True
+    hedge: bool = False
+
+
+def classify(exc: BaseException) -> str:
+    """
+    Вид сбоя: "unsent" — запрос не дошёл до сервера, "transient" — таймаут
+    или сбой сервиса (повтор может помочь), "fatal" — ошибка самого запроса
+    """
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return "unsent"
+    if isinstance(exc, httpx.HTTPStatusError):
+        # 429 — сервис отказал до выполнения, повтор безопасен и для заявки
+        if exc.response.status_code == 429:
+            return "unsent"
+        return "transient" if exc.response.status_code in RETRYABLE_STATUSES else "fatal"
+    if isinstance(exc, (httpx.TransportError, TimeoutError)):
+        return "transient"
+    return "fatal"
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Сбой для автомата: сервис недоступен или деградировал (429 — исправный сервис, это лимит)"""
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        return False
+    return classify(exc) != "fatal"
+
+
+class CircuitBreaker:
+    """Автомат по скользящему окну последних исходов: closed → open → half_open → closed"""
+
+    def __init__(
+        self,
+        window: int | None = None,
+        min_calls: int | None = None,
+        failure_rate: float | None = None,
+        reset_timeout: float | None = None,
+    ) -> None:
+        """
+        Args:
+            window: Сколько последних исходов учитывать (RESILIENCE_CIRCUIT_WINDOW)
+            min_calls: Минимум исходов в окне для размыкания (RESILIENCE_CIRCUIT_MIN_CALLS)
+            failure_rate: Доля сбоев для размыкания (RESILIENCE_CIRCUIT_FAILURE_RATE)
+            reset_timeout: Пауза до пробного вызова, сек (RESILIENCE_CIRCUIT_RESET)
+        """
+        window = window or int(os.getenv("RESILIENCE_CIRCUIT_WINDOW", "20"))
+        self.min_calls = min_calls or int(os.getenv("RESILIENCE_CIRCUIT_MIN_CALLS", "10"))
+        self.failure_rate = failure_rate or float(os.getenv("RESILIENCE_CIRCUIT_FAILURE_RATE", "0.5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("RESILIENCE_CIRCUIT_RESET", "10"))
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов сейчас (в half_open — один пробный за раз)"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, failed: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if failed:
+                self._open()
+            else:
+                self.state = CLOSED
+                self._outcomes.clear()
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def release(self) -> None:
+        """Пробный вызов отменён, не дав исхода"""
+        self._probing = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class LatencyTracker:
+    """Последние задержки успешных попыток метода и порог хеджирования"""
+
+    def __init__(self, maxlen: int = 512, min_samples: int = 20) -> None:
+        self.samples: Deque[float] = deque(maxlen=maxlen)
+        self.min_samples = min_samples
+        self._threshold: Optional[float] = None
+        self._stale = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def threshold(self, pct: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        # Перцентиль пересчитывается не на каждый вызов, а раз в 16 новых замеров
+        if self._threshold is None or self._stale >= 16:
+            self._threshold = percentile(list(self.samples), pct)
+            self._stale = 0
+        return self._threshold
+
+
+class Upstream:
+    """Дедлайны, повторы, хеджирование и автомат для одного внешнего сервиса"""
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker | None = None,
+        hedge_percentile: float | None = None,
+        hedge_max_ratio: float | None = None,
+        hedge_min_delay: float = 0.02,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 2.0,
+        enabled: bool | None = None,
+    ) -> None:
+        """
+        Args:
+            name: Имя сервиса (метки метрик)
+            breaker: Автомат (по умолчанию с параметрами из окружения)
+            hedge_percentile: Перцентиль задержки, после которого уходит копия (RESILIENCE_HEDGE_PERCENTILE)
+            hedge_max_ratio: Максимальная доля вызовов с копией (RESILIENCE_HEDGE_MAX_RATIO)
+            hedge_min_delay: Копия не раньше, сек
+            backoff_base: Пауза перед первым повтором (верхняя граница джиттера), сек
+            backoff_cap: Максимальная пауза между повторами, сек
+            enabled: Включить (RESILIENCE, по умолчанию да)
+        """
+        if enabled is None:
+            enabled = os.getenv("RESILIENCE", "1").lower() in ("1", "true", "yes")
+        self.name = name
+        self.enabled = enabled
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile or float(os.getenv("RESILIENCE_HEDGE_PERCENTILE", "95"))
+        if hedge_max_ratio is None:
+            hedge_max_ratio = float(os.getenv("RESILIENCE_HEDGE_MAX_RATIO", "0.1"))
+        self.hedge_max_ratio = hedge_max_ratio
+        self.hedge_min_delay = hedge_min_delay
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self.counters: Dict[str, int] = {
+            "calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "short_circuits": 0, "deadlines": 0,
+        }
+
+    def _event(self, event: str) -> None:
+        self.counters[event] += 1
+        RESILIENCE_EVENTS.inc(upstream=self.name, event=event)
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Через сколько отправлять копию запроса (None — мало замеров или бюджет копий исчерпан)"""
+        tracker = self._latencies.get(name)
+        threshold = tracker.threshold(self.hedge_percentile) if tracker else None
+        if threshold is None:
+            return None
+        if self.counters["hedges"] >= self.hedge_max_ratio * self.counters["calls"]:
+            return None
+        return max(self.hedge_min_delay, threshold)
+
+    async def call(
+        self,
+        policy: CallPolicy,
+        attempt: Callable[[], Awaitable[T]],
+        admit: Callable[[], Awaitable[Any]] | None = None,
+    ) -> T:
+        """
+        Выполнить вызов по политике.
+
+        Args:
+            policy: Политика метода
+            attempt: Одна попытка запроса; ошибки HTTP — исключениями httpx (raise_for_status)
+            admit: Ожидание очереди перед каждой попыткой (ограничитель частоты); входит
+                в дедлайн, но не в таймаут попытки и не в статистику задержек
+
+        Returns:
+            Результат первой успешной попытки; иначе исключение последней попытки,
+            CircuitOpenError или DeadlineExceeded
+        """
+        if not self.enabled:
+            if admit is not None:
+                await admit()
+            return await attempt()
+        self.counters["calls"] += 1
+        deadline_at = time.monotonic() + policy.deadline
+        for number in range(policy.retries + 1):
+            if not self.breaker.allow():
+                self._event("short_circuits")
+                raise CircuitOpenError(f"{self.name}: сервис временно недоступен (circuit open)")
+            remaining = deadline_at - time.monotonic()
+            timeout = min(policy.attempt_timeout or remaining, remaining)
+            try:
+                if policy.hedge and policy.idempotent:
+                    return await self._hedged(policy, attempt, timeout, admit, deadline_at)
+                return await self._attempt(policy, attempt, timeout, admit, deadline_at)
+            except DeadlineExceeded:
+                self._event("deadlines")
+                raise
+            except Exception as e:
+                kind = classify(e)
+                retryable = kind == "unsent" or (kind == "transient" and policy.idempotent)
+                # Полный джиттер: одновременные клиенты не повторяют синхронно
+                pause = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** number))
+                out_of_time = time.monotonic() + pause >= deadline_at
+                if not retryable or number == policy.retries or out_of_time:
+                    if isinstance(e, TimeoutError) and out_of_time:
+                        self._event("deadlines")
+                        raise DeadlineExceeded(f"{policy.name}: дедлайн {policy.deadline:g} с истёк") from e
+                    raise
+                self._event("retries")
+                await asyncio.sleep(pause)
+        raise AssertionError("unreachable")
+
+    async def _attempt(
+        self,
+        policy: CallPolicy,
+        attempt: Callable[[], Awaitable[T]],
+        timeout: float,
+        admit: Callable[[], Awaitable[Any]] | None,
+        deadline_at: float,
+    ) -> T:
+        if admit is not None:
+            try:
+                await asyncio.wait_for(admit(), max(0.0, deadline_at - time.monotonic()))
+            except TimeoutError:
+                # Дедлайн истёк в очереди — сервис тут ни при чём: исхода нет, пробный вызов
+                # в half_open освобождается, иначе автомат так и не закроется
+                self._release_probe()
+                raise DeadlineExceeded(f"{policy.name}: дедлайн {policy.deadline:g} с истёк в очереди") from None
+            except asyncio.CancelledError:
+                self._release_probe()
+                raise
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(), min(timeout, deadline_at - started))
+        except asyncio.CancelledError:
+            # Отменённая копия (хедж) не говорит ничего о здоровье сервиса
+            self._release_probe()
+            raise
+        except Exception as e:
+            self.breaker.record(is_failure(e))
+            raise
+        self.breaker.record(False)
+        self._latencies.setdefault(policy.name, LatencyTracker()).add(time.monotonic() - started)
+        return result
+
+    def _release_probe(self) -> None:
+        if self.breaker.state == HALF_OPEN:
+            self.breaker.release()
+
+    async def _hedged(
+        self,
+        policy: CallPolicy,
+        attempt: Callable[[], Awaitable[T]],
+        timeout: float,
+        admit: Callable[[], Awaitable[Any]] | None,
+        deadline_at: float,
+    ) -> T:
+        delay = self.hedge_delay(policy.name)
+        if delay is None or delay >= timeout:
+            return await self._attempt(policy, attempt, timeout, admit, deadline_at)
+        primary = asyncio.ensure_future(self._attempt(policy, attempt, timeout, admit, deadline_at))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            self._event("hedges")
+            hedge = asyncio.ensure_future(self._attempt(policy, attempt, timeout - delay, admit, deadline_at))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if succeeded[0] is hedge:
+                        self._event("hedge_wins")
+                    return succeeded[0].result()
+            # Обе попытки с ошибкой — наружу ошибка основной
+            raise primary.exception()  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние автомата, счётчики и текущие пороги хеджирования по методам, мс"""
+        return {
+            "enabled": self.enabled,
+            "state": self.breaker.state,
+            **self.counters,
+            "hedge_after_ms": {
+                name: round(threshold * 1000, 1)
+                for name, tracker in sorted(self._latencies.items())
+                if (threshold := tracker.threshold(self.hedge_percentile)) is not None
+            },
+        }
@@ -0,0 +1,174 @@
+"""
+Хранилище сессий чата с ограничением по числу сессий, времени простоя
+и бюджету токенов истории.
+
+Старые результаты API сокращаются, а самые старые реплики сворачиваются
+в краткое содержание, поэтому стоимость хода не растёт с длиной чата.
+"""
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+from utils.tokens import count_message_tokens, estimate_tokens
+
+Message = Dict[str, str]
+
+API_RESULT_PREFIX = "Результат API вызова:"
+SUMMARY_HEADER = "Краткое содержание предыдущей беседы:"
+
+
+class SessionStore:
+    """LRU-хранилище диалогов с вытеснением по простою и компактизацией истории"""
+
+    def __init__(
+        self,
+        max_sessions: int | None = None,
+        idle_ttl: float | None = None,
+        token_budget: int | None = None,
+        keep_recent: int | None = None,
+        api_result_chars: int | None = None,
+        max_summary_lines: int = 20,
+    ) -> None:
+        """
+        Args:
+            max_sessions: Максимум сессий в памяти (SESSION_MAX_SESSIONS)
+            idle_ttl: Время простоя до удаления сессии, сек (SESSION_IDLE_TTL)
+            token_budget: Бюджет токенов истории без системного промпта (SESSION_TOKEN_BUDGET)
+            keep_recent: Сколько последних сообщений не сокращать (SESSION_KEEP_RECENT)
+            api_result_chars: Длина, до которой сокращаются старые результаты API (SESSION_API_RESULT_CHARS)
+            max_summary_lines: Максимум строк в кратком содержании
+        """
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("SESSION_IDLE_TTL", "3600"))
+        self.token_budget = token_budget or int(os.getenv("SESSION_TOKEN_BUDGET", "4000"))
+        self.keep_recent = keep_recent if keep_recent is not None else int(os.getenv("SESSION_KEEP_RECENT", "4"))
+        self.api_result_chars = api_result_chars or int(os.getenv("SESSION_API_RESULT_CHARS", "600"))
+        self.max_summary_lines = max_summary_lines
+
+        self._sessions: "OrderedDict[str, List[Message]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.evicted = 0
+        self.compactions = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str, system_prompt: Callable[[], str]) -> List[Message]:
+        """Диалог сессии (создаётся с системным промптом при первом обращении)"""
+        self._evict_idle()
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            conversation = [{"role": "system", "content": system_prompt()}]
+            self._sessions[session_id] = conversation
+        self._touch(session_id)
+        self._evict_overflow()
+        return conversation
+
+    def save(self, session_id: str, conversation: List[Message]) -> None:
+        """Сохранить диалог после хода, уложив историю в бюджет токенов"""
+        self._sessions[session_id] = self.compact(conversation)
+        self._touch(session_id)
+        self._evict_overflow()
+
+    def drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+
+    def compact(self, conversation: List[Message]) -> List[Message]:
+        """Сократить старые результаты API и свернуть самые старые реплики"""
+        system = [conversation[0]] if conversation and conversation[0]["role"] == "system" else []
+        summary_lines: List[str] = []
+        history = conversation[len(system):]
+        if history and history[0]["role"] == "system" and history[0]["content"].startswith(SUMMARY_HEADER):
+            summary_lines = history[0]["content"].splitlines()[1:]
+            history = history[1:]
+
+        split = max(0, len(history) - self.keep_recent)
+        old, recent = history[:split], history[split:]
+
+        compacted = self._shorten_api_results(old)
+
+        while old and count_message_tokens(old + recent) + self._summary_tokens(summary_lines) > self.token_budget:
+            line = self._summarize(old.pop(0))
+            if line:
+                summary_lines.append(line)
+            compacted = True
+
+        if count_message_tokens(recent) > self.token_budget:
+            # Даже последний ход не помещается — сокращаем и его результаты API
+            compacted = self._shorten_api_results(recent) or compacted
+
+        if compacted:
+            self.compactions += 1
+        summary_lines = summary_lines[-self.max_summary_lines:]
+        summary = [{"role": "system", "content": "\n".join([SUMMARY_HEADER] + summary_lines)}] if summary_lines else []
+        return system + summary + old + recent
+
+    def _shorten_api_results(self, messages: List[Message]) -> bool:
+        shortened = False
+        for i, msg in enumerate(messages):
+            content = msg["content"]
+            if content.startswith(API_RESULT_PREFIX) and len(content) > self.api_result_chars:
+                messages[i] = {**msg, "content": content[: self.api_result_chars] + "… [сокращено]"}
+                shortened = True
+        return shortened
+
+    @staticmethod
+    def _summarize(msg: Message) -> str:
+        content = msg["content"].strip()
+        if content.startswith(API_RESULT_PREFIX) or content.startswith("API_CALL:"):
+            return ""
+        if msg["role"] == "user":
+            return f"- Пользователь: {content[:120]}"
+        return f"- Ассистент: {content[:160]}"
+
+    @staticmethod
+    def _summary_tokens(lines: List[str]) -> int:
+        return sum(estimate_tokens(line) for line in lines)
+
+    def _touch(self, session_id: str) -> None:
+        self._last_access[session_id] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+
+    def _evict_idle(self) -> None:
+        if not self.idle_ttl:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_access.get(oldest, 0) >= deadline:
+                break
+            self.drop(oldest)
+            self.evicted += 1
+
+    def _evict_overflow(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            self.drop(oldest)
+            self.evicted += 1
+
+    def memory_footprint(self) -> int:
+        """Приблизительный объём памяти, занятый диалогами, байт"""
+        total = sys.getsizeof(self._sessions)
+        for session_id, conversation in self._sessions.items():
+            total += sys.getsizeof(session_id) + sys.getsizeof(conversation)
+            for msg in conversation:
+                total += sys.getsizeof(msg) + sum(sys.getsizeof(v) for v in msg.values())
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        history_tokens = [count_message_tokens(c[1:]) for c in self._sessions.values()]
+        return {
+            "sessions": len(self._sessions),
+            "evicted": self.evicted,
+            "compactions": self.compactions,
+            "memory_bytes": self.memory_footprint(),
+            "max_history_tokens": max(history_tokens, default=0),
+            "token_budget": self.token_budget,
+        }
@@ -0,0 +1,24 @@
+"""
+Оценка числа токенов без обращения к токенизатору провайдера.
+
+Для BPE-токенизаторов GPT ~4 байта UTF-8 на токен дают близкую оценку
+и для латиницы, и для кириллицы (2 байта на символ).
+"""
+
+import math
+from typing import Dict, Iterable
+
+# Служебные токены на сообщение в формате chat/completions
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов в тексте"""
+    if not text:
+        return 0
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def count_message_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    """Приблизительное число токенов промпта из списка сообщений"""
+    return sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
@@ -1,14 +1,23 @@
 import streamlit as st
-import sqlite3
-import os
+import streamlit.components.v1 as components
+import html
 import json
 import re
+import urllib.parse
 from datetime import datetime
 import requests
+import time
 
+from storage import create_new_chat, delete_chat, get_all_chats, get_chat, get_recent_messages, save_message
 
-DB_PATH = "ai_chat.db"
 API_URL = "http://0.0.0.0:8000/api/local/message"
+STREAM_URL = API_URL + "/stream"
+# WebSocket хаба рыночных данных; браузер подключается к бэкенду напрямую
+MARKET_WS_URL = "ws://localhost:8000/api/local/market/ws"
+SYMBOL_RE = re.compile(r"\b[A-Z0-9]{1,12}@[A-Z]{3,5}\b")
+# Тикер из поля "Живые цены" целиком (с фьючерсами вида SiZ5@RTSX)
+LIVE_SYMBOL_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,15}@[A-Z]{3,5}")
+HISTORY_PAGE_SIZE = 30
 
 st.markdown("""
 <style>
@@ -74,99 +83,151 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS chats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def create_new_chat(title: str = "Новый чат") -> int:
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO chats (title) VALUES (?)", (title,))
-        return cursor.lastrowid
-
-def update_chat_title(chat_id: int, new_title: str):
-    with get_db_connection() as conn:
-        conn.execute("UPDATE chats SET title = ? WHERE id = ?", (new_title, chat_id))
-
-def get_all_chats():
-    with get_db_connection() as conn:
-        rows = conn.execute("SELECT id, title FROM chats ORDER BY created_at DESC").fetchall()
-        return [{"id": r["id"], "title": r["title"]} for r in rows]
-
-def save_message(chat_id: int, role: str, content: str):
-    with get_db_connection() as conn:
-        conn.execute(
-            "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
-            (chat_id, role, content)
-        )
+def render_price_card(price: float, change: float):
+    change_class = "change-positive" if change >= 0 else "change-negative"
+    change_sign = "+" if change >= 0 else ""
+    formatted_price = f"{price:,.0f} ₽".replace(",", " ")
+    formatted_change = f"{change_sign}{change:.2f}%"
+    st.markdown(
+        f"""
+        <div class="price-card">
+            <div class="price-value">{formatted_price}</div>
+            <div class="price-change {change_class}">{formatted_change}</div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
 
-def get_chat_messages(chat_id: int):
-    with get_db_connection() as conn:
-        rows = conn.execute(
-            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY created_at ASC",
-            (chat_id,)
-        ).fetchall()
-        return [{"role": r["role"], "content": r["content"]} for r in rows]
-
-
-def extract_price_and_change(text: str) -> tuple[float | None, float | None]:
-    text = text.strip()
-    pattern = r'([\d\s.,]+)\s*₽?\s*(?:\(|\s*)([+-]?\d*\.?\d+)%'
-    match = re.search(pattern, text)
-    if not match:
-        return None, None
-    price_str = match.group(1).replace(' ', '').replace(',', '.')
-    change_str = match.group(2)
-    try:
-        price = float(price_str)
-        change = float(change_str)
-        return price, change
-    except ValueError:
-        return None, None
+
+def mentioned_symbols(messages: list, limit: int = 3) -> list[str]:
+    """Тикеры из последних сообщений чата, начиная с самых свежих"""
+    found: list[str] = []
+    for msg in reversed(messages):
+        for symbol in SYMBOL_RE.findall(msg["content"] or ""):
+            if symbol not in found:
+                found.append(symbol)
+    return found[:limit]
+
+
+def render_live_prices(symbols: list[str]):
+    """Карточки цен, обновляемые из хаба рыночных данных по WebSocket"""
+    query = urllib.parse.urlencode({"symbols": ",".join(symbols), "kinds": "quote"}, quote_via=urllib.parse.quote)
+    url = f"{MARKET_WS_URL}?{query}"
+    cards = "".join(
+        f'<div class="price-card" id="card-{html.escape(symbol)}"><div class="symbol">{html.escape(symbol)}</div>'
+        f'<div class="price-value">…</div><div class="price-change"></div></div>'
+        for symbol in symbols
+    )
+    components.html(
+        f"""
+        <style>
+            body {{ margin: 0; font-family: sans-serif; }}
+            .cards {{ display: flex; gap: 10px; flex-wrap: wrap; }}
+            .price-card {{
+                background: #1e1e28; border-radius: 8px; padding: 10px 14px; display: flex; gap: 14px;
+                width: fit-content; box-shadow: 0 1px 3px rgba(0,0,0,0.15); transition: background 0.4s;
+            }}
+            .price-card.flash {{ background: #2c2c3a; }}
+            .symbol {{ font-size: 14px; color: #a0a0b0; align-self: center; }}
+            .price-value {{ font-size: 17px; font-weight: bold; color: #ffffff; }}
+            .price-change {{ font-size: 16px; font-weight: 600; }}
+            .change-positive {{ color: #28a745; }}
+            .change-negative {{ color: #dc3545; }}
+        </style>
+        <div class="cards">{cards}</div>
+        <script>
+            let delay = 1000;
+            function connect() {{
+                const ws = new WebSocket({json.dumps(url)});
+                ws.onopen = () => {{ delay = 1000; }};
+                ws.onmessage = (event) => {{
+                    const msg = JSON.parse(event.data);
+                    const card = document.getElementById("card-" + msg.symbol);
+                    if (!card || !msg.data) return;
+                    const price = msg.data.last;
+                    const change = msg.data.change_pct;
+                    card.querySelector(".price-value").textContent =
+                        price.toLocaleString("ru-RU", {{maximumFractionDigits: 2}}) + " ₽";
+                    const changeEl = card.querySelector(".price-change");
+                    if (change !== null && change !== undefined) {{
+                        changeEl.textContent = (change >= 0 ? "+" : "") + change.toFixed(2) + "%";
+                        changeEl.className = "price-change " + (change >= 0 ? "change-positive" : "change-negative");
+                    }}
+                    card.classList.add("flash");
+                    setTimeout(() => card.classList.remove("flash"), 400);
+                }};
+                // Переподключение с нарастающей паузой, если бэкенд перезапустился
+                ws.onclose = () => {{ setTimeout(connect, delay); delay = Math.min(delay * 2, 30000); }};
+            }}
+            connect();
+        </script>
+        """,
+        height=60,
+    )
 
 
-def send_message_to_api(session_id: str, user_message: str, account_id: str | None = None) -> str:
-    headers = {"accept": "application/json", "Content-Type": "application/json"}
+def stream_message_from_api(session_id: str, user_message: str, account_id: str | None = None, full_analysis: bool = False):
+    """Генератор SSE-событий (event, data) от /message/stream"""
+    headers = {"accept": "text/event-stream", "Content-Type": "application/json"}
     payload = {
         "session_id": str(session_id),
         "user_message": user_message,
-        "account_id": account_id or None
+        "account_id": account_id or None,
+        "full_analysis": full_analysis
     }
-    try:
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=30)
+    with requests.post(STREAM_URL, headers=headers, json=payload, stream=True, timeout=(5, 60)) as response:
         response.raise_for_status()
-        data = response.json()
-        return data.get("answer", "Извините, ИИ не дал понятного ответа.")
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[5:].strip())
+
+
+STAGE_LABELS = {
+    "planning": "Разбираю запрос…",
+    "analyzing": "Анализирую данные…",
+}
+
+
+def render_streamed_answer(session_id: str, user_message: str, account_id: str | None = None, full_analysis: bool = False) -> str:
+    """Показывает ответ по мере поступления и возвращает итоговый текст"""
+    status = st.empty()
+    text_box = st.empty()
+    answer = ""
+    started = time.perf_counter()
+    first_byte_at = None
+    try:
+        for event, data in stream_message_from_api(session_id, user_message, account_id, full_analysis):
+            if first_byte_at is None:
+                first_byte_at = time.perf_counter()
+            if event == "stage":
+                label = STAGE_LABELS.get(data["stage"], f"Вызываю {data.get('method')}…")
+                status.caption(label)
+            elif event == "tool":
+                status.caption(f"{data['method']}: {data['summary']}")
+            elif event == "token":
+                answer += data["text"]
+                text_box.markdown(answer + "▌")
+            elif event == "done":
+                answer = data["answer"]
+                total = time.perf_counter() - started
+                # Время до первого байта и до первого токена ответа меряются отдельно от полного
+                st.session_state.last_timing = (
+                    f"Первый байт: {(first_byte_at - started):.2f} с · "
+                    f"первый токен ответа: {data['ttfb_ms'] / 1000:.2f} с · всего: {total:.2f} с"
+                )
+                status.caption(st.session_state.last_timing)
+            elif event == "error":
+                answer = f"❌ Ошибка API: {data['detail']}"
     except Exception as e:
-        return f"❌ Ошибка API: {str(e)}"
-
+        answer = f"❌ Ошибка API: {str(e)}"
+    text_box.markdown(answer)
+    return answer
 
-if not os.path.exists(DB_PATH):
-    init_db()
 
 if "current_chat_id" not in st.session_state:
     chats = get_all_chats()
@@ -191,6 +252,19 @@ with st.sidebar:
     if account_id_input != st.session_state.account_id:
         st.session_state.account_id = account_id_input
 
+    st.toggle(
+        "Подробный анализ",
+        key="full_analysis",
+        help="Разбирать результаты запросов моделью, а не кратким шаблоном (медленнее)"
+    )
+
+    st.text_input(
+        "Живые котировки",
+        key="live_symbols",
+        placeholder="SBER@MISX, GAZP@MISX",
+        help="Тикеры через запятую; если пусто — тикеры из последних сообщений чата"
+    )
+
     st.divider()
 
     if st.button("➕ Новый чат", use_container_width=True, type="primary"):
@@ -220,15 +294,13 @@ with st.sidebar:
                 st.rerun()
         with col2:
             if st.button("🗑️", key=f"del_{chat['id']}", help="Удалить"):
-                with get_db_connection() as conn:
-                    conn.execute("DELETE FROM chats WHERE id = ?", (chat["id"],))
+                delete_chat(chat["id"])
                 st.rerun()
 
 
 current_chat_id = st.session_state.current_chat_id
 
-with get_db_connection() as conn:
-    chat_row = conn.execute("SELECT title FROM chats WHERE id = ?", (current_chat_id,)).fetchone()
+chat_row = get_chat(current_chat_id)
 if not chat_row:
     st.error("Чат не найден")
     st.stop()
@@ -237,34 +309,40 @@ current_title = chat_row["title"]
 st.title("💬 " + current_title)
 
 
-messages = get_chat_messages(current_chat_id)
+# Показываются последние сообщения; более ранние — по кнопке, страницами по HISTORY_PAGE_SIZE
+history_limits = st.session_state.setdefault("history_limits", {})
+history_limit = history_limits.get(current_chat_id, HISTORY_PAGE_SIZE)
+messages, has_earlier = get_recent_messages(current_chat_id, history_limit)
+if has_earlier and st.button("⬆️ Показать более ранние сообщения", use_container_width=True):
+    history_limits[current_chat_id] = history_limit + HISTORY_PAGE_SIZE
+    st.rerun()
+
+live_symbols = [
+    s.strip() for s in st.session_state.get("live_symbols", "").split(",") if LIVE_SYMBOL_RE.fullmatch(s.strip())
+]
+live_symbols = live_symbols[:5] or mentioned_symbols(messages)
+if live_symbols:
+    render_live_prices(live_symbols)
+
 for msg in messages:
     with st.chat_message(msg["role"]):
         st.write(msg["content"])
-        if msg["role"] == "assistant":
-            price, change = extract_price_and_change(msg["content"])
-            if price is not None and change is not None:
-                change_class = "change-positive" if change >= 0 else "change-negative"
-                change_sign = "+" if change >= 0 else ""
-                formatted_price = f"{price:,.0f} ₽".replace(",", " ")
-                formatted_change = f"{change_sign}{change:.2f}%"
-                st.markdown(
-                    f"""
-                    <div class="price-card">
-                        <div class="price-value">{formatted_price}</div>
-                        <div class="price-change {change_class}">{formatted_change}</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+        if msg["role"] == "assistant" and msg["price"] is not None and msg["change"] is not None:
+            render_price_card(msg["price"], msg["change"])
+
+if st.session_state.get("last_timing"):
+    st.caption(st.session_state.last_timing)
 
 if prompt := st.chat_input("Введите ваш запрос..."):
     save_message(current_chat_id, "user", prompt)
-    with st.spinner("Анализирую запрос..."):
-        ai_response = send_message_to_api(
+    with st.chat_message("user"):
+        st.write(prompt)
+    with st.chat_message("assistant"):
+        ai_response = render_streamed_answer(
             session_id=current_chat_id,
             user_message=prompt,
-            account_id=st.session_state.account_id or None
+            account_id=st.session_state.account_id or None,
+            full_analysis=st.session_state.get("full_analysis", False)
         )
     save_message(current_chat_id, "assistant", ai_response)
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранилища чатов: время "загрузки страницы" (список чатов +
+сообщения текущего чата) при росте истории.
+
+Сравниваются прежняя схема (новое соединение на каждый запрос, без индексов,
+вся история чата и разбор цены регуляркой при каждой отрисовке) и storage.py
+(общее соединение, WAL, индексы, последние PAGE_SIZE сообщений; холодный
+запрос и из кэша). Половина сообщений приходится на чат 1.
+
+Использование:
+    python bench/bench_storage.py --sizes 1000,10000,100000
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storage  # noqa: E402
+
+CHATS = 200
+PAGE_SIZE = 30
+REPEAT = 20
+
+
+def fill(path: str, messages: int) -> None:
+    """Схема версии 1 (как в старых ai_chat.db) и `messages` сообщений в CHATS чатах"""
+    conn = sqlite3.connect(path)
+    conn.executescript(storage.MIGRATIONS[0])
+    conn.executemany("INSERT INTO chats (title) VALUES (?)", [(f"Чат {i}",) for i in range(CHATS)])
+    conn.executemany(
+        "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
+        (
+            (1 if i % 2 else i % CHATS + 1, "user" if i % 4 < 2 else "assistant", f"Сообщение {i}: 285.50 ₽ (+1.20%)")
+            for i in range(messages)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def old_page_load(path: str, chat_id: int) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.execute("SELECT id, title FROM chats ORDER BY created_at DESC").fetchall()
+    with sqlite3.connect(path) as conn:
+        conn.execute("SELECT title FROM chats WHERE id = ?", (chat_id,)).fetchone()
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY created_at ASC", (chat_id,)
+        ).fetchall()
+    for role, content in rows:
+        if role == "assistant":
+            storage.extract_price_and_change(content)
+
+
+def new_page_load(chat_id: int, cold: bool) -> None:
+    if cold:
+        storage.invalidate_cache()
+    storage.get_all_chats()
+    storage.get_chat(chat_id)
+    storage.get_recent_messages(chat_id, PAGE_SIZE)
+
+
+def best_ms(func) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    sizes = [1_000, 10_000, 100_000]
+    if len(sys.argv) > 2 and sys.argv[1] == "--sizes":
+        sizes = [int(x) for x in sys.argv[2].split(",")]
+
+    print(f"{'сообщений':>10}{'в чате':>8}{'было, мс':>11}{'холодный, мс':>15}{'из кэша, мс':>14}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ai_chat.db")
+            fill(path, size)
+            old_ms = best_ms(lambda: old_page_load(path, 1))
+
+            storage.close_db_connection()
+            storage.DB_PATH = path
+            storage.get_db_connection()  # миграция — вне замера
+            cold_ms = best_ms(lambda: new_page_load(1, cold=True))
+            warm_ms = best_ms(lambda: new_page_load(1, cold=False))
+            storage.close_db_connection()
+        print(f"{size:>10}{size // 2:>8}{old_ms:>11.2f}{cold_ms:>15.3f}{warm_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
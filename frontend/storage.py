@@ -0,0 +1,246 @@
+"""
+Хранилище чатов фронтенда (SQLite).
+
+Одно соединение на процесс (Streamlit выполняет скрипт в разных потоках,
+поэтому доступ к нему идёт под блокировкой), журнал WAL, включённые
+внешние ключи — иначе ON DELETE CASCADE не срабатывает.
+Схема версионируется через PRAGMA user_version: при открытии старого
+ai_chat.db применяются недостающие миграции.
+
+Цена и изменение из ответа ассистента разбираются один раз при сохранении.
+Список чатов и последние сообщения чатов кэшируются в памяти процесса;
+кэш чата сбрасывается при записи в него.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+DB_PATH = os.getenv("CHAT_DB_PATH", "ai_chat.db")
+
+# Сколько чатов держать в кэше последних сообщений
+MESSAGES_CACHE_CHATS = int(os.getenv("CHAT_CACHE_CHATS", "64"))
+
+PRICE_RE = re.compile(r'([\d\s.,]+)\s*₽?\s*(?:\(|\s*)([+-]?\d*\.?\d+)%')
+
+
+def extract_price_and_change(text: str) -> tuple[float | None, float | None]:
+    text = text.strip()
+    match = PRICE_RE.search(text)
+    if not match:
+        return None, None
+    price_str = match.group(1).replace(' ', '').replace(',', '.')
+    change_str = match.group(2)
+    try:
+        price = float(price_str)
+        change = float(change_str)
+        return price, change
+    except ValueError:
+        return None, None
+
+
+def _backfill_prices(conn: sqlite3.Connection) -> None:
+    """Разобрать цену в уже сохранённых ответах ассистента"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, content FROM messages WHERE role = 'assistant' AND id > ? ORDER BY id LIMIT 1000",
+            (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for message_id, content in rows:
+            price, change = extract_price_and_change(content)
+            if price is not None and change is not None:
+                updates.append((price, change, message_id))
+        conn.executemany("UPDATE messages SET price = ?, change = ? WHERE id = ?", updates)
+        last_id = rows[-1][0]
+
+
+# Миграция i переводит схему с версии i на i + 1: SQL-скрипт или функция
+MIGRATIONS: List[Union[str, Callable[[sqlite3.Connection], None]]] = [
+    # 0 -> 1: исходная схема (в существующих базах уже есть)
+    """
+    CREATE TABLE IF NOT EXISTS chats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE
+    );
+    """,
+    # 1 -> 2: индексы и удаление сообщений, оставшихся от удалённых чатов
+    # (до включения foreign_keys каскадное удаление не работало)
+    """
+    DELETE FROM messages WHERE chat_id NOT IN (SELECT id FROM chats);
+    CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages (chat_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_chats_created ON chats (created_at);
+    """,
+    # 2 -> 3: цена и изменение, разобранные при сохранении ответа
+    """
+    ALTER TABLE messages ADD COLUMN price REAL;
+    ALTER TABLE messages ADD COLUMN change REAL;
+    """,
+    # 3 -> 4: заполнить их для старых сообщений
+    _backfill_prices,
+]
+
+_lock = threading.RLock()
+_connection: Optional[sqlite3.Connection] = None
+
+_chats_cache: Optional[List[Dict]] = None
+# chat_id -> (сколько сообщений запрошено, последние limit + 1 сообщений по возрастанию)
+_messages_cache: "OrderedDict[int, Tuple[int, List[Dict]]]" = OrderedDict()
+
+
+def invalidate_cache(chat_id: Optional[int] = None, chats: bool = True) -> None:
+    """Сбросить кэш сообщений чата (или всех чатов) и, если chats, список чатов"""
+    global _chats_cache
+    with _lock:
+        if chats:
+            _chats_cache = None
+        if chat_id is None:
+            _messages_cache.clear()
+        else:
+            _messages_cache.pop(chat_id, None)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Применить недостающие миграции, вернуть итоговую версию схемы"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        if callable(migration):
+            with conn:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+        else:
+            # executescript сам фиксирует открытую транзакцию, поэтому BEGIN/COMMIT — внутри скрипта
+            conn.executescript(f"BEGIN;\n{migration}\nPRAGMA user_version = {target};\nCOMMIT;")
+    return len(MIGRATIONS)
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """Общее соединение процесса (создаётся и мигрируется при первом вызове)"""
+    global _connection
+    with _lock:
+        if _connection is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            migrate(conn)
+            _connection = conn
+        return _connection
+
+
+def close_db_connection() -> None:
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+        invalidate_cache()
+
+
+def create_new_chat(title: str = "Новый чат") -> int:
+    conn = get_db_connection()
+    with _lock, conn:
+        chat_id = conn.execute("INSERT INTO chats (title) VALUES (?)", (title,)).lastrowid
+    invalidate_cache(chat_id)
+    return chat_id
+
+
+def update_chat_title(chat_id: int, new_title: str) -> None:
+    conn = get_db_connection()
+    with _lock, conn:
+        conn.execute("UPDATE chats SET title = ? WHERE id = ?", (new_title, chat_id))
+    invalidate_cache(chat_id)
+
+
+def delete_chat(chat_id: int) -> None:
+    """Удалить чат; сообщения удаляются каскадно"""
+    conn = get_db_connection()
+    with _lock, conn:
+        conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+    invalidate_cache(chat_id)
+
+
+def get_chat(chat_id: int) -> Optional[Dict]:
+    for chat in get_all_chats():
+        if chat["id"] == chat_id:
+            return chat
+    return None
+
+
+def get_all_chats() -> List[Dict]:
+    global _chats_cache
+    with _lock:
+        if _chats_cache is None:
+            rows = get_db_connection().execute(
+                "SELECT id, title FROM chats ORDER BY created_at DESC, id DESC"
+            ).fetchall()
+            _chats_cache = [{"id": r["id"], "title": r["title"]} for r in rows]
+        return _chats_cache
+
+
+def save_message(chat_id: int, role: str, content: str) -> None:
+    price = change = None
+    if role == "assistant":
+        price, change = extract_price_and_change(content)
+        if price is None or change is None:
+            price = change = None
+    conn = get_db_connection()
+    with _lock, conn:
+        conn.execute(
+            "INSERT INTO messages (chat_id, role, content, price, change) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, role, content, price, change)
+        )
+    invalidate_cache(chat_id, chats=False)
+
+
+def _message(row: sqlite3.Row) -> Dict:
+    return {"role": row["role"], "content": row["content"], "price": row["price"], "change": row["change"]}
+
+
+def get_recent_messages(chat_id: int, limit: int) -> Tuple[List[Dict], bool]:
+    """
+    Последние `limit` сообщений чата (по возрастанию времени) и признак,
+    что есть более ранние. Время не зависит от длины истории чата.
+    """
+    with _lock:
+        cached = _messages_cache.get(chat_id)
+        if cached is None or cached[0] < limit:
+            rows = get_db_connection().execute(
+                "SELECT role, content, price, change FROM messages WHERE chat_id = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (chat_id, limit + 1)
+            ).fetchall()
+            cached = (limit, [_message(r) for r in reversed(rows)])
+            _messages_cache[chat_id] = cached
+        _messages_cache.move_to_end(chat_id)
+        while len(_messages_cache) > max(1, MESSAGES_CACHE_CHATS):
+            _messages_cache.popitem(last=False)
+        messages = cached[1]
+    return messages[-limit:], len(messages) > limit
+
+
+def get_chat_messages(chat_id: int) -> List[Dict]:
+    """Вся история чата"""
+    conn = get_db_connection()
+    with _lock:
+        rows = conn.execute(
+            "SELECT role, content, price, change FROM messages WHERE chat_id = ? ORDER BY created_at ASC, id ASC",
+            (chat_id,)
+        ).fetchall()
+    return [_message(r) for r in rows]